@@ -0,0 +1,694 @@
+#!/usr/bin/env python3
+"""
+Benchmarks for introspect.py, kept out of the shipped module so their corpora are never
+scanned as project code. Run `python bench_introspect.py NAME` or `introspect.py bench NAME`.
+"""
+
+from __future__ import annotations
+
+import os
+import io
+import json
+import importlib.util
+import re
+import sys
+import time
+import datetime
+from pathlib import Path
+
+import introspect
+from introspect import (
+    ContentCache, ParallelWalker, ProjectInfo, ProjectScanner, MAX_MATCHES_PER_FILE, SHARD_FILE,
+    STARTUP_IMPORT_BUDGET_MS, SUMMARY_FORMATS, WALK_WORKERS, WATCH_MAX_CONSECUTIVE_CANCELS,
+    atomic_write, encode_summary, read_summary, read_summary_section, run_query,
+)
+
+TYPE_CHECKING = False
+if TYPE_CHECKING:
+    from typing import Dict, List, Tuple, Optional
+
+# Pathological inputs for the matching code, keyed by name; each builds n repetitions
+PATHOLOGICAL_CORPUS = {
+    'unclosed_block_todos': lambda n: '/* TODO never closed ' * n,
+    'minified_imports': lambda n: 'var a=1;import a,b,c ' * n,
+    'unclosed_readme_fences': lambda n: 'see ```bash\nnpm run dev\n' * n,
+    'many_todos': lambda n: ('//' + ' TODO: item\n') * n,
+    'using_without_semicolon': lambda n: 'using System\n' * n,
+    'unterminated_includes': lambda n: '#include <' + 'a' * 20 + ' ' * n,
+    'unclosed_mounts': lambda n: "const app = express(); app.use('/a', x, " * n,
+    'unclosed_named_imports': lambda n: 'import { Router, ' * n,
+    'unclosed_block_comments': lambda n: '  /* never closed\n' * n,
+    'indented_comments': lambda n: '    // note\n    /* a */\n \t \n' * n,
+}
+
+def bench_regex(argv: List[str]) -> int:
+    """Check that matching time grows linearly on pathological inputs"""
+    import argparse
+    import tempfile
+    
+    parser = argparse.ArgumentParser(prog='bench_introspect.py regex')
+    parser.add_argument('--size', type=int, default=2000, help='Base repetitions per input (default: 2000)')
+    parser.add_argument('--max-growth', type=float, default=8.0, help='Allowed time growth for 4x input (default: 8, quadratic is 16)')
+    args = parser.parse_args(argv)
+    
+    scanner = ProjectScanner(tempfile.gettempdir())
+    scanner.file_budget = 60.0
+    
+    def timed(text: str) -> float:
+        best = float('inf')
+        for _ in range(3):
+            start = time.perf_counter()
+            if '```' in text:
+                scanner.find_code_blocks(text)
+            else:
+                scanner.analyze_text(text, 'bench.js')
+            best = min(best, time.perf_counter() - start)
+        return best
+    
+    failures = 0
+    print(f"| Input | {args.size}x (ms) | {args.size * 4}x (ms) | Growth |")
+    print("|---|---|---|---|")
+    for name, build in PATHOLOGICAL_CORPUS.items():
+        small = timed(build(args.size))
+        large = timed(build(args.size * 4))
+        growth = large / small if small > 0 else 0.0
+        status = '' if growth <= args.max_growth else ' ❌'
+        failures += bool(status)
+        print(f"| {name} | {small * 1000:.2f} | {large * 1000:.2f} | {growth:.1f}x{status} |")
+    
+    # A file with more matches than the step budget is aborted and recorded
+    with tempfile.TemporaryDirectory() as tmp:
+        flood = Path(tmp) / 'flood.js'
+        flood.write_text(PATHOLOGICAL_CORPUS['many_todos'](MAX_MATCHES_PER_FILE + 1))
+        budget_scanner = ProjectScanner(tmp)
+        budget_scanner.analyze_files([flood], {flood: flood.stat().st_size}, [])
+        recorded = [f['path'] for f in budget_scanner.skipped_files] == ['flood.js']
+    print(f"\nStep budget {'aborted and recorded' if recorded else 'did NOT abort'} flood.js")
+    
+    return 0 if failures == 0 and recorded else 1
+
+def bench_walk(argv: List[str]) -> int:
+    """Compare serial and parallel walks of a synthetic tree with injected listing latency"""
+    import argparse
+    import tempfile
+    
+    parser = argparse.ArgumentParser(prog='bench_introspect.py walk')
+    parser.add_argument('--dirs', type=int, default=300, help='Directories in the synthetic tree (default: 300)')
+    parser.add_argument('--files', type=int, default=10, help='Files per directory (default: 10)')
+    parser.add_argument('--latency', type=float, default=2.0, help='Milliseconds added to every directory listing (default: 2)')
+    parser.add_argument('--workers', type=int, default=WALK_WORKERS, help=f'Parallel walker threads (default: {WALK_WORKERS})')
+    args = parser.parse_args(argv)
+    
+    def slow_scandir(path):
+        time.sleep(args.latency / 1000)
+        return os.scandir(path)
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp) / 'tree'
+        for i in range(args.dirs):
+            # Three levels deep, plus an ignored node_modules every tenth directory
+            directory = root / f"pkg{i % 7}" / f"mod{i % 13}" / f"dir{i}"
+            directory.mkdir(parents=True, exist_ok=True)
+            for j in range(args.files):
+                (directory / f"file{j}.ts").write_text('export {}\n')
+            if i % 10 == 0:
+                (directory / 'node_modules').mkdir()
+                (directory / 'node_modules' / 'dep.js').write_text('')
+        
+        scanner = ProjectScanner(root)
+        
+        # Reference inventory from the original os.walk-based scan
+        reference = []
+        for dirpath, dirs, files in os.walk(root):
+            dirs[:] = [d for d in dirs if not scanner.should_ignore(os.path.join(dirpath, d))]
+            for name in files:
+                path = os.path.join(dirpath, name)
+                if not scanner.should_ignore(path) and scanner.is_code_file(name):
+                    reference.append((path, os.stat(path).st_size))
+        reference.sort()
+        
+        print("| Walker | Time (ms) | Files |")
+        print("|---|---|---|")
+        ok = True
+        for label, workers in [('serial (1 thread)', 1), (f"parallel ({args.workers} threads)", args.workers)]:
+            walker = ParallelWalker(root, scanner.should_ignore, workers=workers, scandir=slow_scandir)
+            start = time.perf_counter()
+            inventory = walker.walk(scanner.is_code_file)
+            elapsed = time.perf_counter() - start
+            ok = ok and inventory == reference
+            print(f"| {label} | {elapsed * 1000:.1f} | {len(inventory)} |")
+    
+    print(f"\nInventory {'matches' if ok else 'DIFFERS from'} the os.walk reference")
+    return 0 if ok else 1
+
+def bench_formats(argv: List[str]) -> int:
+    """Round-trip every summary format and compare size and speed"""
+    import argparse
+    import tempfile
+    
+    parser = argparse.ArgumentParser(prog='bench_introspect.py formats')
+    parser.add_argument('--items', type=int, default=20000, help='TODOs and APIs in the synthetic summary (default: 20000)')
+    args = parser.parse_args(argv)
+    
+    data = ProjectInfo(
+        projectName='bench',
+        projectSummary='Synthetic project summary',
+        detectedStack=['Express.js', 'MongoDB', 'Node.js', 'React'],
+        dependencies=[f"package-{i} (package.json) (prod)" for i in range(500)],
+        APIsDetected=[{'path': f"/api/resource{i}/:id", 'method': 'GET', 'framework': 'Express.js',
+                       'file': f"server/src/routes/r{i % 200}.ts"} for i in range(args.items)],
+        unfinishedFeaturesOrTODOs=[{'type': 'TODO', 'text': f"handle edge case number {i} ✨", 'line': i % 900 + 1}
+                                   for i in range(args.items)],
+    ).to_dict()
+    data['_metadata'] = {'generated_at': datetime.datetime.now().isoformat(), 'scanner_version': '1.0.0',
+                         'partial': False, 'coverage': {'filesAnalyzed': 10, 'bytesAnalyzed': 2 ** 40}}
+    
+    ok = True
+    print("| Format | Size (KB) | Write (ms) | Read all (ms) | Read APIsDetected (ms) | Round-trip |")
+    print("|---|---|---|---|---|---|")
+    with tempfile.TemporaryDirectory() as tmp:
+        for fmt, name in SUMMARY_FORMATS.items():
+            path = Path(tmp) / name
+            start = time.perf_counter()
+            atomic_write(path, encode_summary(data, fmt))
+            write_ms = (time.perf_counter() - start) * 1000
+            
+            start = time.perf_counter()
+            decoded = read_summary(path)
+            read_ms = (time.perf_counter() - start) * 1000
+            
+            start = time.perf_counter()
+            apis = read_summary_section(path, 'APIsDetected')
+            section_ms = (time.perf_counter() - start) * 1000
+            
+            round_trip = decoded == data and apis == data['APIsDetected']
+            ok = ok and round_trip
+            print(f"| {fmt} | {path.stat().st_size / 1024:.0f} | {write_ms:.1f} | {read_ms:.1f} | {section_ms:.1f} | "
+                  f"{'ok' if round_trip else 'MISMATCH'} |")
+    
+    return 0 if ok else 1
+
+def bench_shards(argv: List[str]) -> int:
+    """Scan a project as N shard processes, merge them, and compare with a single-node scan"""
+    import argparse
+    import subprocess
+    import tempfile
+    
+    parser = argparse.ArgumentParser(prog='bench_introspect.py shards')
+    parser.add_argument('path', nargs='?', default='.', help='Project to scan (default: current directory)')
+    parser.add_argument('--shards', type=int, default=4, help='Number of shard processes (default: 4)')
+    args = parser.parse_args(argv)
+    project_path = Path(args.path).resolve()
+    
+    start = time.perf_counter()
+    single = ProjectScanner(project_path)
+    single_info = single.scan()
+    single_s = time.perf_counter() - start
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        start = time.perf_counter()
+        workers = [subprocess.Popen([sys.executable, os.path.abspath(introspect.__file__), str(project_path),
+                                     '--shard', f"{i}/{args.shards}", '--partial-dir', tmp],
+                                    stdout=subprocess.DEVNULL)
+                   for i in range(1, args.shards + 1)]
+        if any(worker.wait() != 0 for worker in workers):
+            print("❌ A shard process failed")
+            return 1
+        partials = [json.loads((Path(tmp) / SHARD_FILE.format(index=i, count=args.shards)).read_bytes())
+                    for i in range(1, args.shards + 1)]
+        merged = ProjectScanner(project_path)
+        merged_info = merged.merge_shards(partials)
+        sharded_s = time.perf_counter() - start
+    
+    ok = (merged_info.to_dict() == single_info.to_dict() and merged.coverage == single.coverage
+          and merged.skipped_files == single.skipped_files and merged.total_files == single.total_files)
+    print("\n| Mode | Files | Time (s) |")
+    print("|---|---|---|")
+    print(f"| single node | {single.coverage['filesTotal']} | {single_s:.2f} |")
+    print(f"| {args.shards} shards + merge | {merged.coverage['filesTotal']} | {sharded_s:.2f} |")
+    print(f"\nMerged summary {'matches' if ok else 'DIFFERS from'} the single-node scan")
+    return 0 if ok else 1
+
+def bench_cache(argv: List[str]) -> int:
+    """Scan two fresh copies of a project through one content-addressed cache, as CI checkouts would"""
+    import argparse
+    import shutil
+    import tempfile
+    
+    parser = argparse.ArgumentParser(prog='bench_introspect.py cache')
+    parser.add_argument('path', nargs='?', default='.', help='Project to copy and scan (default: current directory)')
+    args = parser.parse_args(argv)
+    
+    source = ProjectScanner(args.path)
+    inventory = source.scan_directory()
+    
+    def timed_scan(root: Path, cache_dir: Optional[Path]) -> Tuple[float, ProjectScanner, ProjectInfo]:
+        scanner = ProjectScanner(root)
+        if cache_dir is not None:
+            scanner.cache = ContentCache(cache_dir)
+        start = time.perf_counter()
+        project_info = scanner.scan()
+        return time.perf_counter() - start, scanner, project_info
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        # Each checkout gets fresh mtimes, which is what defeats a stat-keyed cache in CI
+        checkouts = [Path(tmp) / 'checkout-a' / source.project_name, Path(tmp) / 'checkout-b' / source.project_name]
+        for checkout in checkouts:
+            for file in sorted(set(inventory['files']) | set(inventory['project_files'])):
+                target = checkout / file.relative_to(source.project_path)
+                target.parent.mkdir(parents=True, exist_ok=True)
+                shutil.copyfile(file, target)
+        
+        cache_dir = Path(tmp) / 'cache'
+        runs = [('no cache', *timed_scan(checkouts[0], None)),
+                ('cold cache, checkout A', *timed_scan(checkouts[0], cache_dir)),
+                ('warm cache, fresh checkout B', *timed_scan(checkouts[1], cache_dir))]
+    
+    reference = runs[0][3].to_dict()
+    ok = all(project_info.to_dict() == reference for _, _, _, project_info in runs)
+    print("\n| Run | Time (s) | Cache hits | Cache misses |")
+    print("|---|---|---|---|")
+    for label, seconds, scanner, _ in runs:
+        hits = scanner.cache.hits if scanner.cache else '-'
+        misses = scanner.cache.misses if scanner.cache else '-'
+        print(f"| {label} | {seconds:.2f} | {hits} | {misses} |")
+    print(f"\nCached summaries {'match' if ok else 'DIFFER from'} the uncached scan")
+    return 0 if ok else 1
+
+def bench_index(argv: List[str]) -> int:
+    """Build a SQLite index for a large synthetic project and time typical queries"""
+    import argparse
+    import contextlib
+    import tempfile
+    
+    parser = argparse.ArgumentParser(prog='bench_introspect.py index')
+    parser.add_argument('--files', type=int, default=100000, help='Synthetic files in the index (default: 100000)')
+    args = parser.parse_args(argv)
+    
+    words = ['payment', 'refund', 'invoice', 'session', 'cache', 'retry', 'upload', 'audit']
+    with tempfile.TemporaryDirectory() as tmp:
+        scanner = ProjectScanner(tmp)
+        scanner.project_files = []
+        scanner.index_path = Path(tmp) / 'project.db'
+        scanner.file_results = [{
+            'path': f"src/module{i % 500}/file{i}.ts",
+            'todos': [{'type': 'TODO', 'text': f"handle {words[i % 8]} {words[(i // 8) % 8]} case {i}", 'line': i % 300 + 1}],
+            'apis': [{'path': f"/api/{words[i % 8]}/{i}/:id", 'method': ['GET', 'POST', 'PUT', 'DELETE'][i % 4],
+                      'framework': 'Express.js', 'file': f"src/module{i % 500}/file{i}.ts"}],
+            'imports': ['express', f"./module{i % 500}"],
+            'config': {},
+            'db': [],
+        } for i in range(args.files)]
+        
+        start = time.perf_counter()
+        scanner.save_index(ProjectInfo(projectName='bench'))
+        build_s = time.perf_counter() - start
+        
+        scanner.file_results[7]['todos'][0]['text'] = 'handle payment webhook replay'
+        start = time.perf_counter()
+        scanner.save_index(ProjectInfo(projectName='bench'))
+        update_s = time.perf_counter() - start
+        
+        queries = [
+            ['todos', 'paym', 'webhook'],
+            ['apis', '--method', 'POST', '--prefix', '/api/refund/'],
+            ['apis', 'invoice', '--limit', '20'],
+            ['imports', './module42'],
+            ['todos', '--file', 'src/module7/*', '--limit', '5'],
+        ]
+        print("\n| Query | Time (ms) |")
+        print("|---|---|")
+        for query in queries:
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                run_query([str(scanner.index_path)] + query)
+            print(f"| {' '.join(query)} | {(time.perf_counter() - start) * 1000:.1f} |")
+    
+    print(f"\nIndexed {args.files} files in {build_s:.1f} s; one changed file upserted in {update_s:.2f} s")
+    return 0
+
+METRICS_SNIPPETS = {
+    '.ts': "// helper\nexport function f(a: number) {\n  /* inline\n   * block */\n  return a + 1;\n}\n\n",
+    '.py': "# helper\ndef f(a):\n    return a + 1\n\n",
+    '.js': "/**\n * docs\n */\nfunction f(a) {\n  return a + 1; // trailing\n}\n\n",
+    '.go': "// F adds one\nfunc F(a int) int {\n\treturn a + 1\n}\n\n",
+    '.css': "/* card */\n.card {\n  color: red;\n}\n\n",
+    '.md': "# Title\n\nSome text.\n<!-- hidden -->\n",
+    '.sql': "-- users\nSELECT * FROM users;\n\n",
+}
+
+def bench_metrics(argv: List[str]) -> int:
+    """Time line counting and per-group aggregation on a large synthetic tree"""
+    import argparse
+    import tempfile
+    
+    parser = argparse.ArgumentParser(prog='bench_introspect.py metrics')
+    parser.add_argument('--files', type=int, default=100000, help='Synthetic files to generate (default: 100000)')
+    args = parser.parse_args(argv)
+    
+    def per_line(content: str, language: str) -> Dict[str, int]:
+        # The straightforward loop the bulk counter replaces
+        line_prefix, block = ProjectScanner.COMMENT_SYNTAX.get(language, (None, None))
+        counts = {'lines': 0, 'blank': 0, 'comment': 0}
+        in_block = False
+        for line in content.splitlines():
+            counts['lines'] += 1
+            stripped = line.strip(' \t\f\v')
+            if not stripped:
+                counts['blank'] += 1
+            elif in_block:
+                counts['comment'] += 1
+                in_block = block[1] not in line
+            elif block and stripped.startswith(block[0]):
+                counts['comment'] += 1
+                in_block = block[1] not in stripped[len(block[0]):]
+            elif line_prefix and re.match(line_prefix, stripped):
+                counts['comment'] += 1
+        return counts
+    
+    extensions = list(METRICS_SNIPPETS)
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp) / 'synthetic'
+        for i in range(args.files):
+            ext = extensions[i % len(extensions)]
+            repeat = 1 + (i * 7919) % 40 + (400 if i % 997 == 0 else 0)
+            target = root / f"pkg{i % 20}" / f"module{i % 300}" / f"file{i}{ext}"
+            target.parent.mkdir(parents=True, exist_ok=True)
+            target.write_text(METRICS_SNIPPETS[ext] * repeat)
+        
+        scanner = ProjectScanner(root)
+        inventory = scanner.scan_directory()
+        files = inventory['files']
+        contents = [(scanner.language_of(f.name), f.read_text(encoding='utf-8', errors='ignore')) for f in files]
+        
+        start = time.perf_counter()
+        bulk = [scanner.line_metrics(content, language) for language, content in contents]
+        bulk_s = time.perf_counter() - start
+        start = time.perf_counter()
+        looped = [per_line(content, language) for language, content in contents]
+        loop_s = time.perf_counter() - start
+        
+        file_results = [{'path': str(f.relative_to(root)).replace('\\', '/'), 'metrics': counts} for f, counts in zip(files, bulk)]
+        labels = ['stdlib']
+        if importlib.util.find_spec('numpy') is not None:
+            labels.insert(0, 'NumPy')
+        
+        timings = []
+        for label in labels:
+            if label == 'stdlib':
+                # A None entry makes `import numpy` raise ImportError, forcing the fallback
+                saved = sys.modules.get('numpy')
+                sys.modules['numpy'] = None
+            try:
+                start = time.perf_counter()
+                metrics = scanner.compute_metrics(files, inventory['sizes'], file_results)
+                timings.append((label, time.perf_counter() - start, metrics))
+            finally:
+                if label == 'stdlib':
+                    if saved is None:
+                        del sys.modules['numpy']
+                    else:
+                        sys.modules['numpy'] = saved
+    
+    counted = bulk == looped
+    aggregated = all(metrics == timings[0][2] for _, _, metrics in timings)
+    print(f"\n| Stage ({len(files)} files) | Time (s) |")
+    print("|---|---|")
+    print(f"| Per-line loop | {loop_s:.2f} |")
+    print(f"| Bulk counting | {bulk_s:.2f} |")
+    for label, seconds, _ in timings:
+        print(f"| Aggregation ({label}) | {seconds:.2f} |")
+    print(f"\nBulk counts {'match' if counted else 'DIFFER from'} the per-line loop; "
+          f"aggregations {'agree' if aggregated else 'DISAGREE'}")
+    return 0 if counted and aggregated else 1
+
+def bench_stream(argv: List[str]) -> int:
+    """Compare peak memory and first-result latency of scan() and a streaming iter_scan() consumer"""
+    import argparse
+    import tempfile
+    import tracemalloc
+    
+    parser = argparse.ArgumentParser(prog='bench_introspect.py stream')
+    parser.add_argument('--files', type=int, default=10000, help='Synthetic files to generate (default: 10000)')
+    args = parser.parse_args(argv)
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp) / 'synthetic'
+        for i in range(args.files):
+            target = root / f"pkg{i % 20}" / f"module{i % 300}" / f"routes{i}.js"
+            target.parent.mkdir(parents=True, exist_ok=True)
+            imports = ''.join(f"const dep{j} = require('./module{(i + j) % 300}/dep{j}');\n" for j in range(20))
+            routes = ''.join('router.' + f"get('/api/item{i}/{j}/:id', handler{j});\n" for j in range(10))
+            target.write_text(imports + routes + '// ' + f"TODO: paginate item{i}\n")
+        
+        def measure(consume) -> Tuple[float, float, int]:
+            scanner = ProjectScanner(root, sinks=[])
+            tracemalloc.start()
+            start = time.perf_counter()
+            first = consume(scanner, start)
+            seconds = time.perf_counter() - start
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            return seconds, first, peak
+        
+        collected = []
+        
+        def scan_all(scanner: ProjectScanner, start: float) -> float:
+            scanner.scan()
+            collected.extend(result['path'] for result in scanner.file_results)
+            return time.perf_counter() - start
+        
+        streamed = []
+        
+        def stream(scanner: ProjectScanner, start: float) -> float:
+            first = None
+            for event in scanner.iter_scan(summarize=False):
+                if event.kind == 'file_analyzed':
+                    # Stand-in for the consumer's own store: keep the path, drop the result
+                    first = first or time.perf_counter() - start
+                    streamed.append(event.path)
+            return first
+        
+        rows = [('scan()',) + measure(scan_all), ('iter_scan(summarize=False)',) + measure(stream)]
+    
+    print(f"\n| API ({args.files} files) | Total (s) | First result (s) | Peak traced memory (MB) |")
+    print("|---|---|---|---|")
+    for label, seconds, first, peak in rows:
+        print(f"| {label} | {seconds:.2f} | {first:.2f} | {peak / 1024 / 1024:.1f} |")
+    ok = sorted(collected) == sorted(streamed)
+    print(f"\nStreamed results {'cover the same files as' if ok else 'DIFFER from'} the full scan")
+    return 0 if ok else 1
+
+def bench_watch(argv: List[str]) -> int:
+    """Measure save-to-output latency in watch mode under rapid-fire edits, with and without cancellation"""
+    import argparse
+    import contextlib
+    import tempfile
+    import threading
+    
+    parser = argparse.ArgumentParser(prog='bench_introspect.py watch')
+    parser.add_argument('--files', type=int, default=2000, help='Synthetic files in the watched tree (default: 2000)')
+    parser.add_argument('--edits', type=int, default=12, help='Edits in the burst (default: 12)')
+    parser.add_argument('--edit-interval', type=float, default=0.3, help='Seconds between edits (default: 0.3)')
+    args = parser.parse_args(argv)
+    
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp) / 'watched'
+        for i in range(args.files):
+            target = root / f"module{i % 50}" / f"file{i}.ts"
+            target.parent.mkdir(parents=True, exist_ok=True)
+            target.write_text(METRICS_SNIPPETS['.ts'] * 150)
+        
+        class NoCache:
+            # Every lookup misses, as in watch mode before per-file results were kept
+            def key_for(self, file):
+                return None
+            
+            def get(self, key):
+                return None
+            
+            def put(self, key, result):
+                pass
+        
+        # A max_cancels of 0 never cancels, which is how watch mode behaved before generations
+        modes = [('full rescans (previous)', NoCache(), 0),
+                 ('cached, finish every scan', None, 0),
+                 ('cached, cancel stale scans', None, WATCH_MAX_CONSECUTIVE_CANCELS)]
+        for n, (label, cache, max_cancels) in enumerate(modes):
+            scanner = ProjectScanner(root)
+            scanner.cache = cache
+            with contextlib.redirect_stdout(io.StringIO()):
+                watcher = threading.Thread(target=scanner.watch, kwargs={
+                    'interval': 0.1, 'min_rescan_interval': 0.25, 'max_cancels': max_cancels})
+                watcher.start()
+                while scanner.stats.get('introspect_scans_total') < 1:
+                    time.sleep(0.05)
+                
+                # Edit k counts as visible once the outputs reflect it or any later edit
+                saved_at, seen_at = {}, {}
+                burst_over = threading.Event()
+                
+                def monitor():
+                    deadline = None
+                    while len(seen_at) < args.edits:
+                        if burst_over.is_set():
+                            deadline = deadline or time.perf_counter() + 300
+                            if time.perf_counter() > deadline:
+                                return
+                        try:
+                            summary = json.loads((root / 'project_summary.json').read_text(encoding='utf-8'))
+                        except (OSError, ValueError):
+                            summary = {}
+                        newest = max((int(todo['text'].rsplit('-', 1)[1]) for todo in summary.get('unfinishedFeaturesOrTODOs', [])
+                                      if todo['text'].startswith(f"mode{n}-edit-")), default=-1)
+                        now = time.perf_counter()
+                        for k in range(newest + 1):
+                            if k in saved_at:
+                                seen_at.setdefault(k, now)
+                        time.sleep(0.02)
+                
+                monitoring = threading.Thread(target=monitor)
+                monitoring.start()
+                for k in range(args.edits):
+                    (root / f"module{k % 5}" / f"hot{k % 5}.ts").write_text('//' + f" TODO: mode{n}-edit-{k}\n")
+                    saved_at[k] = time.perf_counter()
+                    time.sleep(args.edit_interval)
+                burst_over.set()
+                monitoring.join()
+                
+                scanner.stop_watch()
+                watcher.join()
+            latencies = [seen_at[k] - saved_at[k] for k in seen_at]
+            latency = (sum(latencies) / len(latencies), max(latencies)) if len(latencies) == args.edits else None
+            rows.append((label, scanner.stats.get('introspect_scans_total'),
+                         scanner.stats.get('introspect_scans_cancelled_total'), latency))
+    
+    print(f"\n| Mode ({args.files} files, {args.edits} edits every {args.edit_interval}s) | Completed scans | Cancelled scans | Mean save to output (s) | Worst save to output (s) |")
+    print("|---|---|---|---|---|")
+    for label, scans, cancelled, latency in rows:
+        mean, worst = ('timed out', 'timed out') if latency is None else (f'{latency[0]:.2f}', f'{latency[1]:.2f}')
+        print(f"| {label} | {scans} | {cancelled} | {mean} | {worst} |")
+    return 0 if all(latency is not None for *_, latency in rows) else 1
+
+def bench_startup(argv: List[str]) -> int:
+    """Time short runs through each entry path and check the import time of introspect against its budget"""
+    import argparse
+    import shutil
+    import statistics
+    import subprocess
+    import tempfile
+    
+    parser = argparse.ArgumentParser(prog='bench_introspect.py startup')
+    parser.add_argument('--runs', type=int, default=15, help='Runs per entry path; the median is reported (default: 15)')
+    parser.add_argument('--budget-ms', type=float, default=STARTUP_IMPORT_BUDGET_MS,
+                        help=f'Budget for "import introspect" in milliseconds (default: {STARTUP_IMPORT_BUDGET_MS})')
+    args = parser.parse_args(argv)
+    
+    source = Path(introspect.__file__).resolve()
+    
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp:
+        # Copies of the scripts get their bytecode cache next to them in the temporary directory,
+        # leaving the user's tree untouched while imports still use the installed stdlib's cache
+        bin_dir = Path(tmp) / 'bin'
+        bin_dir.mkdir()
+        script = Path(shutil.copy2(source, bin_dir))
+        client = bin_dir / 'introspect_client.py'
+        if source.with_name(client.name).exists():
+            shutil.copy2(source.with_name(client.name), client)
+        project = Path(tmp) / 'project'
+        for i in range(20):
+            target = project / 'src' / f"module{i}.ts"
+            target.parent.mkdir(parents=True, exist_ok=True)
+            target.write_text(METRICS_SNIPPETS['.ts'] * 5)
+        run_dir = Path(tmp) / 'run'
+        run_dir.mkdir(mode=0o700)
+        env = dict(os.environ, INTROSPECT_SOCKET=str(run_dir / 'daemon.sock'), PYTHONPATH=str(bin_dir))
+        env.pop('PYTHONPYCACHEPREFIX', None)
+        # Hooks normally run with a bytecode cache; build it even under PYTHONDONTWRITEBYTECODE
+        subprocess.run([sys.executable, '-m', 'py_compile', str(script)], env=env, check=True)
+        
+        def median_ms(command: List[str]) -> float:
+            samples = []
+            for _ in range(args.runs):
+                started = time.perf_counter()
+                subprocess.run(command, cwd=project, env=env, stdout=subprocess.DEVNULL, check=True)
+                samples.append(time.perf_counter() - started)
+            return statistics.median(samples) * 1000
+        
+        scan = [str(project), '--json-only']
+        rows.append(('interpreter only (python -c pass)', median_ms([sys.executable, '-c', 'pass'])))
+        rows.append(('introspect.py, compiled from source', median_ms([sys.executable, str(script)] + scan)))
+        if client.exists():
+            rows.append(('introspect_client.py, cached bytecode', median_ms([sys.executable, str(client)] + scan)))
+            daemon = subprocess.Popen([sys.executable, str(script), 'daemon'], env=env, stdout=subprocess.DEVNULL)
+            try:
+                deadline = time.monotonic() + 10
+                while not (run_dir / 'daemon.sock').exists() and time.monotonic() < deadline:
+                    time.sleep(0.05)
+                rows.append(('introspect_client.py, warm daemon', median_ms([sys.executable, str(client)] + scan)))
+            finally:
+                subprocess.run([sys.executable, str(script), 'daemon', '--stop'], env=env, stdout=subprocess.DEVNULL)
+                daemon.wait(timeout=10)
+        
+        # "import time: self [us] | cumulative | name", children before their parent and indented by depth
+        imports = []
+        for _ in range(args.runs):
+            result = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import introspect'],
+                                    cwd=tmp, env=env, capture_output=True, text=True, check=True)
+            entries = []
+            for line in result.stderr.splitlines():
+                fields = line.split('|')
+                if len(fields) == 3 and fields[0].split(':')[-1].strip().isdigit():
+                    name = fields[2].rstrip()
+                    entries.append((int(fields[1]), len(name) - len(name.lstrip()), name.strip()))
+            imports.append(entries)
+    
+    # The run with the median total, so the breakdown adds up
+    imports.sort(key=lambda entries: next(us for us, depth, name in entries if name == 'introspect' and depth == 1))
+    entries = imports[len(imports) // 2]
+    end = next(i for i, (_, depth, name) in enumerate(entries) if name == 'introspect' and depth == 1)
+    start = max((i for i in range(end) if entries[i][1] == 1), default=-1) + 1
+    total_ms = entries[end][0] / 1000
+    direct = sorted((e for e in entries[start:end] if e[1] == 3), reverse=True)
+    
+    print(f"\n| Entry path (scan of a 20-file project, median of {args.runs}) | Wall time (ms) |")
+    print("|---|---|")
+    for label, ms in rows:
+        print(f"| {label} | {ms:.1f} |")
+    print("\n| python -X importtime | Cumulative (ms) |")
+    print("|---|---|")
+    print(f"| import introspect | {total_ms:.1f} |")
+    for us, _, name in direct[:8]:
+        print(f"| &nbsp;&nbsp;{name} | {us / 1000:.1f} |")
+    
+    if total_ms > args.budget_ms:
+        print(f"\n❌ import introspect took {total_ms:.1f} ms, over the {args.budget_ms:g} ms budget")
+        return 1
+    print(f"\n✅ import introspect took {total_ms:.1f} ms, within the {args.budget_ms:g} ms budget")
+    return 0
+
+BENCHMARKS = {
+    'regex': bench_regex,
+    'walk': bench_walk,
+    'formats': bench_formats,
+    'shards': bench_shards,
+    'cache': bench_cache,
+    'index': bench_index,
+    'metrics': bench_metrics,
+    'stream': bench_stream,
+    'watch': bench_watch,
+    'startup': bench_startup,
+}
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Run one benchmark; also reachable as `introspect.py bench NAME`"""
+    argv = sys.argv[1:] if argv is None else argv
+    if not argv or argv[0] not in BENCHMARKS:
+        print(f"Usage: bench_introspect.py {{{','.join(BENCHMARKS)}}} [options]")
+        return 2
+    return BENCHMARKS[argv[0]](argv[1:])
+
+if __name__ == '__main__':
+    sys.exit(main())
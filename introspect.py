@@ -4,30 +4,1166 @@ Project Auto-Introspector
 Automatically analyzes any codebase and generates detailed documentation.
 """
 
+from __future__ import annotations
+
 import os
+import io
 import json
 import re
 import sys
-import hashlib
+import struct
 from pathlib import Path
-from typing import Dict, List, Set, Tuple, Optional, Any
 import datetime
-from dataclasses import dataclass, asdict, field
+from contextlib import contextmanager
 import time
 
-@dataclass
+# Annotations are never evaluated at runtime, so typing is only imported by type checkers;
+# the script runs from editor and git hooks, where every import shows up in startup time
+TYPE_CHECKING = False
+if TYPE_CHECKING:
+    from typing import Dict, List, Set, Tuple, Optional, Any, Callable, Iterable, Iterator, Union
+
 class ProjectInfo:
-    """Data structure for project information"""
-    projectName: str = ""
-    projectSummary: str = ""
-    detectedStack: List[str] = field(default_factory=list)
-    architecture: Dict[str, Any] = field(default_factory=dict)
-    keyFiles: List[str] = field(default_factory=list)
-    dependencies: List[str] = field(default_factory=list)
-    howToRun: List[str] = field(default_factory=list)
-    APIsDetected: List[Dict] = field(default_factory=list)
-    unfinishedFeaturesOrTODOs: List[Dict] = field(default_factory=list)
-    importantNotesForNextDeveloper: str = ""
+    """Data structure for project information; a dataclass from its first instantiation"""
+    
+    # Importing dataclasses (and inspect with it) takes 15-30 ms, about the whole budget for
+    # importing this module, so the fields stay bare annotations until the first instance turns
+    # the class into a dataclass in place. asdict, fields and replace work on any instance;
+    # dataclasses.fields(ProjectInfo) on the class itself needs an instance to exist first
+    projectName: str
+    projectSummary: str
+    detectedStack: List[str]
+    architecture: Dict[str, Any]
+    keyFiles: List[str]
+    dependencies: List[str]
+    howToRun: List[str]
+    APIsDetected: List[Dict]
+    unfinishedFeaturesOrTODOs: List[Dict]
+    importantNotesForNextDeveloper: str
+    routeTable: List[Dict]
+    routeIssues: List[Dict]
+    metrics: Dict[str, Any]
+    workspaces: List[Dict]
+    
+    # Default factory of each field
+    DEFAULTS = {
+        'projectName': str,
+        'projectSummary': str,
+        'importantNotesForNextDeveloper': str,
+        'architecture': dict,
+        'metrics': dict,
+    }
+    
+    def __new__(cls, *args, **kwargs):
+        if '__dataclass_fields__' not in cls.__dict__:
+            import dataclasses
+            for name in cls.__annotations__:
+                setattr(cls, name, dataclasses.field(default_factory=cls.DEFAULTS.get(name, list)))
+            dataclasses.dataclass(cls)
+        # The generated __init__ takes the arguments
+        return super().__new__(cls)
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """Field values as a new dict, deep-copied like dataclasses.asdict"""
+        import copy
+        return {name: copy.deepcopy(getattr(self, name)) for name in self.__annotations__}
+
+# Per-file matching allowance; a file that exceeds it is skipped and reported
+FILE_BUDGET_SECONDS = 2.0
+MAX_MATCHES_PER_FILE = 50000
+
+# Threads used to list directories; listing latency, not CPU, is the bottleneck
+WALK_WORKERS = 16
+
+# Bump whenever analyze_text output changes, so content-addressed cache entries are not reused
+ANALYZER_VERSION = '5'
+
+# Default size cap for --cache-dir, in megabytes
+CACHE_SIZE_MB = 512
+
+# Upper bounds of the file size histogram buckets in bytes; the last bucket is open-ended
+SIZE_BUCKETS = [1024, 4096, 16384, 65536, 262144, 1048576]
+SIZE_BUCKET_LABELS = ['<1 KB', '1-4 KB', '4-16 KB', '16-64 KB', '64-256 KB', '256 KB-1 MB', '>=1 MB']
+SIZE_PERCENTILES = [50, 90, 99]
+
+# Largest files listed per language and top-level directory, and for the whole project
+LARGEST_FILES = 5
+LARGEST_FILES_TOTAL = 10
+
+# Watch mode: minimum gap between rescan starts, and how many scans in a row newer changes
+# may cancel before one is left to finish, so a stream of edits cannot starve the outputs
+WATCH_MIN_RESCAN_SECONDS = 1.0
+WATCH_MAX_CONSECUTIVE_CANCELS = 1
+
+# Watch mode rescans at least this often even without changes
+WATCH_PERIODIC_SECONDS = 60
+
+# Warm daemon: idle time before it exits, projects whose per-file results it keeps, and
+# how long a connected client may take to send its command line
+DAEMON_IDLE_SECONDS = 1800
+DAEMON_MAX_PROJECTS = 8
+DAEMON_REQUEST_TIMEOUT = 10.0
+
+# Budget for 'import introspect' as measured with python -X importtime by 'bench startup'
+STARTUP_IMPORT_BUDGET_MS = 25
+
+class BudgetExceeded(Exception):
+    """Raised when analyzing a single file uses up its time or step budget"""
+
+class ScanCancelled(Exception):
+    """Raised inside a scan whose generation was superseded by newer changes"""
+
+class RunLocally(Exception):
+    """Raised inside the daemon for commands the client has to run in its own process"""
+
+class CancelToken:
+    """Cancellation flag of one scan generation, set from the watcher's polling thread"""
+    
+    def __init__(self, generation: int):
+        import threading
+        self.generation = generation
+        self.started = time.monotonic()
+        self.phase = None
+        self.event = threading.Event()
+    
+    def cancel(self):
+        self.event.set()
+    
+    def check(self):
+        """Abort the scan once its generation has been cancelled"""
+        if self.event.is_set():
+            raise ScanCancelled(f"generation {self.generation} was superseded")
+
+class FileBudget:
+    """Time and step allowance for analyzing one file"""
+    
+    def __init__(self, seconds: float, max_steps: int):
+        self.expires = time.perf_counter() + seconds
+        self.max_steps = max_steps
+        self.steps = 0
+    
+    def charge(self, steps: int = 1):
+        """Account for matching work and abort once the budget is spent"""
+        self.steps += steps
+        if self.steps > self.max_steps:
+            raise BudgetExceeded(f"more than {self.max_steps} matches")
+        if time.perf_counter() > self.expires:
+            raise BudgetExceeded("analysis took longer than the per-file budget")
+
+class LineCounter:
+    """Maps increasing offsets to line numbers in a single pass over the text"""
+    
+    def __init__(self, content: str):
+        self.content = content
+        self.offset = 0
+        self.line = 1
+    
+    def line_at(self, offset: int) -> int:
+        if offset < self.offset:
+            self.offset, self.line = 0, 1
+        self.line += self.content.count('\n', self.offset, offset)
+        self.offset = offset
+        return self.line
+
+class ParallelWalker:
+    """Multithreaded work-stealing directory walker built on os.scandir"""
+    
+    def __init__(self, root: Path, should_ignore, workers: int = 16, follow_symlinks: bool = False, scandir=os.scandir):
+        self.root = str(root)
+        self.should_ignore = should_ignore
+        self.workers = max(1, workers)
+        self.follow_symlinks = follow_symlinks
+        self.scandir = scandir
+    
+    def walk(self, file_filter=None) -> List[Tuple[str, int]]:
+        """Return (path, size) for every non-ignored file, sorted by path"""
+        import threading
+        from collections import deque
+        
+        queues = [deque() for _ in range(self.workers)]
+        queues[0].append(self.root)
+        state = {'pending': 1}
+        cond = threading.Condition()
+        results = [[] for _ in range(self.workers)]
+        visited = set()
+        
+        if self.follow_symlinks:
+            root_stat = os.stat(self.root)
+            visited.add((root_stat.st_dev, root_stat.st_ino))
+        
+        def next_dir(index: int) -> Optional[str]:
+            with cond:
+                while True:
+                    # Own queue LIFO for locality, steal the oldest work from others
+                    if queues[index]:
+                        return queues[index].pop()
+                    for other in queues:
+                        if other:
+                            return other.popleft()
+                    if state['pending'] == 0:
+                        return None
+                    cond.wait()
+        
+        def worker(index: int):
+            found = results[index]
+            while True:
+                directory = next_dir(index)
+                if directory is None:
+                    return
+                subdirs = []
+                try:
+                    with self.scandir(directory) as entries:
+                        for entry in entries:
+                            try:
+                                is_dir = entry.is_dir()
+                            except OSError:
+                                is_dir = False
+                            
+                            if is_dir:
+                                # Prune ignored directories before descending
+                                if self.should_ignore(entry.path):
+                                    continue
+                                # Like os.walk, symlinked directories are not descended by default
+                                if entry.is_symlink() and not self.follow_symlinks:
+                                    continue
+                                if self.follow_symlinks:
+                                    # Detect symlink cycles by (device, inode)
+                                    try:
+                                        st = entry.stat()
+                                    except OSError:
+                                        continue
+                                    key = (st.st_dev, st.st_ino)
+                                    with cond:
+                                        if key in visited:
+                                            continue
+                                        visited.add(key)
+                                subdirs.append(entry.path)
+                            else:
+                                if self.should_ignore(entry.path):
+                                    continue
+                                if file_filter is not None and not file_filter(entry.name):
+                                    continue
+                                try:
+                                    found.append((entry.path, entry.stat().st_size))
+                                except OSError:
+                                    continue
+                except OSError:
+                    pass
+                
+                with cond:
+                    queues[index].extend(subdirs)
+                    state['pending'] += len(subdirs) - 1
+                    cond.notify_all()
+        
+        threads = [threading.Thread(target=worker, args=(i,), daemon=True) for i in range(self.workers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        
+        return sorted(item for found in results for item in found)
+
+def decode_text(data: bytes) -> str:
+    """Decode file bytes exactly as Path.read_text(encoding='utf-8', errors='ignore') would"""
+    return data.decode('utf-8', errors='ignore').replace('\r\n', '\n').replace('\r', '\n')
+
+def atomic_write(path: Path, data: bytes):
+    """Write a file via a temporary sibling and rename, so readers never see a partial file"""
+    import tempfile
+    
+    fd, tmp_path = tempfile.mkstemp(dir=str(path.parent), prefix=f".{path.name}.", suffix='.tmp')
+    try:
+        # mkstemp creates 0600; keep the target's mode, or give a new file what open() would
+        try:
+            mode = os.stat(path).st_mode & 0o7777
+        except OSError:
+            umask = os.umask(0)
+            os.umask(umask)
+            mode = 0o666 & ~umask
+        if hasattr(os, 'fchmod'):
+            os.fchmod(fd, mode)
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+
+def json_pointer(parts: List[Any]) -> str:
+    """Build an RFC 6901 JSON Pointer from path segments"""
+    return ''.join('/' + str(p).replace('~', '~0').replace('/', '~1') for p in parts)
+
+def json_patch(old: Any, new: Any, path: Optional[List[Any]] = None) -> List[Dict]:
+    """Compute an RFC 6902 JSON Patch that turns old into new"""
+    path = path or []
+    if old == new:
+        return []
+    
+    if isinstance(old, dict) and isinstance(new, dict):
+        ops = []
+        for key in old:
+            if key not in new:
+                ops.append({'op': 'remove', 'path': json_pointer(path + [key])})
+        for key, value in new.items():
+            if key not in old:
+                ops.append({'op': 'add', 'path': json_pointer(path + [key]), 'value': value})
+            else:
+                ops.extend(json_patch(old[key], value, path + [key]))
+        return ops
+    
+    if isinstance(old, list) and isinstance(new, list):
+        # Skip the common prefix and suffix, then patch the differing middle
+        prefix = 0
+        while prefix < min(len(old), len(new)) and old[prefix] == new[prefix]:
+            prefix += 1
+        suffix = 0
+        while suffix < min(len(old), len(new)) - prefix and old[-1 - suffix] == new[-1 - suffix]:
+            suffix += 1
+        old_mid = old[prefix:len(old) - suffix]
+        new_mid = new[prefix:len(new) - suffix]
+        
+        ops = []
+        common = min(len(old_mid), len(new_mid))
+        for i in range(common):
+            ops.extend(json_patch(old_mid[i], new_mid[i], path + [prefix + i]))
+        for i in reversed(range(common, len(old_mid))):
+            ops.append({'op': 'remove', 'path': json_pointer(path + [prefix + i])})
+        for i in range(common, len(new_mid)):
+            ops.append({'op': 'add', 'path': json_pointer(path + [prefix + i]), 'value': new_mid[i]})
+        return ops
+    
+    return [{'op': 'replace', 'path': json_pointer(path), 'value': new}]
+
+# Summary output formats and the file each one is written to
+SUMMARY_FORMATS = {
+    'json': 'project_summary.json',
+    'json.gz': 'project_summary.json.gz',
+    'ndjson': 'project_summary.ndjson',
+    'bin': 'project_summary.bin',
+}
+
+# Binary summary container: magic, version, header length, then a packed
+# {section: [offset, length]} index followed by the packed sections
+BINARY_MAGIC = b'PJSB'
+BINARY_VERSION = 1
+
+def msgpack_pack(obj: Any) -> bytes:
+    """Encode a JSON-compatible value as MessagePack, preferring the msgpack package"""
+    try:
+        import msgpack
+    except ImportError:
+        out = bytearray()
+        _msgpack_pack_into(obj, out)
+        return bytes(out)
+    return msgpack.packb(obj, use_bin_type=True)
+
+def _msgpack_pack_into(obj: Any, out: bytearray):
+    if obj is None:
+        out.append(0xc0)
+    elif obj is True or obj is False:
+        out.append(0xc3 if obj else 0xc2)
+    elif isinstance(obj, int):
+        if 0 <= obj < 0x80:
+            out.append(obj)
+        elif -32 <= obj < 0:
+            out.append(obj & 0xff)
+        elif obj >= 0:
+            out.append(0xcf)
+            out += struct.pack('>Q', obj)
+        else:
+            out.append(0xd3)
+            out += struct.pack('>q', obj)
+    elif isinstance(obj, float):
+        out.append(0xcb)
+        out += struct.pack('>d', obj)
+    elif isinstance(obj, str):
+        raw = obj.encode('utf-8')
+        n = len(raw)
+        if n < 32:
+            out.append(0xa0 | n)
+        elif n < 0x100:
+            out += bytes((0xd9, n))
+        elif n < 0x10000:
+            out.append(0xda)
+            out += struct.pack('>H', n)
+        else:
+            out.append(0xdb)
+            out += struct.pack('>I', n)
+        out += raw
+    elif isinstance(obj, (list, tuple)):
+        n = len(obj)
+        if n < 16:
+            out.append(0x90 | n)
+        elif n < 0x10000:
+            out.append(0xdc)
+            out += struct.pack('>H', n)
+        else:
+            out.append(0xdd)
+            out += struct.pack('>I', n)
+        for item in obj:
+            _msgpack_pack_into(item, out)
+    elif isinstance(obj, dict):
+        n = len(obj)
+        if n < 16:
+            out.append(0x80 | n)
+        elif n < 0x10000:
+            out.append(0xde)
+            out += struct.pack('>H', n)
+        else:
+            out.append(0xdf)
+            out += struct.pack('>I', n)
+        for key, value in obj.items():
+            _msgpack_pack_into(key, out)
+            _msgpack_pack_into(value, out)
+    else:
+        raise TypeError(f"Cannot pack {type(obj).__name__}")
+
+def msgpack_unpack(data: bytes) -> Any:
+    """Decode MessagePack produced by msgpack_pack"""
+    try:
+        import msgpack
+    except ImportError:
+        value, _ = _msgpack_unpack_from(bytes(data), 0)
+        return value
+    return msgpack.unpackb(data, raw=False, strict_map_key=False)
+
+# Fixed-width MessagePack types: tag -> (struct format, width)
+_MSGPACK_FIXED = {
+    0xca: ('>f', 4), 0xcb: ('>d', 8),
+    0xcc: ('>B', 1), 0xcd: ('>H', 2), 0xce: ('>I', 4), 0xcf: ('>Q', 8),
+    0xd0: ('>b', 1), 0xd1: ('>h', 2), 0xd2: ('>i', 4), 0xd3: ('>q', 8),
+}
+
+# Length-prefixed MessagePack types: tag -> (kind, length width)
+_MSGPACK_SIZED = {
+    0xd9: ('str', 1), 0xda: ('str', 2), 0xdb: ('str', 4),
+    0xc4: ('bin', 1), 0xc5: ('bin', 2), 0xc6: ('bin', 4),
+    0xdc: ('array', 2), 0xdd: ('array', 4),
+    0xde: ('map', 2), 0xdf: ('map', 4),
+}
+
+def _msgpack_unpack_from(buf: bytes, pos: int) -> Tuple[Any, int]:
+    tag = buf[pos]
+    pos += 1
+    if tag < 0x80:
+        return tag, pos
+    if 0xa0 <= tag <= 0xbf:
+        end = pos + (tag & 0x1f)
+        return buf[pos:end].decode('utf-8'), end
+    if 0x80 <= tag <= 0x8f:
+        return _msgpack_unpack_map(buf, pos, tag & 0x0f)
+    if 0x90 <= tag <= 0x9f:
+        return _msgpack_unpack_array(buf, pos, tag & 0x0f)
+    if tag >= 0xe0:
+        return tag - 0x100, pos
+    if tag == 0xc0:
+        return None, pos
+    if tag in (0xc2, 0xc3):
+        return tag == 0xc3, pos
+    if tag in _MSGPACK_FIXED:
+        fmt, width = _MSGPACK_FIXED[tag]
+        return struct.unpack_from(fmt, buf, pos)[0], pos + width
+    if tag not in _MSGPACK_SIZED:
+        raise ValueError(f"Unsupported MessagePack type 0x{tag:02x}")
+    
+    kind, width = _MSGPACK_SIZED[tag]
+    n = int.from_bytes(buf[pos:pos + width], 'big')
+    pos += width
+    if kind == 'str':
+        return buf[pos:pos + n].decode('utf-8'), pos + n
+    if kind == 'bin':
+        return bytes(buf[pos:pos + n]), pos + n
+    if kind == 'array':
+        return _msgpack_unpack_array(buf, pos, n)
+    return _msgpack_unpack_map(buf, pos, n)
+
+def _msgpack_unpack_array(buf: bytes, pos: int, n: int) -> Tuple[List, int]:
+    items = []
+    for _ in range(n):
+        item, pos = _msgpack_unpack_from(buf, pos)
+        items.append(item)
+    return items, pos
+
+def _msgpack_unpack_map(buf: bytes, pos: int, n: int) -> Tuple[Dict, int]:
+    result = {}
+    for _ in range(n):
+        key, pos = _msgpack_unpack_from(buf, pos)
+        result[key], pos = _msgpack_unpack_from(buf, pos)
+    return result, pos
+
+def json_dumps(data: Any, indent: Optional[int] = 2) -> bytes:
+    """Serialize to UTF-8 JSON, using orjson when it is installed"""
+    try:
+        import orjson
+    except ImportError:
+        return json.dumps(data, indent=indent, ensure_ascii=False).encode('utf-8')
+    return orjson.dumps(data, option=orjson.OPT_INDENT_2 if indent else 0)
+
+def encode_summary(data: Dict, fmt: str) -> bytes:
+    """Encode a summary document in one of SUMMARY_FORMATS"""
+    if fmt == 'json':
+        return json_dumps(data)
+    if fmt == 'json.gz':
+        import gzip
+        # mtime=0 keeps identical documents byte-identical
+        return gzip.compress(json_dumps(data, indent=None), compresslevel=6, mtime=0)
+    if fmt == 'ndjson':
+        # One line per scalar section and one per list item, so consumers can stream
+        lines = []
+        for section, value in data.items():
+            if isinstance(value, list):
+                lines.append(json_dumps({'section': section, 'items': len(value)}, indent=None))
+                lines.extend(json_dumps({'section': section, 'item': item}, indent=None) for item in value)
+            else:
+                lines.append(json_dumps({'section': section, 'value': value}, indent=None))
+        return b'\n'.join(lines) + b'\n'
+    if fmt == 'bin':
+        index = {}
+        payloads = []
+        offset = 0
+        for section, value in data.items():
+            packed = msgpack_pack(value)
+            index[section] = [offset, len(packed)]
+            payloads.append(packed)
+            offset += len(packed)
+        header = msgpack_pack(index)
+        return BINARY_MAGIC + struct.pack('>BI', BINARY_VERSION, len(header)) + header + b''.join(payloads)
+    raise ValueError(f"Unknown summary format: {fmt}")
+
+def decode_summary(raw: bytes, fmt: str) -> Dict:
+    """Decode a summary document written by encode_summary"""
+    if fmt == 'json':
+        return json.loads(raw)
+    if fmt == 'json.gz':
+        import gzip
+        return json.loads(gzip.decompress(raw))
+    if fmt == 'ndjson':
+        data = {}
+        for line in raw.splitlines():
+            if not line:
+                continue
+            record = json.loads(line)
+            if 'items' in record:
+                data[record['section']] = []
+            elif 'item' in record:
+                data[record['section']].append(record['item'])
+            else:
+                data[record['section']] = record['value']
+        return data
+    if fmt == 'bin':
+        index, start = _read_binary_index(raw)
+        return {section: msgpack_unpack(raw[start + offset:start + offset + length])
+                for section, (offset, length) in index.items()}
+    raise ValueError(f"Unknown summary format: {fmt}")
+
+def _read_binary_index(head: bytes) -> Tuple[Dict, int]:
+    if head[:4] != BINARY_MAGIC:
+        raise ValueError("Not a binary project summary")
+    version, header_len = struct.unpack_from('>BI', head, 4)
+    if version != BINARY_VERSION:
+        raise ValueError(f"Unsupported binary summary version {version}")
+    start = 9 + header_len
+    return msgpack_unpack(head[9:start]), start
+
+def summary_format_of(path: Path) -> str:
+    """Infer a summary format from a file name, defaulting to JSON"""
+    for fmt in SUMMARY_FORMATS:
+        if path.name.endswith('.' + fmt):
+            return fmt
+    return 'json'
+
+def read_summary(path: Path) -> Dict:
+    """Load a summary document in any supported format"""
+    return decode_summary(path.read_bytes(), summary_format_of(path))
+
+def read_summary_section(path: Path, section: str) -> Any:
+    """Read one section of a summary; binary files are seeked, not fully decoded"""
+    fmt = summary_format_of(path)
+    if fmt != 'bin':
+        return decode_summary(path.read_bytes(), fmt)[section]
+    
+    with open(path, 'rb') as f:
+        prefix = f.read(9)
+        _, header_len = struct.unpack_from('>BI', prefix, 4)
+        index, start = _read_binary_index(prefix + f.read(header_len))
+        offset, length = index[section]
+        f.seek(start + offset)
+        return msgpack_unpack(f.read(length))
+
+class StatCache:
+    """In-memory file analysis results keyed by path, size and modification time"""
+    
+    def __init__(self):
+        self.entries = {}
+        self.used = set()
+        self.hits = 0
+        self.misses = 0
+    
+    @staticmethod
+    def key_for(filepath: Path) -> Optional[Tuple[str, int, int]]:
+        try:
+            st = os.stat(filepath)
+        except OSError:
+            return None
+        return (str(filepath), st.st_size, st.st_mtime_ns)
+    
+    def get(self, key) -> Optional[Dict]:
+        result = self.entries.get(key) if key is not None else None
+        if result is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+            self.used.add(key)
+        return result
+    
+    def put(self, key, result: Dict):
+        if key is not None:
+            self.entries[key] = result
+            self.used.add(key)
+    
+    def touch(self, keys):
+        """Keep entries a workspace package reused without looking them up"""
+        self.used.update(key for key in keys if key is not None)
+    
+    def prune(self):
+        """Drop entries no lookup has used since the last prune, such as superseded file versions"""
+        self.entries = {key: result for key, result in self.entries.items() if key in self.used}
+        self.used = set()
+
+class ContentCache:
+    """File analysis results on disk, keyed by content digest; shareable across checkouts and processes"""
+    
+    def __init__(self, directory: Path, max_bytes: int = CACHE_SIZE_MB * 1024 * 1024):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.written = 0
+    
+    @staticmethod
+    def key_for(filepath: Path) -> Optional[str]:
+        import hashlib
+        try:
+            content = filepath.read_bytes()
+        except OSError:
+            return None
+        # Line metrics depend on the language as well as the content
+        language = ProjectScanner.language_of(filepath.name)
+        return hashlib.sha256(f"{ANALYZER_VERSION}\0{language}\0".encode() + content).hexdigest()
+    
+    def entry_path(self, key: str) -> Path:
+        return self.directory / key[:2] / f"{key}.json"
+    
+    def get(self, key) -> Optional[Dict]:
+        result = None
+        if key is not None:
+            path = self.entry_path(key)
+            try:
+                result = json.loads(path.read_bytes())
+            except (OSError, ValueError):
+                result = None
+            else:
+                # Reads refresh the entry's position in the LRU order
+                try:
+                    os.utime(path)
+                except OSError:
+                    pass
+        if result is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return result
+    
+    def put(self, key, result: Dict):
+        # Skipped and unreadable files depend on timing and permissions, not content
+        if key is None or 'error' in result:
+            return
+        path = self.entry_path(key)
+        data = json_dumps(result, indent=None)
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            atomic_write(path, data)
+        except OSError:
+            return
+        self.written += len(data)
+        if self.written > self.max_bytes // 10:
+            self.prune()
+    
+    def touch(self, keys):
+        """Refresh the LRU position of entries a workspace package reused without reading them"""
+        for key in keys:
+            if key is not None:
+                try:
+                    os.utime(self.entry_path(key))
+                except OSError:
+                    pass
+    
+    def prune(self):
+        """Evict least recently used entries until the cache fits its size cap"""
+        self.written = 0
+        entries = []
+        total = 0
+        for path in self.directory.glob('*/*.json'):
+            try:
+                st = path.stat()
+            except OSError:
+                continue
+            entries.append((st.st_mtime_ns, st.st_size, path))
+            total += st.st_size
+        
+        # Evict down to 90% of the cap so the next prune is not immediately due
+        target = self.max_bytes * 9 // 10
+        for _, size, path in sorted(entries):
+            if total <= target:
+                break
+            try:
+                path.unlink()
+            except OSError:
+                pass
+            total -= size
+
+class PartialResults:
+    """Per-file results carried in shard partials, served through the cache interface"""
+    
+    def __init__(self, root: Path, results: List[Dict]):
+        self.results = {str(root / result['path']): result for result in results}
+    
+    @staticmethod
+    def key_for(filepath: Path) -> str:
+        return str(filepath)
+    
+    def get(self, key) -> Optional[Dict]:
+        return self.results.get(key)
+    
+    def put(self, key, result: Dict):
+        self.results[key] = result
+
+# Upper bounds of the scan and phase latency histograms, in seconds
+LATENCY_BUCKETS = [0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0]
+
+def resident_memory_bytes() -> int:
+    """Current resident set size, or the peak where the current value is unavailable"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError, AttributeError):
+        pass
+    try:
+        import resource
+    except ImportError:
+        return 0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and kilobytes elsewhere
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+class ScanStats:
+    """Counters, gauges and latency histograms of a long-running scanner, rendered in Prometheus text format"""
+    
+    # name: (type, help), in exposition order
+    METRICS = {
+        'introspect_scans_total': ('counter', 'Completed scans'),
+        'introspect_scan_failures_total': ('counter', 'Scans that raised instead of completing'),
+        'introspect_scans_cancelled_total': ('counter', 'Scans abandoned because newer changes superseded their generation'),
+        'introspect_files_analyzed_total': ('counter', 'Files analyzed across all scans'),
+        'introspect_files_skipped_total': ('counter', 'Files skipped for exceeding the per-file budget'),
+        'introspect_cache_hits_total': ('counter', 'Per-file results served from the result cache'),
+        'introspect_cache_misses_total': ('counter', 'Per-file results the result cache did not have'),
+        'introspect_errors_total': ('counter', 'Errors recorded and recovered from, by phase'),
+        'introspect_scan_duration_seconds': ('histogram', 'Wall time of a full scan'),
+        'introspect_phase_duration_seconds': ('histogram', 'Wall time of each scan phase'),
+        'introspect_change_latency_seconds': ('histogram', 'Time from detecting a change to writing outputs that include it'),
+        'introspect_last_scan_files': ('gauge', 'Files analyzed by the last scan'),
+        'introspect_last_scan_timestamp_seconds': ('gauge', 'Unix time the last scan completed'),
+        'introspect_last_scan_duration_seconds': ('gauge', 'Wall time of the last scan'),
+        'introspect_pending_changes': ('gauge', 'File changes seen by the watcher and not yet reflected in the outputs'),
+        'introspect_scan_generation': ('gauge', 'Generation of the newest scan started by the watcher'),
+        'introspect_watch_interval_seconds': ('gauge', 'Configured watch poll interval'),
+        'introspect_resident_memory_bytes': ('gauge', 'Resident set size of the scanner process'),
+        'introspect_start_time_seconds': ('gauge', 'Unix time the scanner started'),
+    }
+    
+    def __init__(self):
+        import threading
+        self.lock = threading.Lock()
+        self.values = {}
+        self.histograms = {}
+        for name in ('introspect_scans_total', 'introspect_scan_failures_total', 'introspect_scans_cancelled_total',
+                     'introspect_files_analyzed_total',
+                     'introspect_files_skipped_total', 'introspect_cache_hits_total', 'introspect_cache_misses_total'):
+            self.values[(name, ())] = 0
+        self.set('introspect_start_time_seconds', time.time())
+    
+    def inc(self, name: str, amount: float = 1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+    
+    def set(self, name: str, value: float, **labels):
+        with self.lock:
+            self.values[(name, tuple(sorted(labels.items())))] = value
+    
+    def observe(self, name: str, value: float, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            counts = self.histograms.get(key)
+            if counts is None:
+                # One count per bucket plus +Inf, then the sum
+                counts = self.histograms[key] = [0] * (len(LATENCY_BUCKETS) + 1) + [0.0]
+            for i, bound in enumerate(LATENCY_BUCKETS):
+                if value <= bound:
+                    counts[i] += 1
+                    break
+            else:
+                counts[len(LATENCY_BUCKETS)] += 1
+            counts[-1] += value
+    
+    def get(self, name: str, **labels) -> float:
+        return self.values.get((name, tuple(sorted(labels.items()))), 0)
+    
+    @staticmethod
+    def format_labels(labels, extra: Tuple = ()) -> str:
+        pairs = list(labels) + list(extra)
+        if not pairs:
+            return ''
+        escaped = (str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, v in pairs)
+        return '{' + ','.join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + '}'
+    
+    def render(self) -> str:
+        """Render every metric in the Prometheus text exposition format"""
+        self.set('introspect_resident_memory_bytes', resident_memory_bytes())
+        lines = []
+        with self.lock:
+            for name, (kind, help_text) in self.METRICS.items():
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} {kind}")
+                if kind == 'histogram':
+                    for (metric, labels), counts in sorted(self.histograms.items()):
+                        if metric != name:
+                            continue
+                        cumulative = 0
+                        for bound, count in zip(LATENCY_BUCKETS + ['+Inf'], counts):
+                            cumulative += count
+                            lines.append(f"{name}_bucket{self.format_labels(labels, (('le', bound),))} {cumulative}")
+                        lines.append(f"{name}_sum{self.format_labels(labels)} {counts[-1]:.6f}")
+                        lines.append(f"{name}_count{self.format_labels(labels)} {cumulative}")
+                else:
+                    for (metric, labels), value in sorted(self.values.items()):
+                        if metric == name:
+                            lines.append(f"{name}{self.format_labels(labels)} {value}")
+        return '\n'.join(lines) + '\n'
+
+def serve_metrics(stats: ScanStats, port: int):
+    """Serve stats on http://127.0.0.1:port/metrics from a daemon thread"""
+    import threading
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+    
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split('?', 1)[0] != '/metrics':
+                self.send_error(404)
+                return
+            body = stats.render().encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        
+        def log_message(self, format, *args):
+            pass
+    
+    server = ThreadingHTTPServer(('127.0.0.1', port), MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name='metrics', daemon=True).start()
+    return server
+
+# Partial results written by --shard, named after the shard they hold
+SHARD_FILE = 'project_summary.shard-{index}-of-{count}.json'
+SHARD_FILE_PREFIX = 'project_summary.shard-'
+
+def shard_of(rel_path: str, count: int) -> int:
+    """Assign a project-relative path to a shard (0-based), identically on every machine"""
+    import hashlib
+    digest = hashlib.sha1(rel_path.encode('utf-8')).digest()
+    return int.from_bytes(digest[:8], 'big') % count
+
+def grouped_stats(keys, sizes, columns: Dict[str, Any], groups: int) -> Dict:
+    """Per-group file counts, column sums and size histograms, plus file order by (group, size descending)
+    
+    keys, sizes and every column are int64 arrays with one entry per file; NumPy
+    aggregates them in bulk when it is installed.
+    """
+    try:
+        import numpy as np
+    except ImportError:
+        return _grouped_stats_py(keys, sizes, columns, groups)
+    
+    key = np.asarray(keys, dtype=np.int64)
+    size = np.asarray(sizes, dtype=np.int64)
+    buckets = len(SIZE_BUCKETS) + 1
+    bucket = np.searchsorted(np.asarray(SIZE_BUCKETS, dtype=np.int64), size, side='right')
+    histograms = np.bincount(key * buckets + bucket, minlength=groups * buckets).reshape(groups, buckets)
+    return {
+        'counts': np.bincount(key, minlength=groups).tolist(),
+        'sums': {name: [int(round(v)) for v in np.bincount(key, weights=np.asarray(column, dtype=np.int64), minlength=groups)]
+                 for name, column in columns.items()},
+        'histograms': histograms.tolist(),
+        'order': np.lexsort((-size, key)).tolist(),
+    }
+
+def _grouped_stats_py(keys, sizes, columns: Dict[str, Any], groups: int) -> Dict:
+    from bisect import bisect_right
+    
+    counts = [0] * groups
+    histograms = [[0] * (len(SIZE_BUCKETS) + 1) for _ in range(groups)]
+    for key, size in zip(keys, sizes):
+        counts[key] += 1
+        histograms[key][bisect_right(SIZE_BUCKETS, size)] += 1
+    sums = {}
+    for name, column in columns.items():
+        total = sums[name] = [0] * groups
+        for key, value in zip(keys, column):
+            total[key] += value
+    return {
+        'counts': counts,
+        'sums': sums,
+        'histograms': histograms,
+        'order': sorted(range(len(keys)), key=lambda i: (keys[i], -sizes[i])),
+    }
+
+def format_size(size: int) -> str:
+    """Render a byte count for the Markdown guide"""
+    if size < 1024:
+        return f"{size} B"
+    if size < 1024 * 1024:
+        return f"{size / 1024:.1f} KB"
+    return f"{size / 1024 / 1024:.1f} MB"
+
+def comment_scanner(line_prefix: Optional[str], block: Optional[Tuple[str, str]]) -> Optional[re.Pattern]:
+    """Compile the regex matching comment lines and whole block comments of one comment syntax"""
+    alternatives = []
+    if block:
+        # Unrolled body up to the closing delimiter; an unclosed block runs to the end of the file
+        first, rest = re.escape(block[1][0]), re.escape(block[1][1:])
+        alternatives.append(rf'{re.escape(block[0])}[^{first}]*(?:{first}(?!{rest})[^{first}]*)*(?:{re.escape(block[1])}|\Z)')
+    if line_prefix:
+        alternatives.append(rf'(?:{line_prefix})')
+    if not alternatives:
+        return None
+    # Every line, the first included, starts at a newline in the text line_metrics scans
+    return re.compile(rf'\n[ \t]*(?:{"|".join(alternatives)})')
+
+def workspace_pattern(glob: str) -> re.Pattern:
+    """Compile an npm/Yarn workspaces glob: * and ? stay within a path segment, ** spans any number"""
+    glob = glob[2:] if glob.startswith('./') else glob
+    glob = glob.rstrip('/')
+    regex = ''
+    i = 0
+    while i < len(glob):
+        if glob.startswith('**/', i):
+            regex += '(?:[^/]+/)*'
+            i += 3
+        elif glob.startswith('**', i):
+            regex += '.*'
+            i += 2
+        elif glob[i] == '*':
+            regex += '[^/]*'
+            i += 1
+        elif glob[i] == '?':
+            regex += '[^/]'
+            i += 1
+        else:
+            regex += re.escape(glob[i])
+            i += 1
+    return re.compile(regex)
+
+def route_segments(path: str) -> List[str]:
+    """Split a route path into its non-empty segments"""
+    return [segment for segment in path.split('/') if segment]
+
+class RouteNode:
+    """One path segment position in a RouteTrie"""
+    __slots__ = ('static', 'param', 'wildcard', 'routes')
+    
+    def __init__(self):
+        self.static = {}
+        self.param = None
+        self.wildcard = None
+        # Method -> (registration number, route)
+        self.routes = {}
+
+class RouteTrie:
+    """Fully qualified routes keyed by path segment; ':name' matches one segment and '*' the rest"""
+    
+    def __init__(self):
+        self.root = RouteNode()
+        self.registered = 0
+    
+    def insert(self, route: Dict) -> List[Dict]:
+        """Add a route in registration order and return the conflicts or shadowing it exposes"""
+        segments = route_segments(route['path'])
+        node = self.root
+        for segment in segments:
+            if segment == '*':
+                node.wildcard = node.wildcard or RouteNode()
+                node = node.wildcard
+                break
+            if segment.startswith(':'):
+                node.param = node.param or RouteNode()
+                node = node.param
+            else:
+                node = node.static.setdefault(segment, RouteNode())
+        
+        existing = node.routes.get(route['method'])
+        if existing is not None:
+            if (existing[1]['file'], existing[1]['line']) == (route['file'], route['line']):
+                return []
+            # Express keeps dispatching to the first registration of an identical pattern
+            return [self.issue('conflict', route, existing[1])]
+        
+        # Every route already in the trie was registered earlier, and Express dispatches to the
+        # first match, so any of them that matches some of the new route's URLs takes those URLs
+        issues = [self.issue('shadowed' if covers else 'overlap', route, earlier)
+                  for covers, earlier in self.overlapping(self.root, segments, 0, route['method'], True)]
+        node.routes[route['method']] = (self.registered, route)
+        self.registered += 1
+        return issues
+    
+    @staticmethod
+    def matching(node: RouteNode, method: str) -> List[Tuple[int, Dict]]:
+        """The routes at a node that accept a method"""
+        return [entry for m, entry in node.routes.items() if m in (method, 'ALL')]
+    
+    def overlapping(self, node: RouteNode, segments: List[str], i: int, method: str, covers: bool) -> List[Tuple[bool, Dict]]:
+        """(covers every URL of the new route, route) for earlier routes sharing some of its URLs"""
+        found = []
+        if node.wildcard is not None:
+            found.extend((covers, route) for _, route in self.matching(node.wildcard, method))
+        if i == len(segments):
+            found.extend((covers, route) for _, route in self.matching(node, method))
+            return found
+        segment = segments[i]
+        if segment == '*':
+            # The new route takes any rest; everything registered below here shares some of it
+            stack = [node]
+            while stack:
+                below = stack.pop()
+                if below is not node:
+                    found.extend((False, route) for _, route in self.matching(below, method))
+                stack.extend(below.static.values())
+                stack.extend(child for child in (below.param, below.wildcard if below is not node else None) if child)
+            return found
+        if segment.startswith(':'):
+            # A parameter is caught by an earlier parameter for all values, by a static segment for one
+            if node.param is not None:
+                found.extend(self.overlapping(node.param, segments, i + 1, method, covers))
+            for child in node.static.values():
+                found.extend(self.overlapping(child, segments, i + 1, method, False))
+            return found
+        if segment in node.static:
+            found.extend(self.overlapping(node.static[segment], segments, i + 1, method, covers))
+        if node.param is not None:
+            found.extend(self.overlapping(node.param, segments, i + 1, method, covers))
+        return found
+    
+    def lookup(self, method: str, url: str) -> Optional[Tuple[Dict, Dict[str, str]]]:
+        """Find the route serving a URL and its parameters: of all matching routes, the earliest registered"""
+        segments = route_segments(url.split('?')[0])
+        
+        def walk(node: RouteNode, i: int) -> List[Tuple[int, Dict]]:
+            found = self.matching(node.wildcard, method) if node.wildcard is not None else []
+            if i == len(segments):
+                return found + self.matching(node, method)
+            child = node.static.get(segments[i])
+            if child is not None:
+                found += walk(child, i + 1)
+            if node.param is not None:
+                found += walk(node.param, i + 1)
+            return found
+        
+        found = walk(self.root, 0)
+        if not found:
+            return None
+        route = min(found, key=lambda entry: entry[0])[1]
+        params = {}
+        for i, segment in enumerate(route_segments(route['path'])):
+            if segment == '*':
+                params['*'] = '/'.join(segments[i:])
+                break
+            if segment.startswith(':'):
+                params[segment[1:]] = segments[i]
+        return route, params
+    
+    @staticmethod
+    def issue(kind: str, route: Dict, by: Dict) -> Dict:
+        return {
+            'kind': kind,
+            'method': route['method'],
+            'path': route['path'],
+            'file': route['file'],
+            'line': route['line'],
+            'by': {'method': by['method'], 'path': by['path'], 'file': by['file'], 'line': by['line']},
+        }
+
+class ScanEvent:
+    """Base of the events ProjectScanner.iter_scan yields and hands to sinks"""
+    __slots__ = ()
+    kind = 'event'
+    
+    def __repr__(self):
+        fields = ', '.join(f"{name}={getattr(self, name)!r}" for name in self.__slots__)
+        return f"{type(self).__name__}({fields})"
+
+class Progress(ScanEvent):
+    """A human-readable progress line, as the command line prints it"""
+    __slots__ = ('message',)
+    kind = 'progress'
+    
+    def __init__(self, message: str):
+        self.message = message
+
+class FileDiscovered(ScanEvent):
+    """A file of the inventory, by project-relative path, before any file is analyzed"""
+    __slots__ = ('path', 'size')
+    kind = 'file_discovered'
+    
+    def __init__(self, path: str, size: int):
+        self.path = path
+        self.size = size
+
+class FileAnalyzed(ScanEvent):
+    """The analysis result of one file, as stored in the cache"""
+    __slots__ = ('path', 'result')
+    kind = 'file_analyzed'
+    
+    def __init__(self, path: str, result: Dict):
+        self.path = path
+        self.result = result
+
+class PhaseFinished(ScanEvent):
+    """A scan phase that completed, with the seconds spent in it"""
+    __slots__ = ('name', 'seconds')
+    kind = 'phase_finished'
+    
+    def __init__(self, name: str, seconds: float):
+        self.name = name
+        self.seconds = seconds
+
+class SummaryReady(ScanEvent):
+    """The finished ProjectInfo; always the last event of a summarizing scan"""
+    __slots__ = ('info',)
+    kind = 'summary_ready'
+    
+    def __init__(self, info: ProjectInfo):
+        self.info = info
+
+def console_sink(event: ScanEvent):
+    """Default sink: print progress lines to stdout"""
+    if event.kind == 'progress':
+        print(event.message)
 
 class ProjectScanner:
     """Main scanner class that analyzes the project"""
@@ -103,6 +1239,11 @@ class ProjectScanner:
             '\\out\\',
             'out/',
             'out\\',
+            # Scanner state (snapshots)
+            '/.introspect/',
+            '\\.introspect\\',
+            '.introspect/',
+            '.introspect\\',
             # Binary files
             '.jpg', '.jpeg', '.png', '.gif', '.bmp', '.ico',
             '.pdf', '.doc', '.docx', '.xls', '.xlsx',
@@ -156,63 +1297,263 @@ class ProjectScanner:
         'Vite': ['vite.config.js', 'vite.config.ts', 'vite'],
     }
     
-    def __init__(self, project_path: str):
+    # Manifests analyzed first when a scan runs against a deadline
+    MANIFEST_FILES = {
+        'package.json', 'requirements.txt', 'pom.xml', 'build.gradle', 'build.gradle.kts',
+        'docker-compose.yml', 'Dockerfile', 'Makefile', 'tsconfig.json', 'README.md'
+    }
+    
+    # Directory names that mark backend/route code (second priority tier)
+    BACKEND_DIR_NAMES = {
+        'server', 'backend', 'api', 'routes', 'controllers', 'middleware', 'services'
+    }
+    
+    # Declared dependencies that make a workspace package a frontend or a backend
+    FRONTEND_PACKAGES = {'react', 'react-dom', 'next', 'vue', 'nuxt', '@angular/core', 'svelte', '@sveltejs/kit', 'vite'}
+    BACKEND_PACKAGES = {'express', 'fastify', 'koa', '@nestjs/core', '@hapi/hapi', 'hapi', 'restify'}
+    
+    # Database indicators looked up in the lowercased file content
+    DB_PATTERNS = {
+        'MongoDB': ['mongoose', 'mongodb'],
+        'PostgreSQL': ['postgresql', 'postgres', 'psycopg'],
+        'MySQL': ['mysql'],
+        'SQLite': ['sqlite'],
+        'Redis': ['redis', 'ioredis'],
+    }
+    
+    def __init__(self, project_path: str, deadline: Optional[float] = None, sample_rate: Optional[float] = None,
+                 sinks: Optional[List[Callable[[ScanEvent], None]]] = None, cache: Any = None,
+                 output_dir: Optional[str] = None):
         self.project_path = Path(project_path).resolve()
         self.project_name = self.project_path.name
+        self.output_dir = Path(output_dir).resolve() if output_dir else self.project_path
+        self.sinks = [console_sink] if sinks is None else list(sinks)
+        import threading
+        # The watcher's poller thread reports progress while iter_scan swaps the queue on the main thread
+        self.pending_lock = threading.Lock()
+        self.pending = None
         self.file_hashes = {}
         self.watch_mode = False
         self.last_scan_time = 0
+        self.deadline = deadline
+        self.sample_rate = sample_rate
+        self.coverage = {}
+        self.file_budget = FILE_BUDGET_SECONDS
+        self.skipped_files = []
+        self.skipped_stages = []
+        self.walk_workers = WALK_WORKERS
+        self.follow_symlinks = False
+        self.emit_patches = False
+        self.output_format = 'json'
+        self.cache = cache
+        self.file_results = []
+        self.file_keys = {}
+        self.output_digests = {}
+        self.output_documents = {}
+        # Outputs an earlier run left in the project root are not project files either
+        self.output_paths = {str(folder / name) for folder in (self.output_dir, self.project_path)
+                             for name in self.OUTPUT_FILES}
+        self.project_files = None
+        self.project_texts = {}
+        self.total_files = 0
+        # Found from the git directory on first use, so snapshots stay out of the work tree
+        self.snapshot_dir = None
+        self.index_path = None
+        self.stats = ScanStats()
+        self.scan_errors = []
+        self.phase_times = {}
+        self.last_scan = {}
+        self.metrics_file = None
+        self.scan_log = None
+        self.cancel_token = None
         
     def get_file_hash(self, filepath: Path) -> str:
         """Get hash of file for change detection"""
+        import hashlib
         try:
             content = filepath.read_bytes()
             return hashlib.md5(content).hexdigest()
-        except:
+        except OSError as e:
+            self.record_error('watch', e, filepath)
             return ""
     
+    def record_error(self, phase: str, error: Any, path: Optional[Path] = None):
+        """Count an error a phase recovered from, and keep it for the scan log"""
+        self.stats.inc('introspect_errors_total', phase=phase)
+        self.scan_errors.append({
+            'phase': phase,
+            'path': str(path.relative_to(self.project_path)).replace('\\', '/') if path is not None else None,
+            'error': error if isinstance(error, str) else f"{type(error).__name__}: {error}",
+        })
+    
+    def emit(self, event: ScanEvent):
+        """Queue an event for the running iter_scan, or hand it to the sinks outside of one"""
+        with self.pending_lock:
+            if self.pending is not None:
+                self.pending.append(event)
+                return
+        self.dispatch(event)
+    
+    def dispatch(self, event: ScanEvent):
+        for sink in self.sinks:
+            sink(event)
+    
+    def progress(self, message: str):
+        """Report a progress line; the console sink prints it"""
+        self.emit(Progress(message))
+    
+    def check_cancelled(self):
+        """Abort the running scan if newer changes have superseded it"""
+        if self.cancel_token is not None:
+            self.cancel_token.check()
+    
+    @contextmanager
+    def phase(self, name: str):
+        """Time one scan phase into the phase latency histogram, starting it only if the scan is still current"""
+        self.check_cancelled()
+        if self.cancel_token is not None:
+            self.cancel_token.phase = name
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            self.phase_times[name] = self.phase_times.get(name, 0.0) + elapsed
+            self.stats.observe('introspect_phase_duration_seconds', elapsed, phase=name)
+        self.emit(PhaseFinished(name, elapsed))
+    
+    # Scan phases a superseded watch scan may be cancelled in; the others are cheap next to a restart
+    CANCELLABLE_PHASES = {'walk', 'analyze'}
+    
+    # Files the scanner writes into the project; never scanned or watched
+    OUTPUT_FILES = list(SUMMARY_FORMATS.values()) + ['PROJECT_GUIDE.md', 'project_summary.patch.jsonl']
+    
+    # Extensionless or special files that are always part of the inventory
+    SPECIAL_FILES = {'Dockerfile', 'Makefile', 'docker-compose.yml', 'package.json', 'requirements.txt', 'server.js', 'app.js', 'index.js', 'main.py', 'manage.py'}
+    
+    # Files whose presence or content the repo-wide stages look at; indexed during the walk
+    PROJECT_FILES = {'package.json', 'requirements.txt', 'pom.xml', 'build.gradle', 'build.gradle.kts',
+                     'README.md', 'README.txt', 'README', 'readme.md', 'server.js', 'app.js', 'index.js', 'main.js',
+                     'manage.py', 'app.py', 'docker-compose.yml', 'Dockerfile', 'Makefile', 'gradlew'}
+    
+    # Project files whose text the repo-wide stages parse
+    PROJECT_TEXT_FILES = {'package.json', 'requirements.txt', 'README.md', 'README.txt', 'README', 'readme.md'}
+    
+    def is_code_file(self, name: str) -> bool:
+        """Check whether a file name belongs in the analyzed inventory"""
+        return os.path.splitext(name)[1].lower() in self.CODE_EXTENSIONS or name in self.SPECIAL_FILES
+    
+    def walk_files(self, file_filter=None) -> List[Tuple[str, int]]:
+        """List non-ignored files under the project with their sizes"""
+        walker = ParallelWalker(self.project_path, self.should_ignore, workers=self.walk_workers,
+                                follow_symlinks=self.follow_symlinks)
+        return [(path, size) for path, size in walker.walk(file_filter) if not self.is_output_file(path)]
+    
+    def is_output_file(self, path_str: str) -> bool:
+        """Check whether a path is one of the files the scanner itself writes"""
+        return path_str in self.output_paths or os.path.basename(path_str).startswith(SHARD_FILE_PREFIX)
+    
     def scan_directory(self) -> Dict:
         """Scan the entire project directory"""
-        print(f"🔍 Scanning project: {self.project_name}")
+        self.progress(f"🔍 Scanning project: {self.project_name}")
         
         all_files = []
+        sizes = {}
         total_size = 0
         scanned_folders = set()
+        project_files = []
+        total_files = 0
         
-        for root, dirs, files in os.walk(self.project_path):
-            root_path = Path(root)
+        for path_str, size in self.walk_files():
+            total_files += 1
+            name = os.path.basename(path_str)
+            if name in self.PROJECT_FILES:
+                project_files.append(Path(path_str))
+            if not self.is_code_file(name):
+                continue
             
-            # Filter out ignored directories BEFORE processing
-            dirs[:] = [d for d in dirs if not self.should_ignore(str(root_path / d))]
+            filepath = Path(path_str)
+            all_files.append(filepath)
+            sizes[filepath] = size
+            total_size += size
             
-            for file in files:
-                filepath = root_path / file
-                filepath_str = str(filepath)
-                
-                if self.should_ignore(filepath_str):
-                    continue
-                
-                # Check file extension
-                ext = filepath.suffix.lower()
-                if ext in self.CODE_EXTENSIONS or file in ['Dockerfile', 'Makefile', 'docker-compose.yml', 'package.json', 'requirements.txt', 'server.js', 'app.js', 'index.js', 'main.py', 'manage.py']:
-                    all_files.append(filepath)
-                    total_size += filepath.stat().st_size
-                    
-                    # Track folders
-                    folder = str(filepath.parent.relative_to(self.project_path))
-                    if folder != '.':
-                        scanned_folders.add(folder)
+            # Track folders
+            folder = os.path.dirname(os.path.relpath(path_str, self.project_path))
+            if folder:
+                scanned_folders.add(folder)
         
-        print(f"📁 Found {len(all_files)} code/config files in {len(scanned_folders)} folders ({total_size/1024/1024:.1f} MB)")
+        self.progress(f"📁 Found {len(all_files)} code/config files in {len(scanned_folders)} folders ({total_size/1024/1024:.1f} MB)")
         if scanned_folders:
             sorted_folders = sorted(scanned_folders)
-            print(f"📂 Folders scanned: {', '.join(sorted_folders[:10])}{'...' if len(sorted_folders) > 10 else ''}")
+            self.progress(f"📂 Folders scanned: {', '.join(sorted_folders[:10])}{'...' if len(sorted_folders) > 10 else ''}")
         return {
             'files': all_files,
-            'total_size': total_size
+            'sizes': sizes,
+            'total_size': total_size,
+            'project_files': project_files,
+            'total_files': total_files
+        }
+    
+    def inventory_from_paths(self, paths: Iterable[str]) -> Dict:
+        """Build a scan_directory()-style inventory from a caller's file list instead of walking the tree"""
+        files = []
+        sizes = {}
+        project_files = []
+        total_files = 0
+        root = str(self.project_path) + os.sep
+        for path in sorted({os.path.normpath(os.path.join(self.project_path, path)) for path in paths}):
+            if not path.startswith(root):
+                raise ValueError(f"{path} is not inside {self.project_path}")
+            if self.should_ignore(path) or self.is_output_file(path):
+                continue
+            try:
+                size = os.stat(path).st_size
+            except OSError as e:
+                self.record_error('walk', e, Path(path))
+                continue
+            total_files += 1
+            name = os.path.basename(path)
+            if name in self.PROJECT_FILES:
+                project_files.append(Path(path))
+            if self.is_code_file(name):
+                files.append(Path(path))
+                sizes[Path(path)] = size
+        
+        return {
+            'files': files,
+            'sizes': sizes,
+            'total_size': sum(sizes.values()),
+            'project_files': project_files,
+            'total_files': total_files
         }
     
-    def detect_stack(self, files: List[Path]) -> List[str]:
+    def find_project_files(self, name: str) -> List[Path]:
+        """List the non-ignored project files with the given name, in path order"""
+        if self.project_files is None:
+            self.project_files = [Path(path) for path, _ in self.walk_files(lambda n: n in self.PROJECT_FILES)]
+        return [f for f in self.project_files if f.name == name]
+    
+    def manifests_named(self, name: str, manifests: Optional[List[Path]] = None) -> List[Path]:
+        """Project files with the given name, from one package's manifests when given"""
+        if manifests is None:
+            return self.find_project_files(name)
+        return [f for f in manifests if f.name == name]
+    
+    def has_root_file(self, name: str) -> bool:
+        """Check whether the project root contains the given project file"""
+        return any(f.parent == self.project_path for f in self.find_project_files(name))
+    
+    def read_project_file(self, path: Path) -> str:
+        """Read a project file, preferring text carried over from shard partials"""
+        rel_path = str(path.relative_to(self.project_path)).replace('\\', '/')
+        if rel_path in self.project_texts:
+            text = self.project_texts[rel_path]
+            if text is None:
+                raise OSError(f"{rel_path} was unreadable when its shard was scanned")
+            return text
+        return path.read_text(encoding='utf-8', errors='ignore')
+    
+    def detect_stack(self, files: List[Path], manifests: Optional[List[Path]] = None) -> List[str]:
         """Detect technology stack"""
         detected = set()
         file_names = [f.name for f in files]
@@ -231,133 +1572,366 @@ class ProjectScanner:
                     detected.add(framework)
         
         # Read package.json for Node.js projects (excluding node_modules)
-        for package_file in self.project_path.rglob('package.json'):
-            if self.should_ignore(str(package_file)):
-                continue
-                
+        for package_file in self.manifests_named('package.json', manifests):
             try:
-                with open(package_file, 'r') as f:
-                    data = json.load(f)
-                    deps = list(data.get('dependencies', {}).keys()) + list(data.get('devDependencies', {}).keys())
-                    
-                    # Check dependencies against frameworks
-                    for dep in deps:
-                        for framework, patterns in self.FRAMEWORK_PATTERNS.items():
-                            if any(pattern.lower() in dep.lower() for pattern in patterns if not pattern.endswith('/') and not '/' in pattern):
-                                detected.add(framework)
-            except:
-                pass
-        
-        # Read requirements.txt for Python projects
-        for req_file in self.project_path.rglob('requirements.txt'):
-            if self.should_ignore(str(req_file)):
-                continue
+                data = json.loads(self.read_project_file(package_file))
+                deps = list(data.get('dependencies', {}).keys()) + list(data.get('devDependencies', {}).keys())
                 
-            try:
-                with open(req_file, 'r') as f:
-                    content = f.read().lower()
+                # Check dependencies against frameworks
+                for dep in deps:
                     for framework, patterns in self.FRAMEWORK_PATTERNS.items():
-                        if any(pattern.lower() in content for pattern in patterns if not pattern.endswith('/') and not '/' in pattern):
+                        if any(pattern.lower() in dep.lower() for pattern in patterns if not pattern.endswith('/') and not '/' in pattern):
                             detected.add(framework)
-            except:
-                pass
+            except Exception as e:
+                self.record_error('detect_stack', e, package_file)
+        
+        # Read requirements.txt for Python projects
+        for req_file in self.manifests_named('requirements.txt', manifests):
+            try:
+                content = self.read_project_file(req_file).lower()
+                for framework, patterns in self.FRAMEWORK_PATTERNS.items():
+                    if any(pattern.lower() in content for pattern in patterns if not pattern.endswith('/') and not '/' in pattern):
+                        detected.add(framework)
+            except Exception as e:
+                self.record_error('detect_stack', e, req_file)
         
         return sorted(list(detected))
     
-    def analyze_file_content(self, filepath: Path) -> Dict:
-        """Extract information from file content"""
+    def analyze_file_content(self, filepath: Path, data: Optional[bytes] = None) -> Dict:
+        """Extract information from file content, or from its already-loaded bytes"""
+        rel_path = str(filepath.relative_to(self.project_path)).replace('\\', '/')
         try:
-            content = filepath.read_text(encoding='utf-8', errors='ignore')
-            rel_path = str(filepath.relative_to(self.project_path)).replace('\\', '/')
-            
-            info = {
+            if data is None:
+                content = filepath.read_text(encoding='utf-8', errors='ignore')
+            else:
+                content = decode_text(data)
+            return self.analyze_text(content, rel_path)
+        except BudgetExceeded as e:
+            return {
                 'path': rel_path,
-                'todos': [],
-                'apis': [],
-                'imports': [],
-                'config': {}
+                'error': str(e),
+                'skipped': True
             }
-            
-            # Find TODO/FIXME comments
-            todo_patterns = [
-                r'#\s*(TODO|FIXME|HACK|BUG|XXX):?\s*(.*)',
-                r'//\s*(TODO|FIXME|HACK|BUG|XXX):?\s*(.*)',
-                r'/\*\s*(TODO|FIXME|HACK|BUG|XXX):?\s*(.*?)\*/',
-            ]
-            
-            for pattern in todo_patterns:
-                for match in re.finditer(pattern, content, re.IGNORECASE | re.MULTILINE):
-                    info['todos'].append({
-                        'type': match.group(1).upper(),
-                        'text': match.group(2).strip(),
-                        'line': content[:match.start()].count('\n') + 1
-                    })
-            
-            # Detect API routes (common patterns)
-            api_patterns = [
-                (r'router\.(get|post|put|delete|patch)\(["\']([^"\']+)["\']', 'Express.js'),
-                (r'@(Get|Post|Put|Delete|Patch)\(["\']([^"\']+)["\']', 'NestJS/Spring'),
-                (r'path\(["\']([^"\']+)["\']\)', 'Django'),
-                (r'@app\.route\(["\']([^"\']+)["\']\)', 'Flask'),
-                (r'Route::(get|post|put|delete)\(["\']([^"\']+)["\']', 'Laravel'),
-                (r'app\.(get|post|put|delete|patch)\(["\']([^"\']+)["\']', 'Express.js'),
-            ]
-            
-            for pattern, framework in api_patterns:
-                for match in re.finditer(pattern, content, re.IGNORECASE):
-                    path = match.group(2) if len(match.groups()) > 1 else match.group(1)
-                    method = match.group(1).upper() if len(match.groups()) > 0 else 'GET'
-                    info['apis'].append({
-                        'path': path,
-                        'method': method,
-                        'framework': framework,
-                        'file': rel_path
-                    })
-            
-            # Extract imports
-            import_patterns = [
-                r'import\s+.*?\s+from\s+["\']([^"\']+)["\']',  # ES6 imports
-                r'require\(["\']([^"\']+)["\']\)',  # CommonJS
-                r'using\s+([^;]+);',  # C#
-                r'#include\s+[<"]([^>"]+)[>"]',  # C/C++
-            ]
-            
-            for pattern in import_patterns:
-                for match in re.finditer(pattern, content):
-                    info['imports'].append(match.group(1))
-            
-            # Extract configuration (common patterns)
-            config_patterns = [
-                (r'PORT\s*=\s*(\d+)', 'port'),
-                (r'DATABASE_URL\s*=\s*["\']([^"\']+)["\']', 'database_url'),
-                (r'DEBUG\s*=\s*(True|False)', 'debug'),
-                (r'NODE_ENV\s*=\s*["\']([^"\']+)["\']', 'environment'),
-                (r'MONGODB_URI\s*=\s*["\']([^"\']+)["\']', 'mongodb_uri'),
-                (r'MONGO_URI\s*=\s*["\']([^"\']+)["\']', 'mongo_uri'),
-            ]
-            
-            for pattern, key in config_patterns:
-                match = re.search(pattern, content)
-                if match:
-                    info['config'][key] = match.group(1)
-            
-            return info
-            
         except Exception as e:
             return {
-                'path': str(filepath.relative_to(self.project_path)).replace('\\', '/'),
+                'path': rel_path,
                 'error': str(e)
             }
     
-    def analyze_architecture(self, files: List[Path], stack: List[str]) -> Dict:
-        """Analyze project architecture"""
-        dirs = set()
-        frontend_dirs = set()
-        backend_dirs = set()
-        api_dirs = set()
-        
-        for file in files:
-            rel_path = str(file.relative_to(self.project_path)).replace('\\', '/')
+    # Every pattern below is linear in the input: repeated quantifiers are either
+    # bounded or stop at a delimiter that also starts the next possible match.
+    # They are compiled with their flags once at import: passing pattern strings to re
+    # costs a cache lookup and flag handling on every call, a few times per file.
+    TODO_LINE_PATTERNS = [
+        re.compile(r'#\s*(TODO|FIXME|HACK|BUG|XXX):?\s*(.*)', re.IGNORECASE | re.MULTILINE),
+        re.compile(r'//\s*(TODO|FIXME|HACK|BUG|XXX):?\s*(.*)', re.IGNORECASE | re.MULTILINE),
+    ]
+    
+    # Opening of a block-comment TODO; the closing delimiter is located by find_block_todos
+    TODO_BLOCK_HEAD = re.compile(r'/\*\s*(TODO|FIXME|HACK|BUG|XXX):?\s*', re.IGNORECASE)
+    
+    API_PATTERNS = [
+        (re.compile(r'router\.(get|post|put|delete|patch)\(["\']([^"\']+)["\']', re.IGNORECASE), 'Express.js'),
+        (re.compile(r'@(Get|Post|Put|Delete|Patch)\(["\']([^"\']+)["\']', re.IGNORECASE), 'NestJS/Spring'),
+        (re.compile(r'path\(["\']([^"\']+)["\']\)', re.IGNORECASE), 'Django'),
+        (re.compile(r'@app\.route\(["\']([^"\']+)["\']\)', re.IGNORECASE), 'Flask'),
+        (re.compile(r'Route::(get|post|put|delete)\(["\']([^"\']+)["\']', re.IGNORECASE), 'Laravel'),
+        (re.compile(r'app\.(get|post|put|delete|patch)\(["\']([^"\']+)["\']', re.IGNORECASE), 'Express.js'),
+    ]
+    
+    IMPORT_PATTERNS = [
+        re.compile(r'import\s+[^;\n]{0,500}?\s+from\s+["\']([^"\']+)["\']'),  # ES6 imports
+        re.compile(r'require\(["\']([^"\']+)["\']\)'),  # CommonJS
+        re.compile(r'using\s+([^;]{1,500});'),  # C#
+        re.compile(r'#include\s+[<"]([^>"\n]{1,500})[>"]'),  # C/C++
+    ]
+    
+    # Express apps and routers, the routes registered on them and the routers mounted with use()
+    EXPRESS_OBJECT = re.compile(r'\b(\w+)\s*(?::\s*[\w.]{1,100}\s*)?=\s*(express\s*\(\s*\)|'
+                                r'(?:express\s*\.\s*|require\(\s*["\']express["\']\s*\)\s*\.\s*)?Router\s*\(\s*\))')
+    EXPRESS_ROUTE = re.compile(r'\b(\w+)\.(get|post|put|delete|patch|all)\(\s*["\'`](/[^"\'`\n]*)["\'`]')
+    EXPRESS_MOUNT = re.compile(r'\b(\w+)\.use\(\s*(?:["\'`](/[^"\'`\n]*)["\'`]\s*,)?([^;]{0,500}?)\)\s*(?:;|\n|$)', re.MULTILINE)
+    EXPRESS_EXPORT = re.compile(r'(?:export\s+default|module\.exports\s*=)\s*(\w+)')
+    
+    # The router argument of a mount: an inline require() of a relative module, or a local name
+    MOUNT_REQUIRE = re.compile(r'require\(\s*["\'](\.[^"\']*)["\']\s*\)')
+    MOUNT_NAME = re.compile(r'\w+')
+    
+    # Local names bound to relative modules, as (pattern, whether it binds a default or named exports)
+    BINDING_PATTERNS = [
+        (re.compile(r'import\s+(\w+)\s*(?:,\s*\{[^}]{0,500}\})?\s*from\s+["\'](\.[^"\']*)["\']'), 'default'),
+        (re.compile(r'import\s+(?:\w+\s*,\s*)?\{([^}]{0,500})\}\s*from\s+["\'](\.[^"\']*)["\']'), 'named'),
+        (re.compile(r'(?:const|let|var)\s+(\w+)\s*=\s*require\(\s*["\'](\.[^"\']*)["\']\s*\)'), 'default'),
+        (re.compile(r'(?:const|let|var)\s*\{([^}]{0,500})\}\s*=\s*require\(\s*["\'](\.[^"\']*)["\']\s*\)'), 'named'),
+    ]
+    
+    # Separator between an imported name and its local alias: "name as alias" or "name: alias"
+    BINDING_ALIAS = re.compile(r'\s+as\s+|\s*:\s*')
+    
+    CONFIG_PATTERNS = [
+        (re.compile(r'PORT\s*=\s*(\d+)'), 'port'),
+        (re.compile(r'DATABASE_URL\s*=\s*["\']([^"\']+)["\']'), 'database_url'),
+        (re.compile(r'DEBUG\s*=\s*(True|False)'), 'debug'),
+        (re.compile(r'NODE_ENV\s*=\s*["\']([^"\']+)["\']'), 'environment'),
+        (re.compile(r'MONGODB_URI\s*=\s*["\']([^"\']+)["\']'), 'mongodb_uri'),
+        (re.compile(r'MONGO_URI\s*=\s*["\']([^"\']+)["\']'), 'mongo_uri'),
+    ]
+    
+    def analyze_text(self, content: str, rel_path: str) -> Dict:
+        """Extract TODOs, APIs, imports and config from already-read file content"""
+        budget = FileBudget(self.file_budget, MAX_MATCHES_PER_FILE)
+        info = {
+            'path': rel_path,
+            'todos': [],
+            'apis': [],
+            'imports': [],
+            'config': {}
+        }
+        
+        # Find TODO/FIXME comments
+        for pattern in self.TODO_LINE_PATTERNS:
+            lines = LineCounter(content)
+            for match in pattern.finditer(content):
+                budget.charge()
+                info['todos'].append({
+                    'type': match.group(1).upper(),
+                    'text': match.group(2).strip(),
+                    'line': lines.line_at(match.start())
+                })
+        info['todos'].extend(self.find_block_todos(content, budget))
+        
+        # Detect API routes (common patterns)
+        for pattern, framework in self.API_PATTERNS:
+            for match in pattern.finditer(content):
+                budget.charge()
+                path = match.group(2) if len(match.groups()) > 1 else match.group(1)
+                method = match.group(1).upper() if len(match.groups()) > 0 else 'GET'
+                info['apis'].append({
+                    'path': path,
+                    'method': method,
+                    'framework': framework,
+                    'file': rel_path
+                })
+        
+        # Extract imports
+        for pattern in self.IMPORT_PATTERNS:
+            for match in pattern.finditer(content):
+                budget.charge()
+                info['imports'].append(match.group(1))
+        
+        # Extract configuration (common patterns)
+        for pattern, key in self.CONFIG_PATTERNS:
+            budget.charge()
+            match = pattern.search(content)
+            if match:
+                info['config'][key] = match.group(1)
+        
+        # Database indicators, counted per file by detect_database
+        info['db'] = self.detect_db_indicators(content)
+        
+        # Line counts, aggregated per language and directory by compute_metrics
+        info['metrics'] = self.line_metrics(content, self.language_of(rel_path.rsplit('/', 1)[-1]))
+        
+        express = self.find_express(content, budget)
+        if express:
+            info['express'] = express
+        
+        return info
+    
+    def find_express(self, content: str, budget: 'FileBudget') -> Optional[Dict]:
+        """Collect the Express objects, routes, mounts and bindings resolve_routes links across files"""
+        if '.use(' not in content and 'express' not in content and 'Router' not in content:
+            return None
+        lines = LineCounter(content)
+        
+        objects = {}
+        for match in self.EXPRESS_OBJECT.finditer(content):
+            budget.charge()
+            objects[match.group(1)] = 'router' if 'Router' in match.group(2) else 'app'
+        
+        bindings = {}
+        for pattern, kind in self.BINDING_PATTERNS:
+            for match in pattern.finditer(content):
+                budget.charge()
+                module = match.group(2)
+                if kind == 'default':
+                    bindings[match.group(1)] = [module, 'default']
+                    continue
+                # { name }, { name as alias } (import) or { name: alias } (require)
+                for name in match.group(1).split(','):
+                    parts = self.BINDING_ALIAS.split(name.strip())
+                    if parts[0]:
+                        bindings[parts[-1]] = [module, parts[0]]
+        
+        # Only objects this file creates or imports from the project can carry routes
+        owners = set(objects) | set(bindings)
+        routes = []
+        for match in self.EXPRESS_ROUTE.finditer(content):
+            budget.charge()
+            if match.group(1) in owners:
+                routes.append({'owner': match.group(1), 'method': match.group(2).upper(), 'path': match.group(3),
+                               'line': lines.line_at(match.start())})
+        
+        mounts = []
+        for match in self.EXPRESS_MOUNT.finditer(content):
+            budget.charge()
+            if match.group(1) not in owners:
+                continue
+            # The router is the last argument; anything before it is middleware
+            target = match.group(3).split(',')[-1].strip()
+            required = self.MOUNT_REQUIRE.fullmatch(target)
+            if required:
+                target = f"require:{required.group(1)}"
+            elif not self.MOUNT_NAME.fullmatch(target):
+                continue
+            # use(router) without a path mounts at the root
+            mounts.append({'owner': match.group(1), 'prefix': match.group(2) or '', 'target': target,
+                           'line': lines.line_at(match.start())})
+        
+        if not (objects or routes or mounts):
+            return None
+        export = self.EXPRESS_EXPORT.search(content)
+        export = export.group(1) if export else None
+        used = {r['owner'] for r in routes} | {m['owner'] for m in mounts} | {m['target'] for m in mounts} | {export}
+        return {
+            'objects': objects,
+            'routes': routes,
+            'mounts': mounts,
+            'bindings': {name: binding for name, binding in bindings.items() if name in used},
+            'export': export,
+        }
+    
+    def find_block_todos(self, content: str, budget: 'FileBudget') -> List[Dict]:
+        """Find block-comment TODOs without rescanning unclosed lines"""
+        todos = []
+        head = self.TODO_BLOCK_HEAD
+        lines = LineCounter(content)
+        pos = 0
+        dead_until = -1  # end of a line already known to have no closing */
+        
+        while True:
+            match = head.search(content, pos)
+            if not match:
+                break
+            budget.charge()
+            
+            if match.end() < dead_until:
+                pos = match.start() + 1
+                continue
+            
+            # Like the old (.*?)\*/ pattern, the text may not span lines
+            eol = content.find('\n', match.end())
+            if eol == -1:
+                eol = len(content)
+            close = content.find('*/', match.end(), eol)
+            
+            if close == -1:
+                dead_until = eol
+                pos = match.start() + 1
+                continue
+            
+            todos.append({
+                'type': match.group(1).upper(),
+                'text': content[match.end():close].strip(),
+                'line': lines.line_at(match.start())
+            })
+            pos = close + 2
+        
+        return todos
+    
+    # Language of each analyzed extension, and of the special files without one
+    LANGUAGES = {
+        '.py': 'Python', '.js': 'JavaScript', '.jsx': 'JavaScript', '.ts': 'TypeScript', '.tsx': 'TypeScript',
+        '.java': 'Java', '.cpp': 'C++', '.hpp': 'C++', '.c': 'C', '.h': 'C', '.php': 'PHP', '.rb': 'Ruby',
+        '.go': 'Go', '.rs': 'Rust', '.swift': 'Swift', '.kt': 'Kotlin', '.scala': 'Scala', '.cs': 'C#', '.fs': 'F#',
+        '.html': 'HTML', '.htm': 'HTML', '.css': 'CSS', '.scss': 'Sass', '.sass': 'Sass', '.less': 'Less',
+        '.json': 'JSON', '.yaml': 'YAML', '.yml': 'YAML', '.xml': 'XML', '.toml': 'TOML',
+        '.ini': 'INI', '.cfg': 'INI', '.conf': 'INI', '.md': 'Markdown', '.txt': 'Text', '.rst': 'reStructuredText',
+        '.sql': 'SQL', '.sh': 'Shell', '.bat': 'Batch', '.ps1': 'PowerShell',
+    }
+    LANGUAGE_FILES = {'Dockerfile': 'Dockerfile', 'Makefile': 'Makefile'}
+    
+    # (line comment prefix regex, (block open, block close)) per language; a line counts
+    # as a comment when one of them is the first thing on it
+    COMMENT_SYNTAX = {
+        'Python': (r'#', None),
+        'JavaScript': (r'//', ('/*', '*/')),
+        'TypeScript': (r'//', ('/*', '*/')),
+        'Java': (r'//', ('/*', '*/')),
+        'C++': (r'//', ('/*', '*/')),
+        'C': (r'//', ('/*', '*/')),
+        'PHP': (r'//|#', ('/*', '*/')),
+        'Ruby': (r'#', None),
+        'Go': (r'//', ('/*', '*/')),
+        'Rust': (r'//', ('/*', '*/')),
+        'Swift': (r'//', ('/*', '*/')),
+        'Kotlin': (r'//', ('/*', '*/')),
+        'Scala': (r'//', ('/*', '*/')),
+        'C#': (r'//', ('/*', '*/')),
+        'F#': (r'//', ('(*', '*)')),
+        'HTML': (None, ('<!--', '-->')),
+        'XML': (None, ('<!--', '-->')),
+        'Markdown': (None, ('<!--', '-->')),
+        'CSS': (None, ('/*', '*/')),
+        'Sass': (r'//', ('/*', '*/')),
+        'Less': (r'//', ('/*', '*/')),
+        'YAML': (r'#', None),
+        'TOML': (r'#', None),
+        'INI': (r'[#;]', None),
+        'SQL': (r'--', ('/*', '*/')),
+        'Shell': (r'#', None),
+        'Batch': (r'::|(?i:rem)\b', None),
+        'PowerShell': (r'#', ('<#', '#>')),
+        'Dockerfile': (r'#', None),
+        'Makefile': (r'#', None),
+    }
+    
+    # Comment scanners per language, built once at import; see comment_scanner
+    COMMENT_SCANNERS = {language: comment_scanner(*syntax) for language, syntax in COMMENT_SYNTAX.items()}
+    
+    # A whitespace-only line, in text where every line starts with a newline
+    BLANK_LINE = re.compile(r'\n[ \t\f\v]*(?=\n|\Z)')
+    
+    @classmethod
+    def language_of(cls, name: str) -> str:
+        """Name the language of a file from its extension or special file name"""
+        if name in cls.LANGUAGE_FILES:
+            return cls.LANGUAGE_FILES[name]
+        return cls.LANGUAGES.get(os.path.splitext(name)[1].lower(), 'Other')
+    
+    def line_metrics(self, content: str, language: str) -> Dict[str, int]:
+        """Count total, blank and comment lines with str.count and whole-text regex scans, not a per-line loop"""
+        ends_open = bool(content) and not content.endswith('\n')
+        lines = content.count('\n') + ends_open
+        if not lines:
+            return {'lines': 0, 'blank': 0, 'comment': 0}
+        
+        # Every line, the first included, starts at a newline; anchoring on that literal
+        # lets the regex engine skip between lines instead of trying every offset
+        text = '\n' + (content if ends_open else content[:-1])
+        blank = len(self.BLANK_LINE.findall(text))
+        
+        # Comment lines and whole block comments in one left-to-right scan, so line
+        # markers inside a block are not counted twice
+        comment = 0
+        scanner = self.COMMENT_SCANNERS.get(language)
+        if scanner:
+            joined = ''.join(scanner.findall(text))
+            # Blank lines inside a block are already counted as blank
+            comment = joined.count('\n') - len(self.BLANK_LINE.findall(joined))
+        
+        return {'lines': lines, 'blank': blank, 'comment': comment}
+    
+    def analyze_architecture(self, files: List[Path], stack: List[str], file_results: Optional[List[Dict]] = None,
+                             workspaces: Optional[List[Dict]] = None) -> Dict:
+        """Analyze project architecture"""
+        dirs = set()
+        frontend_dirs = set()
+        backend_dirs = set()
+        api_dirs = set()
+        
+        for file in files:
+            rel_path = str(file.relative_to(self.project_path)).replace('\\', '/')
             parts = rel_path.split('/')
             
             if len(parts) > 1:
@@ -382,52 +1956,222 @@ class ProjectScanner:
                 backend_dirs.add('backend')
                 break
         
+        # Workspace packages declare what they are; trust that over folder names
+        if workspaces:
+            frontend_dirs = {w['path'] for w in workspaces if w['role'] in ('frontend', 'fullstack')}
+            backend_dirs = {w['path'] for w in workspaces if w['role'] in ('backend', 'fullstack')}
+        
         architecture = {
             'frontend': ', '.join(sorted(frontend_dirs)) if frontend_dirs else 'Not detected',
             'backend': ', '.join(sorted(backend_dirs)) if backend_dirs else 'Not detected',
-            'database': self.detect_database(files),
+            'database': self.detect_database(files, file_results),
             'majorDirectories': sorted(list(dirs)),
             'apiDirectories': sorted(list(api_dirs))
         }
         
         return architecture
     
-    def detect_database(self, files: List[Path]) -> str:
-        """Detect database from files"""
-        db_indicators = {
-            'MongoDB': 0,
-            'PostgreSQL': 0,
-            'MySQL': 0,
-            'SQLite': 0,
-            'Redis': 0
-        }
+    # Tried in order when an import names a module without its extension
+    MODULE_EXTENSIONS = ['.ts', '.tsx', '.js', '.jsx', '.mjs', '.cjs']
+    
+    def resolve_routes(self, file_results: List[Dict]) -> Tuple[List[Dict], List[Dict]]:
+        """Follow use() mounts from every Express app to fully qualified routes, checked in a RouteTrie"""
+        import posixpath
+        
+        express = {result['path']: result['express'] for result in file_results if result.get('express')}
+        
+        def resolve_module(from_path: str, module: str) -> Optional[str]:
+            base = posixpath.normpath(posixpath.join(posixpath.dirname(from_path), module))
+            # TypeScript sources are often imported by their compiled .js name
+            stem = base[:-3] if base.endswith('.js') else base
+            candidates = [base] + [stem + ext for ext in self.MODULE_EXTENSIONS] + \
+                         [base + '/index' + ext for ext in self.MODULE_EXTENSIONS]
+            return next((candidate for candidate in candidates if candidate in express), None)
+        
+        def resolve_name(path: str, name: str, depth: int = 0) -> Optional[Tuple[str, str]]:
+            # The (file, variable) that creates the app or router a name refers to
+            info = express[path]
+            if name in info['objects']:
+                return (path, name)
+            binding = [name[len('require:'):], 'default'] if name.startswith('require:') else info['bindings'].get(name)
+            target = resolve_module(path, binding[0]) if binding and depth < 8 else None
+            if target is None:
+                return None
+            exported = express[target]['export'] if binding[1] == 'default' else binding[1]
+            return resolve_name(target, exported, depth + 1) if exported else None
+        
+        # Routes and mounts registered on each app or router, wherever the registration happens
+        events = {}
+        mounted = set()
+        for path, info in express.items():
+            for route in info['routes']:
+                node = resolve_name(path, route['owner'])
+                if node:
+                    events.setdefault(node, []).append((path, route['line'], route))
+            for mount in info['mounts']:
+                node = resolve_name(path, mount['owner'])
+                child = resolve_name(path, mount['target'])
+                if node and child:
+                    events.setdefault(node, []).append((path, mount['line'], (mount['prefix'], child)))
+                    mounted.add(child)
+        for node, registered in events.items():
+            registered.sort(key=lambda event: (event[0] != node[0], event[0], event[1]))
+        
+        trie = RouteTrie()
+        table = []
+        issues = []
+        seen = set()
+        
+        def visit(node: Tuple[str, str], prefix: str, active: frozenset):
+            if node in active:
+                return
+            for path, line, registered in events.get(node, []):
+                if isinstance(registered, tuple):
+                    mount_prefix, child = registered
+                    visit(child, prefix + '/' + mount_prefix, active | {node})
+                    continue
+                route = {
+                    'method': registered['method'],
+                    'path': '/' + '/'.join(route_segments(prefix + '/' + registered['path'])),
+                    'file': path,
+                    'line': line,
+                }
+                key = (route['method'], route['path'], path, line)
+                if key not in seen:
+                    seen.add(key)
+                    table.append(route)
+                    issues.extend(trie.insert(route))
+        
+        apps = sorted((path, name) for path, info in express.items()
+                      for name, kind in info['objects'].items() if kind == 'app')
+        for app in apps:
+            if app not in mounted:
+                visit(app, '', frozenset())
+        
+        # Registration order, so a trie rebuilt from the table resolves conflicts the same way
+        return table, issues
+    
+    def compute_metrics(self, files: List[Path], sizes: Dict[Path, int], file_results: List[Dict]) -> Dict:
+        """Aggregate line counts and size distributions per language and per top-level directory"""
+        from array import array
         
+        line_counts = {result['path']: result['metrics'] for result in file_results if 'metrics' in result}
+        prefix = os.path.join(str(self.project_path), '')
+        
+        # One int64 column per measure, filled in a single pass over the inventory
+        paths = []
+        languages, directories = {}, {}
+        language_keys, directory_keys = array('q'), array('q')
+        columns = {name: array('q') for name in ('bytes', 'lines', 'blank', 'comment', 'analyzed')}
         for file in files:
-            try:
-                content = file.read_text(encoding='utf-8', errors='ignore').lower()
-                
-                # Check for MongoDB indicators
-                if 'mongoose' in content or 'mongodb' in content:
-                    db_indicators['MongoDB'] += 1
-                
-                # Check for PostgreSQL indicators
-                if 'postgresql' in content or 'postgres' in content or 'psycopg' in content:
-                    db_indicators['PostgreSQL'] += 1
-                
-                # Check for MySQL indicators
-                if 'mysql' in content and 'mysql2' not in content:
-                    db_indicators['MySQL'] += 1
-                
-                # Check for SQLite indicators
-                if 'sqlite' in content:
-                    db_indicators['SQLite'] += 1
-                
-                # Check for Redis indicators
-                if 'redis' in content or 'ioredis' in content:
-                    db_indicators['Redis'] += 1
-                    
-            except:
-                continue
+            rel_path = str(file)[len(prefix):].replace('\\', '/')
+            paths.append(rel_path)
+            language_keys.append(languages.setdefault(self.language_of(file.name), len(languages)))
+            top = rel_path.split('/', 1)[0] if '/' in rel_path else '.'
+            directory_keys.append(directories.setdefault(top, len(directories)))
+            counts = line_counts.get(rel_path)
+            columns['bytes'].append(sizes.get(file, 0))
+            columns['lines'].append(counts['lines'] if counts else 0)
+            columns['blank'].append(counts['blank'] if counts else 0)
+            columns['comment'].append(counts['comment'] if counts else 0)
+            columns['analyzed'].append(1 if counts else 0)
+        
+        def file_entry(i: int) -> Dict:
+            return {'path': paths[i], 'bytes': columns['bytes'][i],
+                    'lines': columns['lines'][i] if columns['analyzed'][i] else None}
+        
+        def percentile(members: List[int], q: int) -> int:
+            # Nearest rank, read off a group's files in descending size order
+            rank = -(-q * len(members) // 100)
+            return columns['bytes'][members[len(members) - rank]]
+        
+        def summarize(names: Dict[str, int], keys) -> Tuple[List[Dict], List[int]]:
+            stats = grouped_stats(keys, columns['bytes'], columns, len(names))
+            order = stats['order']
+            groups = []
+            candidates = []
+            start = 0
+            for name, g in names.items():
+                count = stats['counts'][g]
+                # order lists each group's files largest first
+                members = order[start:start + count]
+                candidates.extend(members[:LARGEST_FILES_TOTAL])
+                lines = stats['sums']['lines'][g]
+                group = {
+                    'name': name,
+                    'files': count,
+                    'analyzedFiles': stats['sums']['analyzed'][g],
+                    'bytes': stats['sums']['bytes'][g],
+                    'lines': lines,
+                    'codeLines': lines - stats['sums']['blank'][g] - stats['sums']['comment'][g],
+                    'commentLines': stats['sums']['comment'][g],
+                    'blankLines': stats['sums']['blank'][g],
+                    'commentRatio': round(stats['sums']['comment'][g] / lines, 3) if lines else 0.0,
+                    'blankRatio': round(stats['sums']['blank'][g] / lines, 3) if lines else 0.0,
+                    'sizePercentiles': {f"p{q}": percentile(members, q) for q in SIZE_PERCENTILES},
+                    'sizeHistogram': stats['histograms'][g],
+                    'largestFiles': [file_entry(i) for i in members[:LARGEST_FILES]],
+                }
+                groups.append(group)
+                start += count
+            groups.sort(key=lambda group: (-group['lines'], -group['bytes'], group['name']))
+            return groups, candidates
+        
+        by_language, candidates = summarize(languages, language_keys)
+        by_directory, _ = summarize(directories, directory_keys)
+        
+        # Every project-wide top file is among its own language's top files
+        candidates.sort(key=lambda i: (-columns['bytes'][i], i))
+        language_names = {g: name for name, g in languages.items()}
+        largest = [dict(file_entry(i), language=language_names[language_keys[i]]) for i in candidates[:LARGEST_FILES_TOTAL]]
+        
+        lines = sum(group['lines'] for group in by_language)
+        blank = sum(group['blankLines'] for group in by_language)
+        comment = sum(group['commentLines'] for group in by_language)
+        return {
+            'files': len(files),
+            'analyzedFiles': sum(group['analyzedFiles'] for group in by_language),
+            'bytes': sum(group['bytes'] for group in by_language),
+            'lines': lines,
+            'codeLines': lines - blank - comment,
+            'commentLines': comment,
+            'blankLines': blank,
+            'sizeBuckets': SIZE_BUCKET_LABELS,
+            'languages': by_language,
+            'directories': by_directory,
+            'largestFiles': largest,
+        }
+    
+    def detect_db_indicators(self, content: str) -> List[str]:
+        """List the databases a file's content points to"""
+        content = content.lower()
+        found = []
+        for db, patterns in self.DB_PATTERNS.items():
+            if any(pattern in content for pattern in patterns):
+                # mysql2 is the Node driver, not a MySQL hint on its own
+                if db == 'MySQL' and 'mysql2' in content:
+                    continue
+                found.append(db)
+        return found
+    
+    def detect_database(self, files: List[Path], file_results: Optional[List[Dict]] = None) -> str:
+        """Detect database from files"""
+        db_indicators = {db: 0 for db in self.DB_PATTERNS}
+        
+        if file_results is not None:
+            # Reuse indicators gathered while analyzing file contents
+            for result in file_results:
+                for db in result.get('db', []):
+                    db_indicators[db] += 1
+        else:
+            for file in files:
+                try:
+                    content = file.read_text(encoding='utf-8', errors='ignore')
+                except Exception as e:
+                    self.record_error('detect_database', e, file)
+                    continue
+                for db in self.detect_db_indicators(content):
+                    db_indicators[db] += 1
         
         # Check file names for database files
         for file in files:
@@ -443,117 +2187,119 @@ class ProjectScanner:
         
         return 'Unknown or no database detected'
     
-    def extract_dependencies(self, files: List[Path]) -> List[str]:
+    def extract_dependencies(self, files: List[Path], manifests: Optional[List[Path]] = None) -> List[str]:
         """Extract dependencies from package files - EXCLUDING node_modules"""
         dependencies = set()
         
         # Check for package.json files anywhere in project (excluding node_modules)
-        for package_json in self.project_path.rglob('package.json'):
-            package_str = str(package_json)
-            
-            # Skip if in node_modules
-            if self.should_ignore(package_str):
-                continue
-                
+        for package_json in self.manifests_named('package.json', manifests):
             try:
-                with open(package_json, 'r') as f:
-                    data = json.load(f)
-                    deps = list(data.get('dependencies', {}).keys())
-                    dev_deps = list(data.get('devDependencies', {}).keys())
-                    
-                    # Add location context
-                    rel_path = str(package_json.relative_to(self.project_path)).replace('\\', '/')
-                    location = f" ({rel_path})"
-                    
-                    # Only add main project dependencies (not from node_modules)
-                    for dep in deps:
-                        # Filter out common dev/test dependencies that might appear
-                        if any(test_dep in dep.lower() for test_dep in ['test', 'jest', 'mocha', 'chai', 'ava', 'tape', 'xo']):
-                            continue
-                        dependencies.add(f"{dep}{location} (prod)")
-                    for dep in dev_deps:
-                        if any(test_dep in dep.lower() for test_dep in ['test', 'jest', 'mocha', 'chai', 'ava', 'tape', 'xo']):
-                            continue
-                        dependencies.add(f"{dep}{location} (dev)")
-            except:
-                pass
+                data = json.loads(self.read_project_file(package_json))
+                deps = list(data.get('dependencies', {}).keys())
+                dev_deps = list(data.get('devDependencies', {}).keys())
+                
+                # Add location context
+                rel_path = str(package_json.relative_to(self.project_path)).replace('\\', '/')
+                location = f" ({rel_path})"
+                
+                # Only add main project dependencies (not from node_modules)
+                for dep in deps:
+                    # Filter out common dev/test dependencies that might appear
+                    if any(test_dep in dep.lower() for test_dep in ['test', 'jest', 'mocha', 'chai', 'ava', 'tape', 'xo']):
+                        continue
+                    dependencies.add(f"{dep}{location} (prod)")
+                for dep in dev_deps:
+                    if any(test_dep in dep.lower() for test_dep in ['test', 'jest', 'mocha', 'chai', 'ava', 'tape', 'xo']):
+                        continue
+                    dependencies.add(f"{dep}{location} (dev)")
+            except Exception as e:
+                self.record_error('extract_dependencies', e, package_json)
         
         # Check for requirements.txt files
-        for requirements in self.project_path.rglob('requirements.txt'):
-            if self.should_ignore(str(requirements)):
-                continue
-                
+        for requirements in self.manifests_named('requirements.txt', manifests):
             try:
-                with open(requirements, 'r') as f:
-                    rel_path = str(requirements.relative_to(self.project_path)).replace('\\', '/')
-                    location = f" ({rel_path})"
-                    
-                    for line in f:
-                        line = line.strip()
-                        if line and not line.startswith('#'):
-                            # Clean up version specifiers
-                            dep_name = line.split('>')[0].split('<')[0].split('=')[0].split('~')[0].strip()
-                            if dep_name:
-                                dependencies.add(f"{dep_name}{location} (Python)")
-            except:
-                pass
+                rel_path = str(requirements.relative_to(self.project_path)).replace('\\', '/')
+                location = f" ({rel_path})"
+                
+                for line in self.read_project_file(requirements).splitlines():
+                    line = line.strip()
+                    if line and not line.startswith('#'):
+                        # Clean up version specifiers
+                        dep_name = line.split('>')[0].split('<')[0].split('=')[0].split('~')[0].strip()
+                        if dep_name:
+                            dependencies.add(f"{dep_name}{location} (Python)")
+            except Exception as e:
+                self.record_error('extract_dependencies', e, requirements)
         
         # Check for pom.xml (Maven)
-        for pom in self.project_path.rglob('pom.xml'):
-            if self.should_ignore(str(pom)):
-                continue
+        for pom in self.manifests_named('pom.xml', manifests):
             rel_path = str(pom.relative_to(self.project_path)).replace('\\', '/')
             dependencies.add(f"Maven dependencies ({rel_path})")
         
         # Check for build.gradle
-        for build_gradle in self.project_path.rglob('build.gradle'):
-            if self.should_ignore(str(build_gradle)):
-                continue
+        for build_gradle in self.manifests_named('build.gradle', manifests):
             rel_path = str(build_gradle.relative_to(self.project_path)).replace('\\', '/')
             dependencies.add(f"Gradle dependencies ({rel_path})")
         
         # Check for build.gradle.kts
-        for build_gradle_kts in self.project_path.rglob('build.gradle.kts'):
-            if self.should_ignore(str(build_gradle_kts)):
-                continue
+        for build_gradle_kts in self.manifests_named('build.gradle.kts', manifests):
             rel_path = str(build_gradle_kts.relative_to(self.project_path)).replace('\\', '/')
             dependencies.add(f"Gradle Kotlin dependencies ({rel_path})")
         
         return sorted(list(dependencies))
     
+    def dependency_versions(self) -> List[Tuple[str, str]]:
+        """List (name, declared version) pairs from package.json and requirements.txt"""
+        versions = []
+        for package_json in self.find_project_files('package.json'):
+            try:
+                data = json.loads(self.read_project_file(package_json))
+            except Exception as e:
+                self.record_error('dependency_versions', e, package_json)
+                continue
+            for section in ['dependencies', 'devDependencies']:
+                versions.extend((name, str(version)) for name, version in data.get(section, {}).items())
+        
+        for requirements in self.find_project_files('requirements.txt'):
+            try:
+                lines = self.read_project_file(requirements).splitlines()
+            except Exception as e:
+                self.record_error('dependency_versions', e, requirements)
+                continue
+            for line in lines:
+                line = line.split('#')[0].strip()
+                match = re.match(r'([A-Za-z0-9_.\-\[\]]+)\s*(.*)', line)
+                if match:
+                    versions.append((match.group(1), match.group(2).strip() or '*'))
+        
+        return sorted(set(versions))
+    
     def detect_run_commands(self, files: List[Path]) -> List[str]:
         """Detect how to run the project - EXCLUDING node_modules"""
         commands = []
         
         # Check package.json scripts from project directories only
-        for package_json in self.project_path.rglob('package.json'):
-            package_str = str(package_json)
-            
-            # Skip if in node_modules
-            if self.should_ignore(package_str):
-                continue
-                
+        for package_json in self.find_project_files('package.json'):
             try:
-                with open(package_json, 'r') as f:
-                    data = json.load(f)
-                    scripts = data.get('scripts', {})
-                    rel_path = str(package_json.relative_to(self.project_path)).replace('\\', '/')
+                data = json.loads(self.read_project_file(package_json))
+                scripts = data.get('scripts', {})
+                rel_path = str(package_json.relative_to(self.project_path)).replace('\\', '/')
+                
+                for name, cmd in scripts.items():
+                    # Skip test-related scripts from being main run commands
+                    if any(test_word in name.lower() for test_word in ['test', 'lint', 'check', 'audit', 'coverage']):
+                        continue
                     
-                    for name, cmd in scripts.items():
-                        # Skip test-related scripts from being main run commands
-                        if any(test_word in name.lower() for test_word in ['test', 'lint', 'check', 'audit', 'coverage']):
-                            continue
-                            
-                        if rel_path != 'package.json':
-                            dir_path = os.path.dirname(rel_path)
-                            if dir_path == '.':
-                                commands.append(f"npm run {name} # {cmd}")
-                            else:
-                                commands.append(f"cd {dir_path} && npm run {name} # {cmd}")
-                        else:
+                    if rel_path != 'package.json':
+                        dir_path = os.path.dirname(rel_path)
+                        if dir_path == '.':
                             commands.append(f"npm run {name} # {cmd}")
-            except:
-                pass
+                        else:
+                            commands.append(f"cd {dir_path} && npm run {name} # {cmd}")
+                    else:
+                        commands.append(f"npm run {name} # {cmd}")
+            except Exception as e:
+                self.record_error('detect_run_commands', e, package_json)
         
         # Check for common files in root
         common_files = {
@@ -568,15 +2314,12 @@ class ProjectScanner:
         }
         
         for filename, cmd in common_files.items():
-            if (self.project_path / filename).exists():
+            if self.has_root_file(filename):
                 commands.append(cmd)
         
         # Check for server files in backend (not in node_modules)
         for server_file in ['server.js', 'app.js', 'index.js', 'main.js']:
-            for path in self.project_path.rglob(server_file):
-                if self.should_ignore(str(path)):
-                    continue
-                    
+            for path in self.find_project_files(server_file):
                 rel_path = str(path.relative_to(self.project_path)).replace('\\', '/')
                 if ('backend' in rel_path.lower() or 'server' in rel_path.lower()) and 'node_modules' not in rel_path.lower():
                     dir_path = os.path.dirname(rel_path)
@@ -588,17 +2331,14 @@ class ProjectScanner:
         # Check README for commands from project README files only
         readme_patterns = ['README.md', 'README.txt', 'README', 'readme.md']
         for readme_pattern in readme_patterns:
-            for readme_path in self.project_path.rglob(readme_pattern):
-                if self.should_ignore(str(readme_path)):
-                    continue
-                    
+            for readme_path in self.find_project_files(readme_pattern):
                 try:
-                    content = readme_path.read_text(encoding='utf-8', errors='ignore')
+                    content = self.read_project_file(readme_path)
                     rel_path = str(readme_path.relative_to(self.project_path)).replace('\\', '/')
                     
                     # Look for code blocks with commands
-                    for match in re.finditer(r'```(?:bash|sh|shell|cmd|powershell)?\n(.*?)\n```', content, re.DOTALL | re.IGNORECASE):
-                        lines = match.group(1).split('\n')
+                    for block in self.find_code_blocks(content):
+                        lines = block.split('\n')
                         for line in lines:
                             line = line.strip()
                             if line and any(keyword in line.lower() for keyword in ['run', 'start', 'install', 'build', 'dev', 'server', 'python', 'node', 'docker']):
@@ -607,8 +2347,8 @@ class ProjectScanner:
                                         commands.append(f"# From {rel_path}: {line}")
                                     else:
                                         commands.append(line)
-                except:
-                    pass
+                except Exception as e:
+                    self.record_error('detect_run_commands', e, readme_path)
         
         # Clean up and deduplicate commands
         clean_commands = []
@@ -626,6 +2366,36 @@ class ProjectScanner:
         
         return clean_commands[:10]  # Return max 10 unique commands
     
+    CODE_BLOCK_LANGUAGES = ['bash', 'sh', 'shell', 'cmd', 'powershell']
+    
+    def find_code_blocks(self, content: str) -> List[str]:
+        """Return shell code blocks from Markdown in a single forward pass"""
+        blocks = []
+        lowered = content.lower()
+        pos = content.find('```')
+        
+        while pos != -1:
+            # Optional language tag, then the block body must start on the next line
+            body_start = -1
+            for lang in [''] + self.CODE_BLOCK_LANGUAGES:
+                tag_end = pos + 3 + len(lang)
+                if lowered.startswith(lang, pos + 3) and content.startswith('\n', tag_end):
+                    body_start = tag_end + 1
+                    break
+            
+            if body_start == -1:
+                pos = content.find('```', pos + 1)
+                continue
+            
+            close = content.find('\n```', body_start)
+            if close == -1:
+                # No later fence can close either, so there are no more blocks
+                break
+            blocks.append(content[body_start:close])
+            pos = content.find('```', close + 4)
+        
+        return blocks
+    
     def generate_summary(self, files: List[Path], stack: List[str]) -> str:
         """Generate project summary"""
         summary_parts = []
@@ -634,12 +2404,12 @@ class ProjectScanner:
         readme_content = ""
         for readme in ['README.md', 'README.txt', 'README']:
             readme_path = self.project_path / readme
-            if readme_path.exists() and not self.should_ignore(str(readme_path)):
+            if self.has_root_file(readme):
                 try:
-                    readme_content = readme_path.read_text(encoding='utf-8', errors='ignore')[:1000]
+                    readme_content = self.read_project_file(readme_path)[:1000]
                     break
-                except:
-                    pass
+                except Exception as e:
+                    self.record_error('generate_summary', e, readme_path)
         
         if readme_content:
             # Extract first meaningful paragraph
@@ -704,7 +2474,6 @@ class ProjectScanner:
             'manage.py': 70,
             'app.py': 65,
             'main.py': 65,
-            'server.js': 65,
             'index.js': 60,
             'server.js': 60,
             'app.js': 60,
@@ -740,187 +2509,988 @@ class ProjectScanner:
         key_files.sort()
         return key_files[:20]  # Limit to 20 key files
     
-    def scan(self, watch: bool = False) -> ProjectInfo:
-        """Main scanning method"""
-        print(f"🚀 Starting project analysis: {self.project_path}")
+    def discover_workspaces(self, files: List[Path]) -> List[Dict]:
+        """Find the workspace packages the root package.json declares, with the files each one owns"""
+        if not self.has_root_file('package.json'):
+            return []
+        root_manifest = self.project_path / 'package.json'
+        try:
+            declared = json.loads(self.read_project_file(root_manifest)).get('workspaces')
+        except Exception as e:
+            self.record_error('discover_workspaces', e, root_manifest)
+            return []
+        if isinstance(declared, dict):
+            # Yarn's {"packages": [...], "nohoist": [...]} form
+            declared = declared.get('packages')
+        if not isinstance(declared, list):
+            return []
+        globs = [glob for glob in declared if isinstance(glob, str)]
+        include = [workspace_pattern(glob) for glob in globs if not glob.startswith('!')]
+        exclude = [workspace_pattern(glob[1:]) for glob in globs if glob.startswith('!')]
         
-        # Perform initial scan
-        scan_result = self.scan_directory()
-        files = scan_result['files']
+        def rel(path: Path) -> str:
+            return str(path.relative_to(self.project_path)).replace('\\', '/')
         
-        # Store file hashes for change detection
-        if watch:
-            for file in files:
-                self.file_hashes[str(file)] = self.get_file_hash(file)
+        # Each nested manifest a glob matches is a package, named as it names itself
+        packages = {}
+        for manifest in self.find_project_files('package.json'):
+            if manifest.parent == self.project_path:
+                continue
+            rel_dir = rel(manifest.parent)
+            if not any(p.fullmatch(rel_dir) for p in include) or any(p.fullmatch(rel_dir) for p in exclude):
+                continue
+            try:
+                data = json.loads(self.read_project_file(manifest))
+            except Exception as e:
+                self.record_error('discover_workspaces', e, manifest)
+                data = {}
+            if not isinstance(data, dict):
+                data = {}
+            packages[rel_dir] = {
+                'name': str(data.get('name') or rel_dir),
+                'path': rel_dir,
+                'manifest': data,
+                'files': [],
+                'projectFiles': [],
+                'key': None,
+                'unit': None,
+            }
         
-        # Detect technology stack
-        stack = self.detect_stack(files)
-        print(f"🔧 Detected stack: {', '.join(stack)}")
+        def owner(path: Path) -> Optional[Dict]:
+            # The innermost package wins when packages nest
+            rel_dir = os.path.dirname(rel(path))
+            while rel_dir:
+                if rel_dir in packages:
+                    return packages[rel_dir]
+                rel_dir = os.path.dirname(rel_dir)
+            return None
         
-        # Analyze architecture
-        architecture = self.analyze_architecture(files, stack)
-        print(f"🏗️  Architecture: Frontend: {architecture['frontend']}, Backend: {architecture['backend']}")
+        for file in files:
+            package = owner(file)
+            if package is not None:
+                package['files'].append(file)
+        for file in self.project_files:
+            package = owner(file)
+            if package is not None:
+                package['projectFiles'].append(file)
+        return [packages[path] for path in sorted(packages)]
+    
+    def package_key(self, package: Dict, names: List[str]) -> Optional[str]:
+        """Cache key of a package as one unit, derived from the cache keys of all of its files"""
+        import hashlib
+        keys = []
+        for file in package['files']:
+            key = self.cache.key_for(file)
+            if key is None:
+                return None
+            # analyze_cached reuses the key if the package turns out to have changed
+            self.file_keys[file] = key
+            keys.append([str(file.relative_to(self.project_path)).replace('\\', '/'), key])
+        # Other packages' names are part of the summary, through workspaceDependencies
+        payload = json.dumps(['workspace', ANALYZER_VERSION, package['path'], names, keys])
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+    
+    def load_package_units(self, packages: List[Dict]) -> Dict[Path, Dict]:
+        """Look up every package in the cache; return the file results of the unchanged ones"""
+        reused = {}
+        if self.cache is None:
+            return reused
+        names = sorted(package['name'] for package in packages)
+        touch = getattr(self.cache, 'touch', None)
+        for package in packages:
+            package['key'] = self.package_key(package, names)
+            unit = self.cache.get(package['key']) if package['key'] is not None else None
+            if unit is None or len(unit.get('results', [])) != len(package['files']):
+                continue
+            package['unit'] = unit
+            reused.update(zip(package['files'], unit['results']))
+            if touch is not None:
+                # The files' own entries are needed again once the package changes
+                touch([self.file_keys.pop(file, None) for file in package['files']])
+        return reused
+    
+    def summarize_package(self, package: Dict, results: List[Dict], names: List[str]) -> Dict:
+        """Stack, dependencies, APIs and TODOs of one workspace package"""
+        manifest = package['manifest']
+        declared = set()
+        for section in ['dependencies', 'devDependencies', 'peerDependencies']:
+            if isinstance(manifest.get(section), dict):
+                declared.update(manifest[section])
         
-        # Generate summary
-        summary = self.generate_summary(files, stack)
+        todos = [todo for result in results for todo in result.get('todos', [])]
+        apis = [api for result in results for api in result.get('apis', [])]
+        frontend = bool(declared & self.FRONTEND_PACKAGES)
+        backend = bool(declared & self.BACKEND_PACKAGES) or any(result.get('express') for result in results)
+        if frontend and backend:
+            role = 'fullstack'
+        else:
+            role = 'frontend' if frontend else 'backend' if backend else 'library'
         
-        # Extract dependencies
-        dependencies = self.extract_dependencies(files)
+        return {
+            'name': package['name'],
+            'path': package['path'],
+            'role': role,
+            'detectedStack': self.detect_stack(package['files'], package['projectFiles']),
+            'dependencies': self.extract_dependencies(package['files'], package['projectFiles']),
+            'workspaceDependencies': sorted(declared & set(names) - {package['name']}),
+            'files': len(package['files']),
+            'lines': sum(result['metrics']['lines'] for result in results if 'metrics' in result),
+            'apiCount': len(apis),
+            'todoCount': len(todos),
+            'APIsDetected': apis[:50],
+            'unfinishedFeaturesOrTODOs': todos[:50],
+        }
+    
+    def summarize_workspaces(self, packages: List[Dict], file_results: List[Dict]) -> List[Dict]:
+        """Per-package summaries, storing each completely analyzed package as one cache unit"""
+        by_path = {result['path']: result for result in file_results}
+        names = sorted(package['name'] for package in packages)
+        summaries = []
+        for package in packages:
+            if package['unit'] is not None:
+                summaries.append(package['unit']['summary'])
+                continue
+            results = [by_path.get(str(f.relative_to(self.project_path)).replace('\\', '/')) for f in package['files']]
+            summary = self.summarize_package(package, [r for r in results if r is not None], names)
+            summaries.append(summary)
+            # Like ContentCache, only store what does not depend on timing: every file, none skipped
+            if package['key'] is not None and all(r is not None and 'error' not in r for r in results):
+                self.cache.put(package['key'], {'results': results, 'summary': summary})
         
-        # Detect run commands
-        run_commands = self.detect_run_commands(files)
+        if packages:
+            roles = ', '.join(f"{s['path']} ({s['role']})" for s in summaries)
+            reused = sum(1 for package in packages if package['unit'] is not None)
+            cached = f"; {reused} reused from the cache" if self.cache is not None else ''
+            self.progress(f"📦 Workspace packages: {roles}{cached}")
+        return summaries
+    
+    def priority_tier(self, file: Path, key_set: Set[str]) -> int:
+        """Analysis tier of a file: 0 for manifests/key files, 1 for backend code, 2 for the rest"""
+        rel_path = str(file.relative_to(self.project_path)).replace('\\', '/')
+        if rel_path in key_set or file.name in self.MANIFEST_FILES:
+            return 0
+        if any(part.lower() in self.BACKEND_DIR_NAMES for part in rel_path.split('/')[:-1]):
+            return 1
+        return 2
+    
+    def prioritize_files(self, files: List[Path], sizes: Dict[Path, int], key_files: List[str]) -> List[Path]:
+        """Order files for analysis: manifests/key files, then backend code, then the rest"""
+        key_set = set(key_files)
+        # Smallest files first within each tier
+        return sorted(files, key=lambda f: (self.priority_tier(f, key_set), sizes.get(f, 0), str(f)))
+    
+    def stratum_of(self, file: Path) -> str:
+        """Sampling stratum of a file: top-level directory plus extension"""
+        parts = file.relative_to(self.project_path).parts
+        top = parts[0] if len(parts) > 1 else '.'
+        return f"{top}:{file.suffix.lower()}"
+    
+    def select_sample(self, files: List[Path]) -> List[Path]:
+        """Pick a deterministic stratified sample of files"""
+        import hashlib
         
-        # Identify key files
-        key_files = self.identify_key_files(files)
+        strata = {}
+        for file in files:
+            strata.setdefault(self.stratum_of(file), []).append(file)
         
-        # Collect TODOs and APIs from all files
-        all_todos = []
-        all_apis = []
+        sample = set()
+        for members in strata.values():
+            # Stable pseudo-random order so reruns pick the same files
+            members.sort(key=lambda f: hashlib.md5(str(f.relative_to(self.project_path)).encode()).hexdigest())
+            count = max(1, int(len(members) * self.sample_rate + 0.5))
+            sample.update(members[:count])
+        return [f for f in files if f in sample]
+    
+    def estimate_totals(self, files: List[Path], found: Dict[str, List[int]]) -> Dict:
+        """Extrapolate TODO/API totals from per-stratum [files, TODOs, APIs] counts of analyzed files"""
+        stratum_sizes = {}
+        for file in files:
+            stratum = self.stratum_of(file)
+            stratum_sizes[stratum] = stratum_sizes.get(stratum, 0) + 1
         
-        print("📄 Analyzing file contents...")
-        for i, file in enumerate(files):
-            if i % 20 == 0 and i > 0:
-                print(f"  Processed {i}/{len(files)} files...")
-            
-            file_info = self.analyze_file_content(file)
-            all_todos.extend(file_info.get('todos', []))
-            all_apis.extend(file_info.get('apis', []))
-        
-        # Prepare project info
-        project_info = ProjectInfo()
-        project_info.projectName = self.project_name
-        project_info.projectSummary = summary
-        project_info.detectedStack = stack
-        project_info.architecture = architecture
-        project_info.keyFiles = key_files
-        project_info.dependencies = dependencies
-        project_info.howToRun = run_commands
-        project_info.APIsDetected = all_apis[:50]  # Limit to 50 APIs
-        project_info.unfinishedFeaturesOrTODOs = all_todos[:50]  # Limit to 50 TODOs
-        
-        # Generate important notes
-        notes = []
-        if all_todos:
-            notes.append(f"Found {len(all_todos)} TODO/FIXME comments in code.")
+        # Strata the scan never reached fall back to the overall per-file rate
+        sampled = sum(c[0] for c in found.values())
+        todo_rate = sum(c[1] for c in found.values()) / sampled if sampled else 0.0
+        api_rate = sum(c[2] for c in found.values()) / sampled if sampled else 0.0
         
-        # Check for backend folder
-        backend_files = [f for f in files if 'backend' in str(f).lower() and 'node_modules' not in str(f).lower()]
-        if backend_files:
-            notes.append(f"Backend folder detected with {len(backend_files)} files.")
+        todos = apis = 0.0
+        for stratum, size in stratum_sizes.items():
+            if stratum in found:
+                n, t, a = found[stratum]
+                todos += t * size / n
+                apis += a * size / n
+            else:
+                todos += todo_rate * size
+                apis += api_rate * size
         
-        # Check for environment files
-        env_files = [f for f in files if '.env' in f.name.lower() and not self.should_ignore(str(f))]
-        if env_files:
-            notes.append(f"Found {len(env_files)} environment configuration files.")
+        return {
+            'estimatedTodos': int(round(todos)),
+            'estimatedApis': int(round(apis)),
+            'strata': len(stratum_sizes),
+            'strataSampled': len(found),
+        }
+    
+    def analyze_files(self, files: List[Path], sizes: Dict[Path, int], key_files: List[str]) -> Tuple[List[Path], List[Dict]]:
+        """Analyze file contents in priority order until the deadline is spent"""
+        analyzed = []
+        file_results = []
+        for file, result in self.iter_analyze(files, sizes, key_files):
+            analyzed.append(file)
+            file_results.append(result)
+        return analyzed, file_results
+    
+    def iter_analyze(self, files: List[Path], sizes: Dict[Path, int], key_files: List[str],
+                     reused: Optional[Dict[Path, Dict]] = None) -> Iterator[Tuple[Path, Dict]]:
+        """Yield (file, result) in analysis order, keeping only counters; sets coverage once exhausted"""
+        work = files
+        if self.sample_rate:
+            work = self.select_sample(work)
+        essential = 0
+        if self.deadline is not None:
+            work = self.prioritize_files(work, sizes, key_files)
+            # Manifests and key files lead the order and are analyzed even once the deadline has
+            # passed, since the walk and repo-wide stages may have spent it all
+            key_set = set(key_files)
+            essential = sum(1 for f in work if self.priority_tier(f, key_set) == 0)
         
-        if not run_commands:
-            notes.append("No run commands detected. Check README for manual setup.")
-        elif len(run_commands) < 3:
-            notes.append("Limited run commands detected. May need manual configuration.")
+        analyzed = 0
+        analyzed_bytes = 0
+        found = {}
+        self.skipped_files = []
+        for i, file in enumerate(work):
+            self.check_cancelled()
+            if i >= essential and self.deadline_exceeded():
+                self.progress(f"⏱️  Deadline reached after {i}/{len(work)} files")
+                break
+            if i % 20 == 0 and i > 0:
+                self.progress(f"  Processed {i}/{len(work)} files...")
+            
+            result = reused.get(file) if reused else None
+            if result is None:
+                result = self.analyze_cached(file)
+            if result.get('skipped'):
+                self.skipped_files.append({'path': result['path'], 'reason': result['error']})
+            elif 'error' in result:
+                self.record_error('analyze', result['error'], file)
+            analyzed += 1
+            analyzed_bytes += sizes.get(file, 0)
+            if self.sample_rate:
+                counts = found.setdefault(self.stratum_of(file), [0, 0, 0])
+                counts[0] += 1
+                counts[1] += len(result.get('todos', []))
+                counts[2] += len(result.get('apis', []))
+            yield file, result
         
-        project_info.importantNotesForNextDeveloper = " | ".join(notes) if notes else "No special notes."
+        self.coverage = {
+            'partial': analyzed < len(files),
+            'filesAnalyzed': analyzed,
+            'filesTotal': len(files),
+            'bytesAnalyzed': analyzed_bytes,
+            'bytesTotal': sum(sizes.get(f, 0) for f in files),
+        }
+        if self.sample_rate:
+            self.coverage['sampleRate'] = self.sample_rate
+            self.coverage.update(self.estimate_totals(files, found))
+    
+    def analyze_cached(self, file: Path) -> Dict:
+        """Analyze a file, reusing a cached result when the file is unchanged"""
+        if self.cache is None:
+            return self.analyze_file_content(file)
         
-        print(f"✅ Analysis complete. Found {len(all_apis)} API endpoints and {len(all_todos)} TODOs.")
+        key = self.file_keys.pop(file) if file in self.file_keys else self.cache.key_for(file)
+        result = self.cache.get(key)
+        if result is None:
+            result = self.analyze_file_content(file)
+            self.cache.put(key, result)
+        return self.rebind_result(result, file)
+    
+    def rebind_result(self, result: Dict, file: Path) -> Dict:
+        """Point a cached result, possibly produced for identical content elsewhere, at this file"""
+        rel_path = str(file.relative_to(self.project_path)).replace('\\', '/')
+        if result['path'] == rel_path:
+            return result
+        rebound = dict(result, path=rel_path)
+        if 'apis' in result:
+            rebound['apis'] = [dict(api, file=rel_path) for api in result['apis']]
+        return rebound
+    
+    def deadline_exceeded(self) -> bool:
+        """Check whether the scan has used up its time budget"""
+        return self.deadline is not None and time.monotonic() >= self.scan_started + self.deadline
+    
+    def stage_allowed(self, stage: str) -> bool:
+        """Whether an optional repo-wide stage still fits in the deadline; records it as skipped if not"""
+        if not self.deadline_exceeded():
+            return True
+        self.skipped_stages.append(stage)
+        self.progress(f"⏱️  Deadline reached; skipping {stage}")
+        return False
+    
+    def scan(self, inventory: Optional[Dict] = None) -> ProjectInfo:
+        """Main scanning method; runs iter_scan and hands every event to the sinks"""
+        project_info = None
+        for event in self.iter_scan(inventory):
+            self.dispatch(event)
+            if event.kind == 'summary_ready':
+                project_info = event.info
         return project_info
     
-    def has_changes(self) -> bool:
-        """Check if any files have changed"""
-        for root, dirs, files in os.walk(self.project_path):
-            dirs[:] = [d for d in dirs if not self.should_ignore(os.path.join(root, d))]
+    def iter_scan(self, inventory: Union[Dict, Iterable[str], None] = None, summarize: bool = True) -> Iterator[ScanEvent]:
+        """Scan step by step, yielding events instead of handing them to the sinks or writing files.
+        
+        Each file is analyzed only when the consumer asks for the next event, so a slow consumer
+        throttles the scan. inventory is a scan_directory() result or an iterable of paths. With
+        summarize=False only the walk and per-file analysis run and no results are kept.
+        """
+        with self.pending_lock:
+            pending, self.pending = self.pending, []
+        try:
+            self.progress(f"🚀 Starting project analysis: {self.project_path}")
+            yield from self.drain()
+            self.scan_started = time.monotonic()
+            self.scan_errors = []
+            self.skipped_stages = []
+            self.phase_times = {}
+            self.file_keys = {}
+            cache_before = (getattr(self.cache, 'hits', 0), getattr(self.cache, 'misses', 0))
             
+            # Perform initial scan, unless the caller already listed the files
+            with self.phase('walk'):
+                if inventory is None:
+                    scan_result = self.scan_directory()
+                elif isinstance(inventory, dict):
+                    scan_result = inventory
+                else:
+                    scan_result = self.inventory_from_paths(inventory)
+            files = scan_result['files']
+            self.project_files = scan_result['project_files']
+            self.total_files = scan_result['total_files']
+            yield from self.drain()
             for file in files:
-                filepath = Path(root) / file
+                yield FileDiscovered(str(file.relative_to(self.project_path)).replace('\\', '/'), scan_result['sizes'][file])
+            
+            if summarize:
+                # Detect technology stack
+                with self.phase('detect_stack'):
+                    stack = self.detect_stack(files)
+                self.progress(f"🔧 Detected stack: {', '.join(stack)}")
                 
-                if self.should_ignore(str(filepath)):
-                    continue
+                # Generate summary
+                with self.phase('generate_summary'):
+                    summary = self.generate_summary(files, stack)
                 
-                current_hash = self.get_file_hash(filepath)
-                file_key = str(filepath)
+                # Extract dependencies
+                with self.phase('extract_dependencies'):
+                    dependencies = self.extract_dependencies(files)
                 
-                if file_key in self.file_hashes:
-                    if current_hash != self.file_hashes[file_key]:
-                        return True
-                else:
-                    return True
+                # Detect run commands
+                with self.phase('detect_run_commands'):
+                    run_commands = self.detect_run_commands(files)
+                
+                # Workspace packages, each cached as one unit; unchanged ones skip analysis entirely
+                packages = []
+                reused = {}
+                if self.stage_allowed('discover_workspaces'):
+                    with self.phase('discover_workspaces'):
+                        packages = self.discover_workspaces(files)
+                        reused = self.load_package_units(packages)
+            
+            # Identify key files
+            with self.phase('identify_key_files'):
+                key_files = self.identify_key_files(files)
+            
+            # Collect TODOs, APIs and database indicators from file contents
+            self.progress("📄 Analyzing file contents...")
+            yield from self.drain()
+            file_results = []
+            with self.phase('analyze'):
+                for _, result in self.iter_analyze(files, scan_result['sizes'], key_files, reused if summarize else None):
+                    if summarize:
+                        file_results.append(result)
+                    if self.pending:
+                        yield from self.drain()
+                    yield FileAnalyzed(result['path'], result)
+            self.file_results = file_results
+            self.file_keys = {}
+            
+            if not summarize:
+                self.record_scan(self.coverage['filesAnalyzed'], cache_before)
+                yield from self.drain()
+                return
+            
+            all_todos = []
+            all_apis = []
+            for file_info in file_results:
+                all_todos.extend(file_info.get('todos', []))
+                all_apis.extend(file_info.get('apis', []))
+            
+            # Per-package summaries; the fields above and below are the rolled-up root view
+            workspaces = []
+            if packages and self.stage_allowed('summarize_workspaces'):
+                with self.phase('summarize_workspaces'):
+                    workspaces = self.summarize_workspaces(packages, file_results)
+            
+            # Line counts and size distributions per language and top-level directory
+            metrics = {}
+            if self.stage_allowed('compute_metrics'):
+                with self.phase('compute_metrics'):
+                    metrics = self.compute_metrics(files, scan_result['sizes'], file_results)
+                self.progress(f"📊 {metrics['lines']} lines ({metrics['codeLines']} code) across {len(metrics['languages'])} languages")
+            
+            # Analyze architecture
+            with self.phase('analyze_architecture'):
+                architecture = self.analyze_architecture(files, stack, file_results, workspaces)
+            self.progress(f"🏗️  Architecture: Frontend: {architecture['frontend']}, Backend: {architecture['backend']}")
+            
+            # Resolve Express mounts into fully qualified routes
+            route_table, route_issues = [], []
+            if self.stage_allowed('resolve_routes'):
+                with self.phase('resolve_routes'):
+                    route_table, route_issues = self.resolve_routes(file_results)
+            if route_table:
+                self.progress(f"🧭 Resolved {len(route_table)} Express routes ({len(route_issues)} shadowed or conflicting)")
+            
+            # Prepare project info
+            project_info = ProjectInfo()
+            project_info.projectName = self.project_name
+            project_info.projectSummary = summary
+            project_info.detectedStack = stack
+            project_info.architecture = architecture
+            project_info.keyFiles = key_files
+            project_info.dependencies = dependencies
+            project_info.howToRun = run_commands
+            project_info.APIsDetected = all_apis[:50]  # Limit to 50 APIs
+            project_info.unfinishedFeaturesOrTODOs = all_todos[:50]  # Limit to 50 TODOs
+            project_info.routeTable = route_table
+            project_info.routeIssues = route_issues
+            project_info.metrics = metrics
+            project_info.workspaces = workspaces
+            
+            # Generate important notes
+            notes = []
+            if self.coverage['partial']:
+                notes.append(f"Partial scan: analyzed {self.coverage['filesAnalyzed']} of {self.coverage['filesTotal']} files.")
+            
+            if self.skipped_stages:
+                self.coverage['skippedStages'] = list(self.skipped_stages)
+                notes.append(f"Deadline reached; skipped {', '.join(self.skipped_stages)}.")
+            
+            if self.skipped_files:
+                notes.append(f"{len(self.skipped_files)} files exceeded the per-file analysis budget and were skipped.")
+            
+            if all_todos:
+                notes.append(f"Found {len(all_todos)} TODO/FIXME comments in code.")
+            
+            if route_issues:
+                notes.append(f"{len(route_issues)} Express routes are shadowed by or conflict with earlier routes.")
+            
+            if workspaces:
+                notes.append(f"Workspace monorepo with {len(workspaces)} packages: {', '.join(w['name'] for w in workspaces)}.")
+            
+            # Check for backend folder
+            backend_files = [f for f in files if 'backend' in str(f).lower() and 'node_modules' not in str(f).lower()]
+            if backend_files:
+                notes.append(f"Backend folder detected with {len(backend_files)} files.")
+            
+            # Check for environment files
+            env_files = [f for f in files if '.env' in f.name.lower() and not self.should_ignore(str(f))]
+            if env_files:
+                notes.append(f"Found {len(env_files)} environment configuration files.")
+            
+            if not run_commands:
+                notes.append("No run commands detected. Check README for manual setup.")
+            elif len(run_commands) < 3:
+                notes.append("Limited run commands detected. May need manual configuration.")
+            
+            project_info.importantNotesForNextDeveloper = " | ".join(notes) if notes else "No special notes."
+            
+            self.progress(f"✅ Analysis complete. Found {len(all_apis)} API endpoints and {len(all_todos)} TODOs.")
+            self.record_scan(self.coverage['filesAnalyzed'], cache_before)
+            yield from self.drain()
+            yield SummaryReady(project_info)
+        finally:
+            with self.pending_lock:
+                self.pending = pending
+    
+    def drain(self) -> Iterator[ScanEvent]:
+        """Yield and clear the events queued by the running iter_scan"""
+        with self.pending_lock:
+            events, self.pending = self.pending, []
+        yield from events
+    
+    def record_scan(self, analyzed: int, cache_before: Tuple[int, int]):
+        """Account for a completed scan in the stats and keep its record for the scan log"""
+        duration = time.monotonic() - self.scan_started
+        hits = getattr(self.cache, 'hits', 0) - cache_before[0]
+        misses = getattr(self.cache, 'misses', 0) - cache_before[1]
         
-        return False
+        self.stats.inc('introspect_scans_total')
+        self.stats.inc('introspect_files_analyzed_total', analyzed)
+        self.stats.inc('introspect_files_skipped_total', len(self.skipped_files))
+        self.stats.inc('introspect_cache_hits_total', hits)
+        self.stats.inc('introspect_cache_misses_total', misses)
+        self.stats.observe('introspect_scan_duration_seconds', duration)
+        self.stats.set('introspect_last_scan_files', analyzed)
+        self.stats.set('introspect_last_scan_duration_seconds', duration)
+        self.stats.set('introspect_last_scan_timestamp_seconds', time.time())
+        
+        self.last_scan = {
+            'durationSeconds': round(duration, 3),
+            'filesTotal': self.coverage.get('filesTotal', 0),
+            'filesAnalyzed': analyzed,
+            'filesSkipped': len(self.skipped_files),
+            'partial': self.coverage.get('partial', False),
+            'cacheHits': hits,
+            'cacheMisses': misses,
+        }
     
-    def update_file_hashes(self):
-        """Update stored file hashes"""
-        for root, dirs, files in os.walk(self.project_path):
-            dirs[:] = [d for d in dirs if not self.should_ignore(os.path.join(root, d))]
-            
-            for file in files:
-                filepath = Path(root) / file
-                
-                if self.should_ignore(str(filepath)):
-                    continue
-                
-                self.file_hashes[str(filepath)] = self.get_file_hash(filepath)
+    def scan_shard(self, index: int, count: int) -> Dict:
+        """Analyze shard index (1-based) of count and return its mergeable partial result"""
+        self.progress(f"🧩 Scanning shard {index}/{count} of {self.project_path}")
+        self.scan_started = time.monotonic()
+        inventory = self.scan_directory()
+        
+        def rel(path: Path) -> str:
+            return str(path.relative_to(self.project_path)).replace('\\', '/')
+        
+        files = [f for f in inventory['files'] if shard_of(rel(f), count) == index - 1]
+        project_files = [f for f in inventory['project_files'] if shard_of(rel(f), count) == index - 1]
+        
+        self.progress(f"📄 Analyzing {len(files)} of {len(inventory['files'])} files...")
+        _, file_results = self.analyze_files(files, inventory['sizes'], [])
+        
+        # Manifests and READMEs travel with the partial so merging never reads the tree
+        project_texts = {}
+        for file in project_files:
+            if file.name in self.PROJECT_TEXT_FILES:
+                try:
+                    project_texts[rel(file)] = file.read_text(encoding='utf-8', errors='ignore')
+                except OSError:
+                    project_texts[rel(file)] = None
+        
+        return {
+            'projectPath': str(self.project_path),
+            'shard': index,
+            'shards': count,
+            'totalFiles': inventory['total_files'],
+            'files': [[rel(f), inventory['sizes'][f]] for f in files],
+            'projectFiles': [rel(f) for f in project_files],
+            'projectTexts': project_texts,
+            'results': file_results,
+        }
     
-    def watch(self, interval: int = 5):
-        """Watch for changes and update JSON"""
-        print(f"👀 Watching for changes in {self.project_path} (Ctrl+C to stop)")
-        print(f"📝 Updates will be saved to project_summary.json")
+    def merge_shards(self, partials: List[Dict]) -> ProjectInfo:
+        """Build the ProjectInfo a single-node scan would produce from every shard's partial"""
+        count = partials[0]['shards']
+        indexes = sorted(partial['shard'] for partial in partials)
+        if any(partial['shards'] != count for partial in partials) or indexes != list(range(1, count + 1)):
+            raise ValueError(f"expected one partial for each of {count} shards, got shards {indexes}")
+        if len({partial['totalFiles'] for partial in partials}) > 1:
+            raise ValueError("shards were scanned from different versions of the project")
         
-        # Initial scan
-        project_info = self.scan(watch=True)
-        self.save_json(project_info)
-        self.save_markdown(project_info)
+        files = []
+        sizes = {}
+        project_files = []
+        results = []
+        for partial in partials:
+            for rel_path, size in partial['files']:
+                file = self.project_path / rel_path
+                files.append(file)
+                sizes[file] = size
+            project_files.extend(self.project_path / rel_path for rel_path in partial['projectFiles'])
+            self.project_texts.update(partial['projectTexts'])
+            results.extend(partial['results'])
+        
+        # Name the summary after the scanned project even when writing it elsewhere
+        self.project_name = Path(partials[0]['projectPath']).name
+        
+        # Restore the walker's path order so every stage sees the single-node inventory
+        files.sort(key=str)
+        project_files.sort(key=str)
+        self.cache = PartialResults(self.project_path, results)
+        
+        return self.scan(inventory={
+            'files': files,
+            'sizes': sizes,
+            'total_size': sum(sizes.values()),
+            'project_files': project_files,
+            'total_files': partials[0]['totalFiles'],
+        })
+    
+    def scan_commit(self, commit: str, base: Optional[Dict] = None) -> Dict:
+        """Scan a commit straight from git objects, reusing base snapshot results for unchanged blobs"""
+        self.progress(f"🔖 Scanning commit {commit[:12]} of {self.project_path}")
+        self.project_texts = {}
+        pruned_dirs = {self.project_path: False}
+        
+        def pruned(directory: Path) -> bool:
+            # The walker never descends into ignored directories, whatever their files look like
+            if directory not in pruned_dirs:
+                pruned_dirs[directory] = pruned(directory.parent) or self.should_ignore(str(directory))
+            return pruned_dirs[directory]
+        
+        files = []
+        sizes = {}
+        project_files = []
+        blobs = {}
+        for rel_path, blob, size in git_tree(self.project_path, commit):
+            file = self.project_path / rel_path
+            if pruned(file.parent) or self.should_ignore(str(file)) or self.is_output_file(str(file)):
+                continue
+            blobs[file] = blob
+            if file.name in self.PROJECT_FILES:
+                project_files.append(file)
+            if self.is_code_file(file.name):
+                files.append(file)
+                sizes[file] = size
+        files.sort(key=str)
+        project_files.sort(key=str)
+        
+        # Results for skipped files depend on timing, so only completed ones are reused; line
+        # metrics depend on the language, so a blob is only reused under the same language
+        reusable = {}
+        if base is not None:
+            for rel_path, entry in base['files'].items():
+                if 'error' not in entry['result']:
+                    reusable[entry['blob'], self.language_of(rel_path.rsplit('/', 1)[-1])] = entry['result']
+        reuse_keys = {file: (blobs[file], self.language_of(file.name)) for file in files}
+        
+        text_files = [f for f in project_files if f.name in self.PROJECT_TEXT_FILES]
+        changed = [f for f in files if reuse_keys[f] not in reusable]
+        contents = git_blobs(self.project_path, {blobs[f] for f in changed + text_files})
+        self.progress(f"♻️  Reusing {len(files) - len(changed)} results from the base snapshot; analyzing {len(changed)} files")
+        
+        results = []
+        for file in files:
+            if reuse_keys[file] in reusable:
+                results.append(self.rebind_result(reusable[reuse_keys[file]], file))
+            else:
+                results.append(self.analyze_file_content(file, contents[blobs[file]]))
         
-        last_update = time.time()
+        for file in text_files:
+            rel_path = str(file.relative_to(self.project_path)).replace('\\', '/')
+            self.project_texts[rel_path] = decode_text(contents[blobs[file]])
+        self.cache = PartialResults(self.project_path, results)
         
+        project_info = self.scan(inventory={
+            'files': files,
+            'sizes': sizes,
+            'total_size': sum(sizes.values()),
+            'project_files': project_files,
+            'total_files': len(blobs),
+        })
+        return {
+            'commit': commit,
+            'analyzerVersion': ANALYZER_VERSION,
+            'projectInfo': project_info.to_dict(),
+            'dependencyVersions': [list(pair) for pair in self.dependency_versions()],
+            'files': {result['path']: {'blob': blobs[file], 'result': result} for file, result in zip(files, results)},
+        }
+    
+    def snapshot_store(self) -> Path:
+        """Directory of stored snapshots; introspect/snapshots in the git directory unless set"""
+        if self.snapshot_dir is None:
+            # A snapshot only covers the project directory, so each one inside the repository gets its own store
+            output = git_output(self.project_path, ['rev-parse', '--git-dir', '--show-prefix'])
+            git_dir, prefix = os.fsdecode(output).split('\n')[:2]
+            self.snapshot_dir = (self.project_path / git_dir).resolve() / 'introspect' / 'snapshots' / prefix
+        return self.snapshot_dir
+    
+    def load_snapshot(self, commit: str) -> Optional[Dict]:
+        """Load the stored snapshot of a commit, if one exists for the current analyzer"""
         try:
-            while True:
-                time.sleep(interval)
+            snapshot = json.loads((self.snapshot_store() / f"{commit}.json").read_bytes())
+        except (OSError, ValueError):
+            return None
+        return snapshot if snapshot.get('analyzerVersion') == ANALYZER_VERSION else None
+    
+    def snapshot(self, commit: str, base: Optional[Dict] = None) -> Dict:
+        """Return the snapshot of a commit, scanning and storing it when it is not stored yet"""
+        snapshot = self.load_snapshot(commit)
+        if snapshot is None:
+            snapshot = self.scan_commit(commit, base)
+            path = self.snapshot_store() / f"{commit}.json"
+            path.parent.mkdir(parents=True, exist_ok=True)
+            atomic_write(path, json_dumps(snapshot, indent=None))
+            self.progress(f"💾 Snapshot saved: {path}")
+        return snapshot
+    
+    def file_signature(self, filepath: Path, previous: Optional[Tuple[int, int, str]]) -> Optional[Tuple[int, int, str]]:
+        """(size, mtime, content hash) of a file, re-hashing only when its stat changed"""
+        try:
+            st = os.stat(filepath)
+        except OSError:
+            return None
+        if previous is not None and previous[:2] == (st.st_size, st.st_mtime_ns):
+            return previous
+        return (st.st_size, st.st_mtime_ns, self.get_file_hash(filepath))
+    
+    def poll_changes(self) -> int:
+        """Count files added, changed or removed since the last poll, and remember the current state"""
+        current = {}
+        changed = 0
+        for path_str, _ in self.walk_files(self.is_code_file):
+            previous = self.file_hashes.get(path_str)
+            signature = self.file_signature(Path(path_str), previous)
+            if signature is None:
+                continue
+            current[path_str] = signature
+            # A touched file with unchanged content is not a change
+            if previous is None or signature[2] != previous[2]:
+                changed += 1
+        changed += len(self.file_hashes.keys() - current.keys())
+        self.file_hashes = current
+        return changed
+    
+    def watch(self, interval: float = 5, min_rescan_interval: float = WATCH_MIN_RESCAN_SECONDS,
+              max_cancels: int = WATCH_MAX_CONSECUTIVE_CANCELS):
+        """Watch for changes and update JSON, cancelling scans that newer changes have made stale"""
+        import threading
+        
+        self.progress(f"👀 Watching for changes in {self.project_path} (Ctrl+C to stop)")
+        self.progress("📝 Updates will be saved to project_summary.json")
+        self.stats.set('introspect_watch_interval_seconds', interval)
+        
+        # Per-file results outlive a cancelled scan, so the next generation only analyzes what is left
+        if self.cache is None:
+            self.cache = StatCache()
+        
+        self.watch_lock = threading.Lock()
+        self.watch_stop = threading.Event()
+        self.generation = 0
+        self.pending_changes = 0
+        self.pending_since = None
+        self.consecutive_cancels = 0
+        wake = self.watch_wake = threading.Event()
+        last_poll = time.monotonic()
+        self.poll_changes()
+        
+        def poll():
+            nonlocal last_poll
+            while not self.watch_stop.wait(interval):
+                # The changes found now were made after the previous poll began
+                changed_after = last_poll
+                last_poll = time.monotonic()
+                try:
+                    changes = self.poll_changes()
+                except Exception as e:
+                    self.record_error('watch', e)
+                    continue
+                if changes:
+                    with self.watch_lock:
+                        self.generation += 1
+                        self.pending_changes += changes
+                        if self.pending_since is None:
+                            self.pending_since = time.monotonic()
+                        self.stats.set('introspect_pending_changes', self.pending_changes)
+                        # Only a scan that started before the changes is certainly stale, and only
+                        # while analyzing, since finished per-file results survive the restart
+                        # but later phases would be redone; after max_cancels in a row the scan
+                        # finishes anyway, so edits cannot starve the outputs
+                        token = self.cancel_token
+                        if (token is not None and token.started < changed_after
+                                and token.phase in self.CANCELLABLE_PHASES
+                                and self.consecutive_cancels < max_cancels):
+                            token.cancel()
+                    self.progress(f"\n🔄 Changes detected at {datetime.datetime.now().strftime('%H:%M:%S')}")
+                    wake.set()
+                self.write_metrics_file()
+        
+        poller = threading.Thread(target=poll, name='watch-poller', daemon=True)
+        poller.start()
+        
+        trigger = 'initial'
+        last_start = 0.0
+        try:
+            while not self.watch_stop.is_set():
+                # Rate limit: bursts of edits start at most one scan per min_rescan_interval
+                delay = last_start + min_rescan_interval - time.monotonic()
+                if delay > 0 and self.watch_stop.wait(delay):
+                    break
+                last_start = time.monotonic()
+                wake.clear()
+                self.rescan(trigger)
                 
-                if self.has_changes():
-                    print(f"\n🔄 Changes detected at {datetime.datetime.now().strftime('%H:%M:%S')}")
-                    project_info = self.scan(watch=True)
-                    self.save_json(project_info)
-                    self.save_markdown(project_info)
-                    last_update = time.time()
-                elif time.time() - last_update > 60:
+                if wake.is_set():
+                    trigger = 'change'
+                elif wake.wait(WATCH_PERIODIC_SECONDS):
+                    trigger = 'change'
+                else:
                     # Periodic update every minute even without changes
-                    print(f"\n📊 Periodic update at {datetime.datetime.now().strftime('%H:%M:%S')}")
-                    project_info = self.scan(watch=True)
-                    self.save_json(project_info)
-                    self.save_markdown(project_info)
-                    last_update = time.time()
+                    self.progress(f"\n📊 Periodic update at {datetime.datetime.now().strftime('%H:%M:%S')}")
+                    trigger = 'periodic'
                     
         except KeyboardInterrupt:
-            print("\n👋 Stopping watcher")
+            self.progress("\n👋 Stopping watcher")
+        finally:
+            self.stop_watch()
+            poller.join()
+    
+    def stop_watch(self):
+        """Make a running watch() return after its current scan"""
+        self.watch_stop.set()
+        self.watch_wake.set()
+    
+    def rescan(self, trigger: str):
+        """Scan and save in watch mode as a new generation; record a failed or superseded scan instead of stopping"""
+        with self.watch_lock:
+            token = self.cancel_token = CancelToken(self.generation)
+            covered = self.pending_changes
+            pending_since = self.pending_since
+        self.stats.set('introspect_scan_generation', token.generation)
+        
+        try:
+            project_info = self.scan()
+            with self.phase('save'):
+                self.save_outputs(project_info)
+        except ScanCancelled:
+            with self.watch_lock:
+                self.consecutive_cancels += 1
+            self.stats.inc('introspect_scans_cancelled_total')
+            self.progress(f"⏭️  Scan generation {token.generation} superseded; restarting with its finished files cached")
+            self.report_scan(trigger, 'scan_cancelled', token.generation)
+            return
+        except Exception as e:
+            self.stats.inc('introspect_scan_failures_total')
+            self.record_error('scan', e)
+            self.progress(f"❌ Scan failed: {type(e).__name__}: {e}")
+            self.report_scan(trigger, 'scan_failed', token.generation)
+            return
+        finally:
+            with self.watch_lock:
+                self.cancel_token = None
+        
+        finished_at = time.monotonic()
+        with self.watch_lock:
+            self.consecutive_cancels = 0
+            self.pending_changes -= covered
+            if self.pending_changes == 0:
+                self.pending_since = None
+            self.stats.set('introspect_pending_changes', self.pending_changes)
+        if pending_since is not None:
+            self.stats.observe('introspect_change_latency_seconds', finished_at - pending_since)
+        if isinstance(self.cache, StatCache):
+            self.cache.prune()
+        self.report_scan(trigger, generation=token.generation)
+    
+    def report_scan(self, trigger: str, event: str = 'scan', generation: Optional[int] = None):
+        """Write the structured log line for the last scan and refresh the metrics file"""
+        if self.scan_log:
+            errors = {}
+            for error in self.scan_errors:
+                errors[error['phase']] = errors.get(error['phase'], 0) + 1
+            record = {
+                'time': datetime.datetime.now().isoformat(),
+                'event': event,
+                'project': str(self.project_path),
+                'trigger': trigger,
+                **({'generation': generation} if generation is not None else {}),
+                **(self.last_scan if event == 'scan' else {}),
+                'phases': {name: round(seconds, 3) for name, seconds in self.phase_times.items()},
+                'errorCounts': errors,
+                'errors': self.scan_errors[:20],
+                'rssBytes': resident_memory_bytes(),
+            }
+            line = json.dumps(record, ensure_ascii=False) + '\n'
+            if self.scan_log == '-':
+                sys.stderr.write(line)
+                sys.stderr.flush()
+            else:
+                with open(self.scan_log, 'a', encoding='utf-8') as f:
+                    f.write(line)
+        self.write_metrics_file()
+    
+    def write_metrics_file(self):
+        """Atomically rewrite the Prometheus textfile, if one is configured"""
+        if self.metrics_file:
+            atomic_write(self.metrics_file, self.stats.render().encode('utf-8'))
     
     def save_json(self, project_info: ProjectInfo):
-        """Save project info to JSON file"""
-        output_path = self.project_path / 'project_summary.json'
+        """Save project info to the summary file in the selected output format"""
+        fmt = self.output_format
+        output_path = self.output_dir / SUMMARY_FORMATS[fmt]
         
         # Convert to dict
-        data = asdict(project_info)
+        data = project_info.to_dict()
         
         # Add metadata
         data['_metadata'] = {
             'generated_at': datetime.datetime.now().isoformat(),
             'project_path': str(self.project_path),
             'scanner_version': '1.0.0',
-            'total_files_scanned': len([f for f in self.project_path.rglob('*') if f.is_file() and not self.should_ignore(str(f))])
+            'total_files_scanned': self.total_files,
+            'partial': self.coverage.get('partial', False),
+            'coverage': self.coverage,
+            'skipped_files': self.skipped_files
         }
         
-        # Save to file
-        with open(output_path, 'w', encoding='utf-8') as f:
-            json.dump(data, f, indent=2, ensure_ascii=False)
+        # Save to file, skipping the write when only the timestamp changed
+        previous = self.output_documents.get(output_path)
+        if previous is None and output_path.exists():
+            try:
+                previous = decode_summary(output_path.read_bytes(), fmt)
+            except Exception:
+                previous = None
         
-        print(f"✅ JSON saved to: {output_path}")
+        label = 'JSON' if fmt == 'json' else f"Summary ({fmt})"
+        encoded = encode_summary(data, fmt)
+        if self.write_output(output_path, encoded, self.json_digest(data), self.json_digest(previous) if previous is not None else None):
+            if self.emit_patches and previous is not None:
+                self.append_patch(previous, data)
+            self.progress(f"✅ {label} saved to: {output_path}")
+        else:
+            self.progress(f"✅ {label} unchanged: {output_path}")
+        self.output_documents[output_path] = data
         return output_path
     
+    def json_digest(self, data: Dict) -> str:
+        """Hash a summary document, ignoring its generation timestamp"""
+        import hashlib
+        stable = dict(data)
+        stable['_metadata'] = {k: v for k, v in data.get('_metadata', {}).items() if k != 'generated_at'}
+        return hashlib.sha256(json.dumps(stable, sort_keys=True).encode('utf-8')).hexdigest()
+    
+    def markdown_digest(self, text: str) -> str:
+        """Hash a Markdown guide, ignoring its 'Generated on' line"""
+        import hashlib
+        stable = re.sub(r'^\*Generated on [^\n]*\*$', '', text, count=1, flags=re.MULTILINE)
+        return hashlib.sha256(stable.encode('utf-8')).hexdigest()
+    
+    def write_output(self, path: Path, content: bytes, digest: str, previous_digest: Optional[str] = None) -> bool:
+        """Atomically write an output file unless its content digest is unchanged"""
+        if previous_digest is None:
+            previous_digest = self.output_digests.get(path)
+        if digest == previous_digest and path.exists():
+            self.output_digests[path] = digest
+            return False
+        path.parent.mkdir(parents=True, exist_ok=True)
+        atomic_write(path, content)
+        self.output_digests[path] = digest
+        return True
+    
+    def append_patch(self, previous: Dict, data: Dict):
+        """Append the JSON Patch between two summaries to project_summary.patch.jsonl"""
+        record = {
+            'generated_at': data['_metadata']['generated_at'],
+            'from': self.json_digest(previous),
+            'to': self.json_digest(data),
+            'patch': json_patch(previous, data),
+        }
+        with open(self.output_dir / 'project_summary.patch.jsonl', 'a', encoding='utf-8') as f:
+            f.write(json.dumps(record, ensure_ascii=False) + '\n')
+    
     def save_markdown(self, project_info: ProjectInfo):
         """Save project info to Markdown file"""
-        output_path = self.project_path / 'PROJECT_GUIDE.md'
+        output_path = self.output_dir / 'PROJECT_GUIDE.md'
         
-        with open(output_path, 'w', encoding='utf-8') as f:
+        with io.StringIO() as f:
             f.write(f"# Project Guide: {project_info.projectName}\n\n")
             f.write(f"*Generated on {datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')}*\n\n")
             
+            if self.coverage.get('partial'):
+                f.write(f"> ⚠️ Partial scan: analyzed {self.coverage['filesAnalyzed']} of {self.coverage['filesTotal']} files "
+                        f"({self.coverage['bytesAnalyzed']/1024/1024:.1f} of {self.coverage['bytesTotal']/1024/1024:.1f} MB)\n\n")
+            
             f.write("## 📋 Summary\n")
             f.write(f"{project_info.projectSummary}\n\n")
             
@@ -938,6 +3508,16 @@ class ProjectScanner:
                 f.write(f"- **API Directories**: {', '.join(project_info.architecture['apiDirectories'])}\n")
             f.write("\n")
             
+            if project_info.workspaces:
+                f.write("## 🧱 Workspace Packages\n")
+                f.write("| Package | Path | Role | Stack | Files | Lines | APIs | TODOs | Depends on |\n")
+                f.write("|---|---|---|---|---|---|---|---|---|\n")
+                for package in project_info.workspaces:
+                    f.write(f"| {package['name']} | `{package['path']}` | {package['role']} | {', '.join(package['detectedStack'])} | "
+                            f"{package['files']} | {package['lines']} | {package['apiCount']} | {package['todoCount']} | "
+                            f"{', '.join(package['workspaceDependencies']) or '-'} |\n")
+                f.write("\n")
+            
             f.write("## 📁 Key Files\n")
             for file in project_info.keyFiles:
                 f.write(f"- `{file}`\n")
@@ -984,6 +3564,46 @@ class ProjectScanner:
                     f.write(f"\n*... and {len(project_info.APIsDetected) - 20} more API endpoints*\n")
                 f.write("\n")
             
+            # Route table
+            if project_info.routeTable:
+                f.write("## 🧭 Route Table\n")
+                for route in project_info.routeTable[:30]:
+                    f.write(f"- `{route['method']} {route['path']}` → `{route['file']}:{route['line']}`\n")
+                if len(project_info.routeTable) > 30:
+                    f.write(f"\n*... and {len(project_info.routeTable) - 30} more routes*\n")
+                
+                if project_info.routeIssues:
+                    f.write("\n### Shadowed or Conflicting Routes\n")
+                    for issue in project_info.routeIssues:
+                        by = issue['by']
+                        relation = {'shadowed': 'is shadowed by', 'overlap': 'is partly shadowed by'}.get(issue['kind'], 'duplicates')
+                        f.write(f"- `{issue['method']} {issue['path']}` (`{issue['file']}:{issue['line']}`) {relation} "
+                                f"`{by['method']} {by['path']}` (`{by['file']}:{by['line']}`)\n")
+                f.write("\n")
+            
+            if project_info.metrics.get('languages'):
+                metrics = project_info.metrics
+                f.write("## 📊 Code Metrics\n")
+                f.write(f"{metrics['lines']} lines in {metrics['files']} files "
+                        f"({metrics['codeLines']} code, {metrics['commentLines']} comment, {metrics['blankLines']} blank)\n")
+                for title, key in (('Language', 'languages'), ('Directory', 'directories')):
+                    f.write(f"\n| {title} | Files | Lines | Code | Comment % | Blank % | Median size | p90 size | Largest file |\n")
+                    f.write("|---|---|---|---|---|---|---|---|---|\n")
+                    for group in metrics[key][:15]:
+                        largest = group['largestFiles'][0]
+                        f.write(f"| {group['name']} | {group['files']} | {group['lines']} | {group['codeLines']} | "
+                                f"{group['commentRatio'] * 100:.1f} | {group['blankRatio'] * 100:.1f} | "
+                                f"{format_size(group['sizePercentiles']['p50'])} | {format_size(group['sizePercentiles']['p90'])} | "
+                                f"`{largest['path']}` ({format_size(largest['bytes'])}) |\n")
+                    if len(metrics[key]) > 15:
+                        f.write(f"\n*... and {len(metrics[key]) - 15} more*\n")
+                
+                f.write("\n### Largest Files\n")
+                for file in metrics['largestFiles']:
+                    lines = f", {file['lines']} lines" if file['lines'] is not None else ''
+                    f.write(f"- `{file['path']}` ({file['language']}, {format_size(file['bytes'])}{lines})\n")
+                f.write("\n")
+            
             if project_info.unfinishedFeaturesOrTODOs:
                 f.write("## 🚧 TODO / FIXME Items\n")
                 # Group by type
@@ -1008,22 +3628,958 @@ class ProjectScanner:
             
             f.write("## 💡 Important Notes\n")
             f.write(f"{project_info.importantNotesForNextDeveloper}\n")
+            text = f.getvalue()
+        
+        previous_digest = None
+        if output_path not in self.output_digests and output_path.exists():
+            previous_digest = self.markdown_digest(output_path.read_text(encoding='utf-8', errors='ignore'))
         
-        print(f"📄 Markdown saved to: {output_path}")
+        if self.write_output(output_path, text.encode('utf-8'), self.markdown_digest(text), previous_digest):
+            self.progress(f"📄 Markdown saved to: {output_path}")
+        else:
+            self.progress(f"📄 Markdown unchanged: {output_path}")
         return output_path
+    
+    def save_outputs(self, project_info: ProjectInfo):
+        """Write every output the scanner is configured for"""
+        self.save_json(project_info)
+        self.save_markdown(project_info)
+        if self.index_path:
+            self.save_index(project_info)
+    
+    def save_index(self, project_info: ProjectInfo):
+        """Upsert the scan into the SQLite index, rewriting only files whose results changed"""
+        import hashlib
+        import sqlite3
+        
+        conn = sqlite3.connect(str(self.index_path))
+        try:
+            fts = create_index_schema(conn)
+            written = 0
+            removed = 0
+            with conn:
+                stored = {path: (file_id, digest) for file_id, path, digest in
+                          conn.execute('SELECT id, path, result_digest FROM files')}
+                seen = set()
+                for result in self.file_results:
+                    path = result['path']
+                    seen.add(path)
+                    digest = hashlib.sha1(json.dumps(result, sort_keys=True).encode('utf-8')).hexdigest()
+                    if path in stored:
+                        file_id, previous = stored[path]
+                        if previous == digest:
+                            continue
+                        delete_file_rows(conn, file_id)
+                        conn.execute('UPDATE files SET result_digest = ?, error = ? WHERE id = ?',
+                                     (digest, result.get('error'), file_id))
+                    else:
+                        file_id = conn.execute('INSERT INTO files (path, result_digest, error) VALUES (?, ?, ?)',
+                                               (path, digest, result.get('error'))).lastrowid
+                    conn.executemany('INSERT INTO todos (file_id, type, text, line) VALUES (?, ?, ?, ?)',
+                                     [(file_id, t['type'], t['text'], t['line']) for t in result.get('todos', [])])
+                    conn.executemany('INSERT INTO apis (file_id, method, path, framework) VALUES (?, ?, ?, ?)',
+                                     [(file_id, a['method'], a['path'], a['framework']) for a in result.get('apis', [])])
+                    conn.executemany('INSERT INTO imports (file_id, module) VALUES (?, ?)',
+                                     [(file_id, module) for module in result.get('imports', [])])
+                    written += 1
+                
+                # A partial scan says nothing about the files it did not reach
+                if not self.coverage.get('partial'):
+                    for path, (file_id, _) in stored.items():
+                        if path not in seen:
+                            delete_file_rows(conn, file_id)
+                            conn.execute('DELETE FROM files WHERE id = ?', (file_id,))
+                            removed += 1
+                
+                conn.execute('DELETE FROM dependencies')
+                conn.executemany('INSERT INTO dependencies (name, version) VALUES (?, ?)', self.dependency_versions())
+                # Mounts in one file move the routes of another, so the table is rebuilt on every scan
+                conn.execute('DELETE FROM routes')
+                conn.executemany('INSERT INTO routes (method, path, file, line) VALUES (?, ?, ?, ?)',
+                                 [(r['method'], r['path'], r['file'], r['line']) for r in project_info.routeTable])
+                conn.executemany('INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)', [
+                    ('project_name', project_info.projectName),
+                    ('project_path', str(self.project_path)),
+                    ('generated_at', datetime.datetime.now().isoformat()),
+                    ('analyzer_version', ANALYZER_VERSION),
+                    ('detected_stack', json.dumps(project_info.detectedStack)),
+                    ('fts', '1' if fts else '0'),
+                ])
+        finally:
+            conn.close()
+        self.progress(f"🗃️  Index updated: {written} files written, {removed} removed ({self.index_path})")
+
+# Normalized tables behind --index; todos, apis and routes get FTS5 shadows when SQLite supports them.
+# apis holds each file's routes as written, routes the Express routes under their full mounted paths
+INDEX_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE IF NOT EXISTS files (id INTEGER PRIMARY KEY, path TEXT NOT NULL UNIQUE, result_digest TEXT, error TEXT);
+CREATE TABLE IF NOT EXISTS todos (id INTEGER PRIMARY KEY, file_id INTEGER NOT NULL REFERENCES files(id), type TEXT, text TEXT, line INTEGER);
+CREATE TABLE IF NOT EXISTS apis (id INTEGER PRIMARY KEY, file_id INTEGER NOT NULL REFERENCES files(id), method TEXT, path TEXT, framework TEXT);
+CREATE TABLE IF NOT EXISTS imports (id INTEGER PRIMARY KEY, file_id INTEGER NOT NULL REFERENCES files(id), module TEXT);
+CREATE TABLE IF NOT EXISTS routes (id INTEGER PRIMARY KEY, method TEXT, path TEXT, file TEXT, line INTEGER);
+CREATE TABLE IF NOT EXISTS dependencies (name TEXT NOT NULL, version TEXT NOT NULL, PRIMARY KEY (name, version));
+CREATE INDEX IF NOT EXISTS todos_file ON todos (file_id);
+CREATE INDEX IF NOT EXISTS todos_type ON todos (type);
+CREATE INDEX IF NOT EXISTS apis_file ON apis (file_id);
+CREATE INDEX IF NOT EXISTS apis_method_path ON apis (method, path);
+CREATE INDEX IF NOT EXISTS apis_path ON apis (path);
+CREATE INDEX IF NOT EXISTS imports_file ON imports (file_id);
+CREATE INDEX IF NOT EXISTS imports_module ON imports (module);
+CREATE INDEX IF NOT EXISTS routes_method_path ON routes (method, path);
+CREATE INDEX IF NOT EXISTS routes_path ON routes (path);
+'''
+
+INDEX_FTS_SCHEMA = '''
+CREATE VIRTUAL TABLE IF NOT EXISTS todos_fts USING fts5(text, content='todos', content_rowid='id');
+CREATE VIRTUAL TABLE IF NOT EXISTS apis_fts USING fts5(path, content='apis', content_rowid='id');
+CREATE VIRTUAL TABLE IF NOT EXISTS routes_fts USING fts5(path, content='routes', content_rowid='id');
+CREATE TRIGGER IF NOT EXISTS todos_fts_insert AFTER INSERT ON todos BEGIN
+    INSERT INTO todos_fts (rowid, text) VALUES (new.id, new.text);
+END;
+CREATE TRIGGER IF NOT EXISTS todos_fts_delete AFTER DELETE ON todos BEGIN
+    INSERT INTO todos_fts (todos_fts, rowid, text) VALUES ('delete', old.id, old.text);
+END;
+CREATE TRIGGER IF NOT EXISTS apis_fts_insert AFTER INSERT ON apis BEGIN
+    INSERT INTO apis_fts (rowid, path) VALUES (new.id, new.path);
+END;
+CREATE TRIGGER IF NOT EXISTS apis_fts_delete AFTER DELETE ON apis BEGIN
+    INSERT INTO apis_fts (apis_fts, rowid, path) VALUES ('delete', old.id, old.path);
+END;
+CREATE TRIGGER IF NOT EXISTS routes_fts_insert AFTER INSERT ON routes BEGIN
+    INSERT INTO routes_fts (rowid, path) VALUES (new.id, new.path);
+END;
+CREATE TRIGGER IF NOT EXISTS routes_fts_delete AFTER DELETE ON routes BEGIN
+    INSERT INTO routes_fts (routes_fts, rowid, path) VALUES ('delete', old.id, old.path);
+END;
+'''
 
-def main():
-    """Main entry point"""
+def create_index_schema(conn) -> bool:
+    """Create the index tables if needed; return whether full-text search is available"""
+    import sqlite3
+    
+    conn.execute('PRAGMA journal_mode = WAL')
+    conn.executescript(INDEX_SCHEMA)
+    try:
+        conn.executescript(INDEX_FTS_SCHEMA)
+    except sqlite3.OperationalError:
+        # SQLite built without FTS5; queries fall back to LIKE
+        return False
+    return True
+
+def delete_file_rows(conn, file_id: int):
+    """Remove one file's TODOs, APIs and imports from the index"""
+    for table in ['todos', 'apis', 'imports']:
+        conn.execute(f"DELETE FROM {table} WHERE file_id = ?", (file_id,))
+
+def fts_query(text: str) -> str:
+    """Turn free text into an FTS5 query matching every word as a prefix"""
+    return ' '.join('"' + word.replace('"', '""') + '"*' for word in text.split())
+
+def run_query(argv: List[str]) -> int:
+    """Query the SQLite index written by --index"""
     import argparse
+    import sqlite3
+    
+    parser = argparse.ArgumentParser(prog='introspect.py query', description='Query the SQLite index written by --index')
+    parser.add_argument('index', help='Index database written by --index')
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument('--limit', type=int, default=50, help='Maximum rows to print (default: 50)')
+    kinds = parser.add_subparsers(dest='kind', required=True)
+    todos = kinds.add_parser('todos', parents=[common], help='TODO/FIXME comments')
+    todos.add_argument('text', nargs='*', help='Words the comment must contain (prefix match)')
+    todos.add_argument('--type', help='Comment type, e.g. FIXME')
+    todos.add_argument('--file', help='File path glob, e.g. "server/*"')
+    apis = kinds.add_parser('apis', parents=[common], help='Detected API routes, Express ones also under their mounted paths')
+    apis.add_argument('text', nargs='*', help='Words the route path must contain (prefix match)')
+    apis.add_argument('--method', help='HTTP method, e.g. POST')
+    apis.add_argument('--prefix', help='Route path prefix, e.g. /api/admin')
+    imports = kinds.add_parser('imports', parents=[common], help='Files importing a module')
+    imports.add_argument('module', help='Imported module name')
+    deps = kinds.add_parser('deps', parents=[common], help='Declared dependencies')
+    deps.add_argument('name', nargs='?', help='Dependency name prefix')
+    args = parser.parse_args(argv)
+    text = ' '.join(getattr(args, 'text', []))
+    
+    if not Path(args.index).exists():
+        print(f"❌ Error: index '{args.index}' does not exist")
+        return 1
+    conn = sqlite3.connect(f"file:{Path(args.index).resolve()}?mode=ro", uri=True)
+    fts = conn.execute("SELECT value FROM meta WHERE key = 'fts'").fetchone() == ('1',)
+    
+    where = []
+    params = []
+    if args.kind == 'todos':
+        sql = 'SELECT files.path, todos.line, todos.type, todos.text FROM todos JOIN files ON files.id = todos.file_id'
+        if text and fts:
+            sql += ' JOIN todos_fts ON todos_fts.rowid = todos.id'
+            where.append('todos_fts MATCH ?')
+            params.append(fts_query(text))
+        elif text:
+            for word in text.split():
+                where.append('todos.text LIKE ?')
+                params.append(f"%{word}%")
+        if args.type:
+            where.append('todos.type = ?')
+            params.append(args.type.upper())
+        if args.file:
+            where.append('files.path GLOB ?')
+            params.append(args.file)
+        order = ' ORDER BY files.path, todos.line'
+    elif args.kind == 'apis':
+        # Routes as written in each file, and Express routes under their full mounted paths;
+        # indexes written before the routes table existed only have the former
+        sources = [('apis', 'SELECT files.path, apis.method, apis.path, apis.framework FROM apis JOIN files ON files.id = apis.file_id')]
+        if conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'routes'").fetchone():
+            sources.append(('routes', "SELECT routes.file, routes.method, routes.path, 'Express.js' FROM routes"))
+        selects = []
+        for table, select in sources:
+            conditions = []
+            if text and fts:
+                select += f" JOIN {table}_fts ON {table}_fts.rowid = {table}.id"
+                conditions.append(f"{table}_fts MATCH ?")
+                params.append(fts_query(text))
+            elif text:
+                for word in text.split():
+                    conditions.append(f"{table}.path LIKE ?")
+                    params.append(f"%{word}%")
+            if args.method:
+                conditions.append(f"{table}.method = ?")
+                params.append(args.method.upper())
+            if args.prefix:
+                # A range on the indexed column, unlike LIKE, never degrades to a scan
+                conditions.append(f"{table}.path >= ? AND {table}.path < ?")
+                params.extend([args.prefix, args.prefix + '\U0010ffff'])
+            selects.append(select + (' WHERE ' + ' AND '.join(conditions) if conditions else ''))
+        # UNION drops a route that is mounted at the root, where both tables hold the same row
+        sql = ' UNION '.join(selects)
+        order = ' ORDER BY 3, 2'
+    elif args.kind == 'imports':
+        sql = 'SELECT DISTINCT files.path, imports.module FROM imports JOIN files ON files.id = imports.file_id'
+        where.append('imports.module = ?')
+        params.append(args.module)
+        order = ' ORDER BY files.path'
+    else:
+        sql = 'SELECT name, version FROM dependencies'
+        if args.name:
+            where.append('name >= ? AND name < ?')
+            params.extend([args.name, args.name + '\U0010ffff'])
+        order = ' ORDER BY name, version'
+    
+    if where:
+        sql += ' WHERE ' + ' AND '.join(where)
+    sql += order + ' LIMIT ?'
+    params.append(args.limit)
+    
+    start = time.perf_counter()
+    rows = conn.execute(sql, params).fetchall()
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    conn.close()
+    
+    for row in rows:
+        if args.kind == 'todos':
+            print(f"{row[0]}:{row[1]}: {row[2]}: {row[3]}")
+        elif args.kind == 'apis':
+            print(f"{row[1]} {row[2]} ({row[0]}, {row[3]})")
+        else:
+            print(' '.join(str(value) for value in row))
+    print(f"\n🔎 {len(rows)} rows in {elapsed_ms:.1f} ms")
+    return 0
+
+# Files per task handed to a batch worker; large enough to amortize IPC
+BATCH_CHUNK_FILES = 64
+
+# Scanners reused by each batch worker process, keyed by project root
+_batch_scanners = {}
+
+def _analyze_batch_chunk(root: str, paths: List[str], file_budget: float,
+                         cache_dir: Optional[str] = None, cache_size: int = CACHE_SIZE_MB) -> List[Tuple[Any, Dict]]:
+    """Worker-process entry point: analyze a chunk of files from one project"""
+    scanner = _batch_scanners.get(root)
+    if scanner is None:
+        scanner = _batch_scanners[root] = ProjectScanner(root)
+        if cache_dir:
+            scanner.cache = ContentCache(Path(cache_dir), cache_size * 1024 * 1024)
+    scanner.file_budget = file_budget
+    
+    results = []
+    for path in paths:
+        filepath = Path(path)
+        # Stat before reading, so a file modified mid-analysis misses next time
+        key = StatCache.key_for(filepath)
+        results.append((key, scanner.analyze_cached(filepath)))
+    return results
+
+def read_batch_roots(roots_file: Path) -> List[Path]:
+    """Read project roots, one per line; relative paths are relative to the list file"""
+    roots = []
+    for line in roots_file.read_text(encoding='utf-8').splitlines():
+        line = line.split('#')[0].strip()
+        if not line:
+            continue
+        root = Path(line)
+        if not root.is_absolute():
+            root = roots_file.parent / root
+        root = root.resolve()
+        if root.is_dir():
+            roots.append(root)
+        else:
+            print(f"⚠️  Skipping missing project root: {root}")
+    return roots
+
+def run_batch(args) -> int:
+    """Scan many projects with one shared worker pool and result cache"""
+    from concurrent.futures import ProcessPoolExecutor, as_completed
+    
+    roots = read_batch_roots(Path(args.batch))
+    if not roots:
+        print(f"❌ Error: no project roots found in {args.batch}")
+        return 1
+    
+    cache = StatCache()
+    scanners = {}
+    inventories = {}
+    for root in roots:
+        scanner = scanner_from_args(root, args)
+        scanner.cache = cache
+        scanners[root] = scanner
+        inventories[root] = scanner.scan_directory()
+    
+    # Largest projects first, and largest files first within each, to balance the pool
+    order = sorted(roots, key=lambda r: inventories[r]['total_size'], reverse=True)
+    entries = []
+    
+    def finish(root: Path):
+        scanner = scanners[root]
+        project_info = scanner.scan(inventory=inventories[root])
+        scanner.save_json(project_info)
+        if not args.json_only:
+            scanner.save_markdown(project_info)
+        entries.append((root, scanner, project_info))
+    
+    workers = args.jobs or os.cpu_count() or 1
+    print(f"🧵 Analyzing {sum(len(inventories[r]['files']) for r in roots)} files from {len(roots)} projects on {workers} workers")
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        remaining = {}
+        futures = {}
+        for root in order:
+            inventory = inventories[root]
+            files = sorted(inventory['files'], key=lambda f: inventory['sizes'][f], reverse=True)
+            chunks = [files[i:i + BATCH_CHUNK_FILES] for i in range(0, len(files), BATCH_CHUNK_FILES)]
+            remaining[root] = len(chunks)
+            for chunk in chunks:
+                future = pool.submit(_analyze_batch_chunk, str(root), [str(f) for f in chunk], args.file_budget,
+                                     args.cache_dir, args.cache_size)
+                futures[future] = root
+        
+        for root in order:
+            if remaining[root] == 0:
+                finish(root)
+        
+        # Repo-wide stages run here while the pool keeps analyzing other projects
+        for future in as_completed(futures):
+            root = futures[future]
+            for key, result in future.result():
+                cache.put(key, result)
+            remaining[root] -= 1
+            if remaining[root] == 0:
+                finish(root)
+    
+    index_path = Path(args.batch_index)
+    atomic_write(index_path, json_dumps(build_batch_index(entries)))
+    print(f"\n📚 Batch index for {len(entries)} projects saved to: {index_path}")
+    return 0
+
+def build_batch_index(entries: List[Tuple[Path, 'ProjectScanner', ProjectInfo]]) -> Dict:
+    """Aggregate stack, dependency version and API counts across scanned projects"""
+    repositories = []
+    stack_counts = {}
+    dependency_versions = {}
+    api_methods = {}
+    api_total = 0
+    todo_total = 0
+    
+    for root, scanner, project_info in sorted(entries, key=lambda e: str(e[0])):
+        apis = [api for result in scanner.file_results for api in result.get('apis', [])]
+        todos = sum(len(result.get('todos', [])) for result in scanner.file_results)
+        api_total += len(apis)
+        todo_total += todos
+        for api in apis:
+            api_methods[api['method']] = api_methods.get(api['method'], 0) + 1
+        for tech in project_info.detectedStack:
+            stack_counts[tech] = stack_counts.get(tech, 0) + 1
+        for name, version in scanner.dependency_versions():
+            dependency_versions.setdefault(name, {}).setdefault(version, []).append(project_info.projectName)
+        
+        repositories.append({
+            'name': project_info.projectName,
+            'path': str(root),
+            'summaryFile': str(scanner.output_dir / SUMMARY_FORMATS[scanner.output_format]),
+            'files': scanner.coverage.get('filesTotal', 0),
+            'bytes': scanner.coverage.get('bytesTotal', 0),
+            'stack': project_info.detectedStack,
+            'apis': len(apis),
+            'todos': todos,
+        })
+    
+    return {
+        'generated_at': datetime.datetime.now().isoformat(),
+        'repositories': repositories,
+        'stackCounts': dict(sorted(stack_counts.items(), key=lambda item: (-item[1], item[0]))),
+        'dependencyVersions': {name: dict(sorted(versions.items())) for name, versions in sorted(dependency_versions.items())},
+        'apiTotals': {
+            'total': api_total,
+            'byMethod': dict(sorted(api_methods.items())),
+        },
+        'todoTotal': todo_total,
+    }
+
+def git_output(cwd: Path, args: List[str], stdin: Optional[bytes] = None) -> bytes:
+    """Run a git command in cwd and return its standard output"""
+    import subprocess
+    
+    return subprocess.run(['git'] + args, cwd=str(cwd), input=stdin, stdout=subprocess.PIPE,
+                          stderr=subprocess.PIPE, check=True).stdout
+
+def git_tree(cwd: Path, commit: str) -> List[Tuple[str, str, int]]:
+    """List (path relative to cwd, blob id, size) for every regular file of a commit under cwd"""
+    entries = []
+    for record in git_output(cwd, ['ls-tree', '-r', '-l', '-z', commit, '--', '.']).split(b'\0'):
+        if not record:
+            continue
+        meta, path = record.split(b'\t', 1)
+        mode, kind, blob, size = meta.split()
+        # Symlinks and submodules have no content of their own to analyze
+        if kind != b'blob' or mode == b'120000':
+            continue
+        entries.append((os.fsdecode(path), blob.decode('ascii'), int(size)))
+    return entries
+
+def git_blobs(cwd: Path, blobs) -> Dict[str, bytes]:
+    """Read many blobs through a single git cat-file --batch process"""
+    if not blobs:
+        return {}
+    out = git_output(cwd, ['cat-file', '--batch'], ''.join(f"{blob}\n" for blob in blobs).encode('ascii'))
+    contents = {}
+    pos = 0
+    while pos < len(out):
+        eol = out.index(b'\n', pos)
+        blob, _, size = out[pos:eol].split()
+        start = eol + 1
+        contents[blob.decode('ascii')] = out[start:start + int(size)]
+        pos = start + int(size) + 1
+    return contents
+
+def resolve_commit(cwd: Path, rev: str) -> str:
+    """Resolve a revision to its full commit id"""
+    return git_output(cwd, ['rev-parse', '--verify', f"{rev}^{{commit}}"]).decode('ascii').strip()
+
+def diff_items(base_items: List[Dict], head_items: List[Dict], fields: List[str]) -> Dict[str, List[Dict]]:
+    """Multiset difference of two item lists, comparing only the given fields"""
+    from collections import Counter
+    
+    base_counts = Counter(tuple(item[f] for f in fields) for item in base_items)
+    head_counts = Counter(tuple(item[f] for f in fields) for item in head_items)
+    return {
+        'added': [dict(zip(fields, key)) for key in sorted((head_counts - base_counts).elements())],
+        'removed': [dict(zip(fields, key)) for key in sorted((base_counts - head_counts).elements())],
+    }
+
+def diff_snapshots(base: Dict, head: Dict) -> Dict:
+    """Structured difference in APIs, TODOs, dependencies and stack between two snapshots"""
+    def apis(snapshot: Dict) -> List[Dict]:
+        return [api for entry in snapshot['files'].values() for api in entry['result'].get('apis', [])]
+    
+    def todos(snapshot: Dict) -> List[Dict]:
+        # Line numbers are left out, so code moving around a TODO does not report it as changed
+        return [dict(todo, file=path) for path, entry in snapshot['files'].items()
+                for todo in entry['result'].get('todos', [])]
+    
+    def versions(snapshot: Dict) -> Dict[str, List[str]]:
+        found = {}
+        for name, version in snapshot['dependencyVersions']:
+            found.setdefault(name, []).append(version)
+        return {name: sorted(set(v)) for name, v in found.items()}
+    
+    base_info = base['projectInfo']
+    head_info = head['projectInfo']
+    base_versions = versions(base)
+    head_versions = versions(head)
+    return {
+        'base': base['commit'],
+        'head': head['commit'],
+        'apis': diff_items(apis(base), apis(head), ['method', 'path', 'framework', 'file']),
+        'todos': diff_items(todos(base), todos(head), ['file', 'type', 'text']),
+        'dependencies': {
+            'added': sorted(set(head_info['dependencies']) - set(base_info['dependencies'])),
+            'removed': sorted(set(base_info['dependencies']) - set(head_info['dependencies'])),
+            'changed': [{'name': name, 'from': base_versions[name], 'to': head_versions[name]}
+                        for name in sorted(set(base_versions) & set(head_versions))
+                        if base_versions[name] != head_versions[name]],
+        },
+        'stack': {
+            'added': sorted(set(head_info['detectedStack']) - set(base_info['detectedStack'])),
+            'removed': sorted(set(base_info['detectedStack']) - set(head_info['detectedStack'])),
+        },
+    }
+
+def print_diff(diff: Dict):
+    """Print a project-model diff as a short readable report"""
+    print(f"\n🔀 Project changes {diff['base'][:12]}..{diff['head'][:12]}")
+    for api in diff['apis']['added']:
+        print(f"  + API {api['method']} {api['path']} ({api['file']})")
+    for api in diff['apis']['removed']:
+        print(f"  - API {api['method']} {api['path']} ({api['file']})")
+    for todo in diff['todos']['added']:
+        print(f"  + {todo['type']} {todo['text']} ({todo['file']})")
+    for todo in diff['todos']['removed']:
+        print(f"  - {todo['type']} {todo['text']} ({todo['file']})")
+    for dep in diff['dependencies']['added']:
+        print(f"  + dependency {dep}")
+    for dep in diff['dependencies']['removed']:
+        print(f"  - dependency {dep}")
+    for change in diff['dependencies']['changed']:
+        print(f"  ~ dependency {change['name']}: {', '.join(change['from'])} -> {', '.join(change['to'])}")
+    for tech in diff['stack']['added']:
+        print(f"  + stack {tech}")
+    for tech in diff['stack']['removed']:
+        print(f"  - stack {tech}")
+    if not any(diff[section][kind] for section in ['apis', 'todos', 'dependencies', 'stack'] for kind in diff[section]):
+        print("  No changes to APIs, TODOs, dependencies or stack")
+
+def snapshot_scanner(args) -> ProjectScanner:
+    """Create a scanner for the snapshot and diff subcommands"""
+    scanner = ProjectScanner(args.path)
+    if args.snapshot_dir:
+        scanner.snapshot_dir = Path(args.snapshot_dir).resolve()
+    return scanner
+
+def run_snapshot(argv: List[str]) -> int:
+    """Store the snapshot of one commit, e.g. the main branch a later diff will use as its base"""
+    import argparse
+    import subprocess
+    
+    parser = argparse.ArgumentParser(prog='introspect.py snapshot', description='Scan a commit from git objects and store its snapshot')
+    parser.add_argument('rev', nargs='?', default='HEAD', help='Commit to snapshot (default: HEAD)')
+    parser.add_argument('--path', default='.', help='Project directory inside a git work tree (default: current directory)')
+    parser.add_argument('--snapshot-dir', help='Snapshot store (default: introspect/snapshots in the git directory)')
+    args = parser.parse_args(argv)
+    
+    scanner = snapshot_scanner(args)
+    try:
+        scanner.snapshot(resolve_commit(scanner.project_path, args.rev))
+    except subprocess.CalledProcessError as e:
+        print(f"❌ Error: git {' '.join(e.cmd[1:])} failed: {e.stderr.decode(errors='replace').strip()}")
+        return 1
+    return 0
+
+def run_diff(argv: List[str]) -> int:
+    """Report what changed in the project model between two commits"""
+    import argparse
+    import subprocess
+    
+    parser = argparse.ArgumentParser(prog='introspect.py diff', description='Diff APIs, TODOs, dependencies and stack between two commits')
+    parser.add_argument('base', help='Base commit, e.g. the merge target')
+    parser.add_argument('head', nargs='?', default='HEAD', help='Head commit (default: HEAD)')
+    parser.add_argument('--path', default='.', help='Project directory inside a git work tree (default: current directory)')
+    parser.add_argument('--snapshot-dir', help='Snapshot store (default: introspect/snapshots in the git directory)')
+    parser.add_argument('--output', '-o', help='Also write the structured diff to this JSON file')
+    args = parser.parse_args(argv)
+    
+    try:
+        base_commit = resolve_commit(Path(args.path), args.base)
+        head_commit = resolve_commit(Path(args.path), args.head)
+        base = snapshot_scanner(args).snapshot(base_commit)
+        # A fresh scanner per commit, so no manifest text carries over between them
+        head = snapshot_scanner(args).snapshot(head_commit, base)
+    except subprocess.CalledProcessError as e:
+        print(f"❌ Error: git {' '.join(e.cmd[1:])} failed: {e.stderr.decode(errors='replace').strip()}")
+        return 1
+    
+    diff = diff_snapshots(base, head)
+    print_diff(diff)
+    if args.output:
+        atomic_write(Path(args.output), json_dumps(diff))
+        print(f"\n✅ Diff saved to: {args.output}")
+    return 0
+
+def run_bench(argv: List[str]) -> int:
+    """Run one of the benchmarks in bench_introspect.py, which ships next to this script"""
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    import bench_introspect
+    return bench_introspect.main(argv)
+
+def run_merge(argv: List[str]) -> int:
+    """Merge the partial results of a sharded scan into one project summary"""
+    import argparse
+    
+    parser = argparse.ArgumentParser(prog='introspect.py merge', description='Merge --shard partial results into one project summary')
+    parser.add_argument('partials', nargs='+', help='Partial result files, one per shard')
+    parser.add_argument('--path', help='Project directory to write the summary to (default: the path recorded in the partials)')
+    parser.add_argument('--json-only', action='store_true', help='Generate JSON only (no markdown)')
+    parser.add_argument('--format', choices=list(SUMMARY_FORMATS), default='json', help='Summary output format (default: json)')
+    args = parser.parse_args(argv)
+    
+    partials = [json.loads(Path(path).read_bytes()) for path in args.partials]
+    scanner = ProjectScanner(args.path or partials[0]['projectPath'])
+    scanner.output_format = args.format
+    try:
+        project_info = scanner.merge_shards(partials)
+    except ValueError as e:
+        print(f"❌ Error: {e}")
+        return 1
+    
+    scanner.save_json(project_info)
+    if not args.json_only:
+        scanner.save_markdown(project_info)
+    return 0
+
+def run_route(argv: List[str]) -> int:
+    """Look up which handler serves a URL, using the route table of a saved summary"""
+    import argparse
+    
+    parser = argparse.ArgumentParser(prog='introspect.py route', description='Find the file and line that handle a URL')
+    parser.add_argument('url', help='URL path, e.g. /api/products/42')
+    parser.add_argument('--method', '-X', default='GET', help='HTTP method (default: GET)')
+    parser.add_argument('--path', default='.', help='Project directory holding the summary (default: current directory)')
+    args = parser.parse_args(argv)
+    
+    summaries = [Path(args.path) / name for name in SUMMARY_FORMATS.values() if (Path(args.path) / name).exists()]
+    if not summaries:
+        print(f"❌ Error: no project summary in {Path(args.path).resolve()}; run a scan first")
+        return 1
+    
+    try:
+        routes = read_summary_section(summaries[0], 'routeTable')
+    except KeyError:
+        print(f"❌ Error: {summaries[0]} predates route tables; run a scan first")
+        return 1
+    
+    trie = RouteTrie()
+    for route in routes:
+        trie.insert(route)
+    found = trie.lookup(args.method.upper(), args.url)
+    if found is None:
+        print(f"❌ No route serves {args.method.upper()} {args.url}")
+        return 1
+    
+    route, params = found
+    print(f"{route['method']} {route['path']} → {route['file']}:{route['line']}")
+    for name, value in params.items():
+        print(f"  {name} = {value}")
+    return 0
+
+def daemon_socket_path() -> Path:
+    """Per-user socket of the warm daemon; INTROSPECT_SOCKET overrides it (mirrored in introspect_client.py)"""
+    if os.environ.get('INTROSPECT_SOCKET'):
+        return Path(os.environ['INTROSPECT_SOCKET'])
+    base = os.environ.get('XDG_RUNTIME_DIR') or os.environ.get('TMPDIR') or '/tmp'
+    return Path(base) / f"introspect-{os.getuid()}" / 'daemon.sock'
+
+def daemon_frame(kind: bytes, value: int) -> bytes:
+    """Frame header sent to the client: one kind byte and a signed 32-bit length or exit code"""
+    return kind + value.to_bytes(4, 'big', signed=True)
+
+class DaemonStream:
+    """stdout or stderr of one forwarded command, sent to the client as framed chunks"""
+    encoding = 'utf-8'
+    
+    def __init__(self, conn, kind: bytes):
+        import threading
+        self.conn = conn
+        self.kind = kind
+        self.lock = threading.Lock()
+    
+    def write(self, text: str) -> int:
+        data = text.encode('utf-8', 'surrogateescape')
+        with self.lock:
+            if data and self.conn is not None:
+                try:
+                    self.conn.sendall(daemon_frame(self.kind, len(data)) + data)
+                except OSError:
+                    # The client went away; finish the command so outputs and caches stay consistent
+                    self.conn = None
+        return len(text)
+    
+    def flush(self):
+        pass
+    
+    def isatty(self) -> bool:
+        return False
+
+class Daemon:
+    """Warm process running commands forwarded by introspect_client.py, one at a time"""
+    
+    def __init__(self, socket_path: Path):
+        self.socket_path = socket_path
+        self.caches = {}  # project path -> StatCache, least recently used first
+        self.source_mtime = os.stat(__file__).st_mtime_ns
+    
+    def cache_for(self, project_path: Path) -> StatCache:
+        """In-memory per-file results kept for a project from one request to the next"""
+        cache = self.caches.pop(project_path, None) or StatCache()
+        self.caches[project_path] = cache
+        while len(self.caches) > DAEMON_MAX_PROJECTS:
+            del self.caches[next(iter(self.caches))]
+        return cache
+    
+    def serve(self, idle_timeout: float) -> int:
+        """Accept commands until stopped, idle for idle_timeout seconds, or introspect.py changes"""
+        import socket
+        
+        parent = self.socket_path.parent
+        parent.mkdir(mode=0o700, parents=True, exist_ok=True)
+        st = parent.stat()
+        if st.st_uid != os.getuid() or st.st_mode & 0o077:
+            print(f"❌ Error: {parent} must be accessible to the current user only")
+            return 1
+        
+        if self.socket_path.exists():
+            # A live daemon still answers; a socket left behind by a crashed one does not
+            probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                probe.connect(str(self.socket_path))
+                print(f"❌ Error: a daemon is already listening on {self.socket_path}")
+                return 1
+            except OSError:
+                self.socket_path.unlink()
+            finally:
+                probe.close()
+        
+        server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        server.bind(str(self.socket_path))
+        server.listen(16)
+        server.settimeout(idle_timeout)
+        print(f"🛰️  Daemon listening on {self.socket_path} (pid {os.getpid()})")
+        try:
+            while True:
+                try:
+                    conn, _ = server.accept()
+                except socket.timeout:
+                    print(f"💤 Idle for {idle_timeout:g}s; stopping daemon")
+                    break
+                with conn:
+                    if not self.handle(conn):
+                        break
+        except KeyboardInterrupt:
+            print("\n👋 Stopping daemon")
+        finally:
+            server.close()
+            self.socket_path.unlink(missing_ok=True)
+        return 0
+    
+    def handle(self, conn) -> bool:
+        """Run one forwarded command; False once the daemon should stop"""
+        import socket
+        
+        conn.settimeout(DAEMON_REQUEST_TIMEOUT)
+        chunks = []
+        try:
+            while True:
+                chunk = conn.recv(65536)
+                if not chunk:
+                    break
+                chunks.append(chunk)
+        except (socket.timeout, OSError):
+            return True
+        conn.settimeout(None)
+        
+        verb, *fields = b''.join(chunks).split(b'\0')
+        if verb == b'stop':
+            conn.sendall(daemon_frame(b'x', 0))
+            print("🛑 Stop requested")
+            return False
+        if verb != b'run' or not fields:
+            return True
+        if os.stat(__file__).st_mtime_ns != self.source_mtime:
+            # introspect.py was edited after the daemon started; let the client run the new code
+            conn.sendall(daemon_frame(b'l', 0))
+            print("♻️  introspect.py changed; stopping daemon")
+            return False
+        
+        cwd, argv = os.fsdecode(fields[0]), [os.fsdecode(field) for field in fields[1:]]
+        started = time.perf_counter()
+        kind, code = self.run(conn, cwd, argv)
+        try:
+            conn.sendall(daemon_frame(kind, code))
+        except OSError:
+            pass
+        outcome = 'ran locally' if kind == b'l' else f"exit {code}"
+        print(f"{datetime.datetime.now().strftime('%H:%M:%S')} {' '.join(argv) or '.'}: {outcome} "
+              f"in {(time.perf_counter() - started) * 1000:.0f} ms")
+        return True
+    
+    def run(self, conn, cwd: str, argv: List[str]) -> Tuple[bytes, int]:
+        """Run main() for the client with its working directory and output streams"""
+        import contextlib
+        import traceback
+        
+        out, err = DaemonStream(conn, b'o'), DaemonStream(conn, b'e')
+        previous = os.getcwd()
+        try:
+            os.chdir(cwd)
+        except OSError as e:
+            err.write(f"❌ Error: cannot run in {cwd}: {e}\n")
+            return b'x', 1
+        
+        kind, code = b'x', 0
+        try:
+            with contextlib.redirect_stdout(out), contextlib.redirect_stderr(err):
+                try:
+                    main(argv, daemon=self)
+                except SystemExit as e:
+                    if isinstance(e.code, str):
+                        print(e.code, file=sys.stderr)
+                        code = 1
+                    else:
+                        code = e.code or 0
+                except RunLocally:
+                    kind = b'l'
+                except Exception:
+                    traceback.print_exc()
+                    code = 1
+        finally:
+            os.chdir(previous)
+        return kind, code
+
+def run_daemon(argv: List[str]) -> int:
+    """Keep a warm process that runs the commands introspect_client.py forwards"""
+    import argparse
+    import socket
+    
+    parser = argparse.ArgumentParser(prog='introspect.py daemon', description='Serve commands forwarded by introspect_client.py from a warm process')
+    parser.add_argument('--socket', help='Unix socket to listen on (default: $XDG_RUNTIME_DIR/introspect-UID/daemon.sock, or under $TMPDIR)')
+    parser.add_argument('--idle-timeout', type=float, default=DAEMON_IDLE_SECONDS, help=f'Exit after this many seconds without a command (default: {DAEMON_IDLE_SECONDS})')
+    parser.add_argument('--stop', action='store_true', help='Stop the daemon listening on the socket')
+    args = parser.parse_args(argv)
+    
+    if not hasattr(socket, 'AF_UNIX'):
+        print("❌ Error: the daemon needs Unix domain sockets, which this platform does not have")
+        return 1
+    path = Path(args.socket) if args.socket else daemon_socket_path()
+    
+    if args.stop:
+        conn = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            conn.connect(str(path))
+            conn.sendall(b'stop')
+            conn.shutdown(socket.SHUT_WR)
+            conn.recv(5)
+        except OSError:
+            print(f"❌ No daemon is listening on {path}")
+            return 1
+        finally:
+            conn.close()
+        print(f"🛑 Daemon on {path} stopped")
+        return 0
+    
+    return Daemon(path).serve(args.idle_timeout)
+
+# Subcommands recognized before the default path argument
+COMMANDS = {
+    'bench': run_bench,
+    'merge': run_merge,
+    'snapshot': run_snapshot,
+    'diff': run_diff,
+    'query': run_query,
+    'route': run_route,
+    'daemon': run_daemon,
+}
+
+# Subcommands a daemon hands back to the client: they run for long or manage processes themselves
+LOCAL_COMMANDS = {'bench', 'daemon'}
+
+def parse_shard(spec: str) -> Tuple[int, int]:
+    """Parse an I/N shard specification, with 1 <= I <= N"""
+    import argparse
+    
+    try:
+        index, count = (int(part) for part in spec.split('/'))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected I/N, got '{spec}'")
+    if not 1 <= index <= count:
+        raise argparse.ArgumentTypeError(f"shard index must be between 1 and {count}")
+    return index, count
+
+def scanner_from_args(project_path: Path, args) -> ProjectScanner:
+    """Create a scanner configured from parsed command-line options"""
+    scanner = ProjectScanner(project_path, deadline=args.deadline, sample_rate=args.sample, output_dir=args.output_dir)
+    scanner.file_budget = args.file_budget
+    scanner.walk_workers = args.walk_workers
+    scanner.follow_symlinks = args.follow_symlinks
+    scanner.emit_patches = args.patch
+    scanner.output_format = args.format
+    if args.cache_dir:
+        scanner.cache = ContentCache(Path(args.cache_dir), args.cache_size * 1024 * 1024)
+    if args.index:
+        scanner.index_path = Path(args.index).resolve()
+    if args.metrics_file:
+        scanner.metrics_file = Path(args.metrics_file).resolve()
+    scanner.scan_log = args.scan_log
+    return scanner
+
+def main(argv: Optional[List[str]] = None, daemon: Optional[Daemon] = None):
+    """Main entry point; a daemon passes the forwarded command line and itself"""
+    import argparse
+    
+    argv = sys.argv[1:] if argv is None else argv
+    if argv and argv[0] in COMMANDS:
+        if daemon is not None and argv[0] in LOCAL_COMMANDS:
+            raise RunLocally(argv[0])
+        sys.exit(COMMANDS[argv[0]](argv[1:]))
     
     parser = argparse.ArgumentParser(description='Project Auto-Introspector')
     parser.add_argument('path', nargs='?', default='.', help='Path to project directory (default: current directory)')
     parser.add_argument('--watch', '-w', action='store_true', help='Watch for changes and auto-update')
-    parser.add_argument('--interval', '-i', type=int, default=5, help='Watch interval in seconds (default: 5)')
+    parser.add_argument('--interval', '-i', type=float, default=5, help='Watch interval in seconds (default: 5)')
+    parser.add_argument('--min-rescan-interval', type=float, default=WATCH_MIN_RESCAN_SECONDS,
+                        help=f'With --watch, start at most one rescan per this many seconds (default: {WATCH_MIN_RESCAN_SECONDS})')
     parser.add_argument('--json-only', action='store_true', help='Generate JSON only (no markdown)')
+    parser.add_argument('--format', choices=list(SUMMARY_FORMATS), default='json', help='Summary output format (default: json)')
+    parser.add_argument('--output-dir', help='Directory for the summary, guide and patch files (default: the project directory)')
+    parser.add_argument('--batch', metavar='ROOTS_FILE', help='Scan every project listed in ROOTS_FILE with one shared worker pool')
+    parser.add_argument('--batch-index', default='batch_index.json', help='Aggregated cross-project index for --batch (default: batch_index.json)')
+    parser.add_argument('--jobs', '-j', type=int, help='Worker processes for --batch (default: CPU count)')
+    parser.add_argument('--shard', type=parse_shard, metavar='I/N', help='Analyze only shard I of N and write a partial result for "merge"')
+    parser.add_argument('--partial-dir', help='Directory for the --shard partial result (default: the project directory)')
+    parser.add_argument('--cache-dir', help='Share per-file results through a content-addressed cache in this directory')
+    parser.add_argument('--cache-size', type=int, default=CACHE_SIZE_MB, help=f'Size cap for --cache-dir in MB; least recently used entries are evicted (default: {CACHE_SIZE_MB})')
+    parser.add_argument('--index', metavar='DB', help='Also write the scan to a queryable SQLite index, updated incrementally (see "query")')
+    parser.add_argument('--patch', action='store_true', help='Append JSON Patch deltas between scans to project_summary.patch.jsonl')
+    parser.add_argument('--metrics-port', type=int, metavar='PORT', help='With --watch, serve Prometheus metrics on http://127.0.0.1:PORT/metrics')
+    parser.add_argument('--metrics-file', metavar='PATH', help='Write Prometheus metrics to PATH after every scan (node_exporter textfile format)')
+    parser.add_argument('--scan-log', metavar='PATH', help='Append one JSON log line per scan to PATH ("-" for stderr)')
     parser.add_argument('--verbose', '-v', action='store_true', help='Show detailed progress')
+    parser.add_argument('--deadline', type=float, help='Time budget in seconds; analyze highest-priority files first and write a partial summary')
+    parser.add_argument('--sample', type=float, metavar='RATE', help='Analyze a stratified sample (0-1) of files and estimate TODO/API totals')
+    parser.add_argument('--walk-workers', type=int, default=WALK_WORKERS, help=f'Threads used to list directories (default: {WALK_WORKERS})')
+    parser.add_argument('--follow-symlinks', action='store_true', help='Descend into symlinked directories (cycles are detected)')
+    parser.add_argument('--file-budget', type=float, default=FILE_BUDGET_SECONDS, help=f'Per-file analysis budget in seconds (default: {FILE_BUDGET_SECONDS})')
+    
+    args = parser.parse_args(argv)
     
-    args = parser.parse_args()
+    if daemon is not None and (args.watch or args.batch):
+        raise RunLocally('--watch' if args.watch else '--batch')
+    
+    if args.sample is not None and not 0 < args.sample <= 1:
+        print("❌ Error: --sample must be between 0 and 1")
+        sys.exit(1)
+    
+    if args.metrics_port is not None and not args.watch:
+        print("❌ Error: --metrics-port needs --watch; use --metrics-file for one-off scans")
+        sys.exit(1)
+    
+    if args.batch:
+        if args.index:
+            print("❌ Error: --index writes one project; it cannot be combined with --batch")
+            sys.exit(1)
+        if args.metrics_file or args.scan_log:
+            print("❌ Error: --metrics-file and --scan-log report one project; they cannot be combined with --batch")
+            sys.exit(1)
+        if args.output_dir:
+            print("❌ Error: --output-dir names one project's output directory; it cannot be combined with --batch")
+            sys.exit(1)
+        sys.exit(run_batch(args))
     
     # Validate path
     project_path = Path(args.path).resolve()
@@ -1036,21 +4592,45 @@ def main():
         sys.exit(1)
     
     # Create scanner
-    scanner = ProjectScanner(project_path)
+    scanner = scanner_from_args(project_path, args)
+    if daemon is not None and scanner.cache is None:
+        scanner.cache = daemon.cache_for(project_path)
+    
+    if args.shard:
+        if args.watch or args.deadline is not None or args.sample is not None:
+            print("❌ Error: --shard cannot be combined with --watch, --deadline or --sample")
+            sys.exit(1)
+        index, count = args.shard
+        partial_path = Path(args.partial_dir or project_path) / SHARD_FILE.format(index=index, count=count)
+        partial_path.parent.mkdir(parents=True, exist_ok=True)
+        atomic_write(partial_path, json_dumps(scanner.scan_shard(index, count)))
+        print(f"🧩 Shard {index}/{count} saved to: {partial_path}")
+        return
     
     if args.watch:
         # Run in watch mode
-        scanner.watch(interval=args.interval)
+        if args.metrics_port is not None:
+            server = serve_metrics(scanner.stats, args.metrics_port)
+            print(f"📈 Metrics at http://127.0.0.1:{server.server_address[1]}/metrics")
+        scanner.watch(interval=args.interval, min_rescan_interval=args.min_rescan_interval)
     else:
         # Run once
         project_info = scanner.scan()
+        if isinstance(scanner.cache, ContentCache):
+            print(f"💾 Result cache: {scanner.cache.hits} hits, {scanner.cache.misses} misses")
+        if isinstance(scanner.cache, StatCache):
+            # Kept by the daemon for the next command; drop superseded file versions
+            scanner.cache.prune()
         json_path = scanner.save_json(project_info)
+        if scanner.index_path:
+            scanner.save_index(project_info)
         
         if not args.json_only:
             md_path = scanner.save_markdown(project_info)
-            print(f"\n📊 Analysis complete!")
+            print("\n📊 Analysis complete!")
             print(f"📄 JSON: {json_path}")
             print(f"📘 Markdown: {md_path}")
+        scanner.report_scan('once')
 
 if __name__ == '__main__':
     main()
\ No newline at end of file
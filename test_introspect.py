@@ -0,0 +1,640 @@
+"""Tests for introspect.py; run with `python -m pytest test_introspect.py`"""
+
+import dataclasses
+import json
+import os
+import shutil
+import stat
+import subprocess
+import threading
+import time
+
+import pytest
+
+import introspect
+from introspect import CancelToken, ContentCache, ProjectInfo, ProjectScanner, RouteTrie, ScanCancelled, StatCache, MAX_MATCHES_PER_FILE, SUMMARY_FORMATS
+from bench_introspect import PATHOLOGICAL_CORPUS
+
+PROJECT_FILES = {
+    'package.json': json.dumps({'name': 'demo', 'scripts': {'start': 'node server/app.js'},
+                                'dependencies': {'express': '^4.18.0', 'mongoose': '^7.0.0'}}),
+    'README.md': '# Demo\n\nA small demo project that serves a couple of routes for the introspector tests.\n',
+    'server/app.js': ("const express = require('express');\n"
+                      "const users = require('./routes/users');\n"
+                      "const app = express();\n"
+                      "app." "use('/api/users', users);\n"
+                      "app." "get('/health', (req, res) => res.send('ok'));\n"
+                      "module.exports = app;\n"),
+    'server/routes/users.js': ("const express = require('express');\n"
+                               "const router = express.Router();\n"
+                               "// " "TODO: paginate the user list\n"
+                               "router." "get('/', list);\n"
+                               "router." "post('/:id', update);\n"
+                               "module.exports = router;\n"),
+    'server/db.js': "const mongoose = require('mongoose');\n/* " "FIXME: read the URL from env */\n",
+    'web/index.ts': "import { api } from './api';\nexport const main = () => api('/api/users');\n",
+    'web/api.ts': "export function api(path: string) {\n  return fetch(path);\n}\n",
+    'docs/notes.md': "# Notes\n\nNothing to see.\n",
+}
+
+def make_project(root, files=PROJECT_FILES):
+    for rel_path, text in files.items():
+        target = root / rel_path
+        target.parent.mkdir(parents=True, exist_ok=True)
+        target.write_text(text)
+    return root
+
+def scan(root, cache=None):
+    scanner = ProjectScanner(root, sinks=[], cache=cache)
+    return scanner, scanner.scan()
+
+def test_project_info_is_a_dataclass():
+    info = ProjectInfo(projectName='demo', detectedStack=['Express'])
+    assert dataclasses.asdict(info) == info.to_dict()
+    assert [f.name for f in dataclasses.fields(info)] == list(info.to_dict())
+    assert dataclasses.replace(info, projectName='other').projectName == 'other'
+    assert info == ProjectInfo(projectName='demo', detectedStack=['Express'])
+    assert info != ProjectInfo(projectName='other')
+    assert info.__eq__(info.to_dict()) is NotImplemented
+    assert repr(info).startswith("ProjectInfo(projectName='demo', projectSummary='', detectedStack=['Express'],")
+    assert repr(info).endswith(", workspaces=[])")
+    with pytest.raises(TypeError):
+        hash(info)
+
+@pytest.mark.parametrize('name', sorted(PATHOLOGICAL_CORPUS))
+def test_pathological_inputs_scale_linearly(tmp_path, name):
+    scanner = ProjectScanner(tmp_path, sinks=[])
+    scanner.file_budget = 60.0
+    build = PATHOLOGICAL_CORPUS[name]
+    
+    def best_of_three(text):
+        best = float('inf')
+        for _ in range(3):
+            start = time.perf_counter()
+            if '```' in text:
+                scanner.find_code_blocks(text)
+            else:
+                scanner.analyze_text(text, 'input.js')
+            best = min(best, time.perf_counter() - start)
+        return best
+    
+    small = best_of_three(build(1000))
+    large = best_of_three(build(4000))
+    # 4x the input: linear is ~4x, quadratic 16x; leave room for timer noise on tiny inputs
+    assert large <= max(small, 0.001) * 8
+
+def test_step_budget_skips_and_records_flooded_file(tmp_path):
+    flood = tmp_path / 'flood.js'
+    flood.write_text(PATHOLOGICAL_CORPUS['many_todos'](MAX_MATCHES_PER_FILE + 1))
+    normal = tmp_path / 'normal.js'
+    normal.write_text(PATHOLOGICAL_CORPUS['many_todos'](3))
+    scanner = ProjectScanner(tmp_path, sinks=[])
+    
+    files = [flood, normal]
+    _, results = scanner.analyze_files(files, {f: f.stat().st_size for f in files}, [])
+    
+    assert results[0]['skipped'] and 'matches' in results[0]['error']
+    assert len(results[1]['todos']) == 3
+    assert scanner.skipped_files == [{'path': 'flood.js', 'reason': results[0]['error']}]
+
+@pytest.mark.parametrize('fmt', sorted(SUMMARY_FORMATS))
+def test_summary_formats_round_trip(tmp_path, fmt):
+    make_project(tmp_path)
+    scanner, info = scan(tmp_path)
+    scanner.output_format = fmt
+    path = scanner.save_json(info)
+    
+    data = introspect.read_summary(path)
+    expected = info.to_dict()
+    assert {key: data[key] for key in expected} == expected
+    assert introspect.read_summary_section(path, 'APIsDetected') == expected['APIsDetected']
+    assert introspect.decode_summary(introspect.encode_summary(data, fmt), fmt) == data
+
+def test_shard_merge_matches_single_scan(tmp_path):
+    make_project(tmp_path)
+    single, single_info = scan(tmp_path)
+    
+    # Partials travel between nodes as JSON
+    count = 3
+    partials = [json.loads(json.dumps(ProjectScanner(tmp_path, sinks=[]).scan_shard(i, count)))
+                for i in range(1, count + 1)]
+    assert sum(len(p['files']) for p in partials) == len(PROJECT_FILES)
+    merged = ProjectScanner(tmp_path, sinks=[])
+    merged_info = merged.merge_shards(partials)
+    
+    assert merged_info == single_info
+    assert merged.coverage == single.coverage
+    with pytest.raises(ValueError):
+        ProjectScanner(tmp_path, sinks=[]).merge_shards(partials[:2])
+
+def test_content_cache_hits_across_checkouts(tmp_path):
+    checkout_a = make_project(tmp_path / 'a' / 'demo')
+    checkout_b = tmp_path / 'b' / 'demo'
+    shutil.copytree(checkout_a, checkout_b)
+    _, reference = scan(checkout_a)
+    
+    cold = ContentCache(tmp_path / 'cache')
+    _, cold_info = scan(checkout_a, cold)
+    assert (cold.hits, cold.misses) == (0, len(PROJECT_FILES))
+    
+    # A fresh checkout has new mtimes but the same content
+    warm = ContentCache(tmp_path / 'cache')
+    _, warm_info = scan(checkout_b, warm)
+    assert (warm.hits, warm.misses) == (len(PROJECT_FILES), 0)
+    assert cold_info == reference == warm_info
+
+def test_stat_cache_misses_only_changed_files(tmp_path):
+    make_project(tmp_path)
+    cache = StatCache()
+    scan(tmp_path, cache)
+    assert (cache.hits, cache.misses) == (0, len(PROJECT_FILES))
+    
+    scan(tmp_path, cache)
+    assert (cache.hits, cache.misses) == (len(PROJECT_FILES), len(PROJECT_FILES))
+    
+    (tmp_path / 'web' / 'api.ts').write_text("export const api = (path: string) => fetch(path); // " "TODO: retry\n")
+    _, info = scan(tmp_path, cache)
+    assert (cache.hits, cache.misses) == (2 * len(PROJECT_FILES) - 1, len(PROJECT_FILES) + 1)
+    assert any(todo['text'] == 'retry' for todo in info.unfinishedFeaturesOrTODOs)
+
+def test_content_cache_keeps_metrics_of_each_language(tmp_path):
+    # Same bytes, different languages: a comment line in Python, a heading in Markdown
+    project = tmp_path / 'project'
+    project.mkdir()
+    (project / 'a.py').write_text('# heading\n')
+    (project / 'b.md').write_text('# heading\n')
+    _, reference = scan(project)
+    
+    cache = ContentCache(tmp_path / 'cache')
+    _, cached = scan(project, cache)
+    assert cache.misses == 2
+    assert cached == reference
+    assert reference.metrics['commentLines'] == 1
+
+def test_metrics_file_is_world_readable(tmp_path):
+    # node_exporter usually runs as another user than the scan that writes the textfile
+    make_project(tmp_path / 'project')
+    metrics_file = tmp_path / 'introspect.prom'
+    umask = os.umask(0o022)
+    try:
+        introspect.main([str(tmp_path / 'project'), '--json-only', '--metrics-file', str(metrics_file)])
+    finally:
+        os.umask(umask)
+    assert 'introspect_' in metrics_file.read_text()
+    assert stat.S_IMODE(metrics_file.stat().st_mode) == 0o644
+
+def test_snapshots_are_stored_outside_the_work_tree(tmp_path):
+    make_project(tmp_path)
+    git = ['git', '-c', 'user.name=test', '-c', 'user.email=test@example.com']
+    subprocess.run(git + ['init', '-q'], cwd=tmp_path, check=True)
+    subprocess.run(git + ['add', '.'], cwd=tmp_path, check=True)
+    subprocess.run(git + ['commit', '-q', '-m', 'initial'], cwd=tmp_path, check=True)
+    
+    assert introspect.run_snapshot(['--path', str(tmp_path)]) == 0
+    assert introspect.run_snapshot(['--path', str(tmp_path / 'server')]) == 0
+    status = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=all'], cwd=tmp_path,
+                            capture_output=True, text=True, check=True).stdout
+    assert status == ''
+    store = tmp_path / '.git' / 'introspect' / 'snapshots'
+    assert len(list(store.glob('*.json'))) == len(list((store / 'server').glob('*.json'))) == 1
+
+def test_index_query_finds_routes_under_their_mounted_path(tmp_path, capsys):
+    project = make_project(tmp_path / 'project')
+    index = tmp_path / 'index.db'
+    # The second run rebuilds the route table over an existing index
+    for _ in range(2):
+        introspect.main([str(project), '--json-only', '--output-dir', str(tmp_path / 'out'), '--index', str(index)])
+    capsys.readouterr()
+    
+    assert introspect.run_query([str(index), 'apis', '--method', 'POST', '--prefix', '/api/users']) == 0
+    rows = capsys.readouterr().out.splitlines()
+    assert rows[0] == 'POST /api/users/:id (server/routes/users.js, Express.js)'
+    assert rows[2].startswith('🔎 1 rows')
+
+# Route registrations are split so scanning this repository does not report them
+ROUTED_FILES = {
+    'app.js': ("const express = require('express');\n"
+               "const items = require('./routes/items');\n"
+               "const app = express();\n"
+               "app." "use(express.json());\n"
+               "app." "use(items);\n"
+               "app." "use(require('./routes/admin'));\n"
+               "app." "use('/api', require('./routes/api'));\n"
+               "module.exports = app;\n"),
+    'routes/items.js': ("const express = require('express');\n"
+                        "const router = express.Router();\n"
+                        "router." "get('/items/:id', show);\n"
+                        "module.exports = router;\n"),
+    'routes/admin.js': ("const router = require('express').Router();\n"
+                        "router." "post('/admin/users', create);\n"
+                        "router." "get('/items/new', form);\n"
+                        "module.exports = router;\n"),
+    'routes/api.js': ("const express = require('express');\n"
+                      "const router = express.Router();\n"
+                      "router." "get('/orders', list);\n"
+                      "router." "get('/orders', listAgain);\n"
+                      "module.exports = router;\n"),
+}
+
+def route(method, path, line, file='routes.js'):
+    return {'method': method, 'path': path, 'file': file, 'line': line}
+
+def test_route_trie_dispatches_to_the_earliest_registered_match():
+    trie = RouteTrie()
+    assert trie.insert(route('GET', '/a/:x/c', 1)) == []
+    issues = trie.insert(route('GET', '/a/b/:y', 2))
+    # Express tries routes in registration order, so /a/b/c goes to the first one
+    assert trie.lookup('GET', '/a/b/c') == (route('GET', '/a/:x/c', 1), {'x': 'b'})
+    assert trie.lookup('GET', '/a/b/d') == (route('GET', '/a/b/:y', 2), {'y': 'd'})
+    assert [(issue['kind'], issue['by']['line']) for issue in issues] == [('overlap', 1)]
+
+def test_route_trie_reports_shadowed_and_conflicting_routes():
+    trie = RouteTrie()
+    trie.insert(route('GET', '/users/:id', 1))
+    assert [issue['kind'] for issue in trie.insert(route('GET', '/users/me', 2))] == ['shadowed']
+    assert [issue['kind'] for issue in trie.insert(route('GET', '/users/:name', 3))] == ['conflict']
+    trie.insert(route('ALL', '/files/*', 4))
+    assert [issue['kind'] for issue in trie.insert(route('POST', '/files/upload', 5))] == ['shadowed']
+    assert trie.insert(route('POST', '/users/:id', 6)) == []
+    
+    assert trie.lookup('GET', '/users/me')[0]['line'] == 1
+    assert trie.lookup('POST', '/files/a/b.txt') == (route('ALL', '/files/*', 4), {'*': 'a/b.txt'})
+    assert trie.lookup('DELETE', '/users/1') is None
+
+def test_resolve_routes_follows_mounts_with_and_without_a_path(tmp_path):
+    make_project(tmp_path, ROUTED_FILES)
+    _, info = scan(tmp_path)
+    
+    assert [(r['method'], r['path'], r['file']) for r in info.routeTable] == [
+        ('GET', '/items/:id', 'routes/items.js'),
+        ('POST', '/admin/users', 'routes/admin.js'),
+        ('GET', '/items/new', 'routes/admin.js'),
+        ('GET', '/api/orders', 'routes/api.js'),
+        ('GET', '/api/orders', 'routes/api.js'),
+    ]
+    assert [(i['kind'], i['path'], i['line'], i['by']['line']) for i in info.routeIssues] == [
+        ('shadowed', '/items/new', 3, 3),
+        ('conflict', '/api/orders', 4, 3),
+    ]
+
+def test_route_command_names_the_handler_express_would_run(tmp_path, capsys):
+    make_project(tmp_path, ROUTED_FILES)
+    introspect.main([str(tmp_path), '--json-only'])
+    capsys.readouterr()
+    
+    assert introspect.run_route(['/items/new', '--path', str(tmp_path)]) == 0
+    assert capsys.readouterr().out.splitlines() == ['GET /items/:id → routes/items.js:3', '  id = new']
+    assert introspect.run_route(['/admin/users', '-X', 'post', '--path', str(tmp_path)]) == 0
+    assert capsys.readouterr().out.splitlines() == ['POST /admin/users → routes/admin.js:2']
+    assert introspect.run_route(['/missing', '--path', str(tmp_path)]) == 1
+
+def test_deadline_still_analyzes_manifests_and_key_files(tmp_path):
+    make_project(tmp_path)
+    # An already spent deadline: the walk and repo-wide stages used it all up
+    scanner = ProjectScanner(tmp_path, sinks=[], deadline=0.0)
+    info = scanner.scan()
+    
+    key_set = set(info.keyFiles)
+    essential = sorted(str(f.relative_to(tmp_path)) for f in tmp_path.rglob('*')
+                       if f.is_file() and scanner.priority_tier(f, key_set) == 0)
+    assert 'package.json' in essential and len(essential) < len(PROJECT_FILES)
+    assert sorted(r['path'] for r in scanner.file_results) == essential
+    assert scanner.coverage['partial'] and scanner.coverage['filesAnalyzed'] == len(essential)
+    assert scanner.coverage['skippedStages'] == ['discover_workspaces', 'compute_metrics', 'resolve_routes']
+    # Stages that read only manifests still run
+    assert 'express (package.json) (prod)' in info.dependencies
+    assert 'Express.js' in info.detectedStack
+    assert 'skipped discover_workspaces, compute_metrics, resolve_routes.' in info.importantNotesForNextDeveloper
+
+def test_generous_deadline_scans_everything(tmp_path):
+    make_project(tmp_path)
+    _, reference = scan(tmp_path)
+    scanner = ProjectScanner(tmp_path, sinks=[], deadline=60.0)
+    assert scanner.scan() == reference
+    assert not scanner.coverage['partial'] and 'skippedStages' not in scanner.coverage
+
+def test_sample_is_stratified_deterministic_and_extrapolated(tmp_path):
+    for top in ('api', 'web'):
+        for i in range(20):
+            target = tmp_path / top / f"module{i}.js"
+            target.parent.mkdir(parents=True, exist_ok=True)
+            target.write_text(f"// " f"TODO: item {i}\nexport const value{i} = {i};\n")
+    
+    runs = []
+    for _ in range(2):
+        scanner = ProjectScanner(tmp_path, sinks=[], sample_rate=0.25)
+        scanner.scan()
+        runs.append((scanner.coverage, sorted(r['path'] for r in scanner.file_results)))
+    coverage, analyzed = runs[0]
+    assert runs[1] == runs[0]
+    # A quarter of each top-level directory, and every stratum sampled
+    assert sum(path.startswith('api/') for path in analyzed) == sum(path.startswith('web/') for path in analyzed) == 5
+    assert coverage['filesAnalyzed'] == 10 and coverage['partial']
+    assert (coverage['strata'], coverage['strataSampled']) == (2, 2)
+    assert coverage['estimatedTodos'] == 40 and coverage['sampleRate'] == 0.25
+
+def test_sample_rate_must_be_a_fraction(tmp_path, capsys):
+    with pytest.raises(SystemExit):
+        introspect.main([str(tmp_path), '--sample', '1.5'])
+    assert '--sample must be between 0 and 1' in capsys.readouterr().out
+
+WORKSPACE_FILES = {
+    'package.json': json.dumps({'name': 'mono', 'private': True, 'workspaces': ['client', 'server', 'shared']}),
+    'client/package.json': json.dumps({'name': '@mono/client', 'dependencies': {'react': '^18.0.0', '@mono/shared': '*'}}),
+    'client/src/App.tsx': "import { greet } from '@mono/shared';\nexport const App = () => greet('web');\n",
+    'server/package.json': json.dumps({'name': '@mono/server', 'dependencies': {'express': '^4.18.0'}}),
+    'server/index.js': "const express = require('express');\nconst app = express();\n// " "TODO: auth\n",
+    'shared/package.json': json.dumps({'name': '@mono/shared'}),
+    'shared/greet.ts': "export const greet = (name: string) => `hi ${name}`;\n",
+}
+
+class CountingScanner(ProjectScanner):
+    """Records every file whose content is analyzed rather than taken from the cache"""
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.analyzed = []
+    
+    def analyze_file_content(self, filepath, data=None):
+        self.analyzed.append(str(filepath.relative_to(self.project_path)))
+        return super().analyze_file_content(filepath, data)
+
+def test_workspace_pattern_keeps_single_stars_within_a_segment():
+    assert introspect.workspace_pattern('packages/*').fullmatch('packages/ui')
+    assert not introspect.workspace_pattern('packages/*').fullmatch('packages/ui/icons')
+    assert introspect.workspace_pattern('./apps/**/').fullmatch('apps/web/admin')
+    assert introspect.workspace_pattern('tool?').fullmatch('tool1')
+
+@pytest.mark.parametrize('declared', [
+    ['packages/**', '!packages/legacy'],
+    {'packages': ['packages/**', '!packages/legacy'], 'nohoist': ['**/react-native']},
+])
+def test_discover_workspaces_applies_globs_and_innermost_ownership(tmp_path, declared):
+    make_project(tmp_path, {
+        'package.json': json.dumps({'name': 'mono', 'workspaces': declared}),
+        'packages/tools/package.json': json.dumps({'name': 'tools'}),
+        'packages/tools/cli.js': "module.exports = {};\n",
+        'packages/tools/plugin/package.json': json.dumps({'name': 'plugin'}),
+        'packages/tools/plugin/index.js': "module.exports = {};\n",
+        'packages/legacy/package.json': json.dumps({'name': 'legacy'}),
+        'packages/legacy/old.js': "module.exports = {};\n",
+        'scripts/build.js': "module.exports = {};\n",
+    })
+    scanner = ProjectScanner(tmp_path, sinks=[])
+    scan_result = scanner.scan_directory()
+    scanner.project_files = scan_result['project_files']
+    packages = scanner.discover_workspaces(scan_result['files'])
+    
+    owned = {p['name']: sorted(str(f.relative_to(tmp_path)) for f in p['files']) for p in packages}
+    assert owned == {
+        'tools': ['packages/tools/cli.js', 'packages/tools/package.json'],
+        'plugin': ['packages/tools/plugin/index.js', 'packages/tools/plugin/package.json'],
+    }
+
+def test_editing_one_workspace_reanalyzes_only_that_package(tmp_path):
+    project = make_project(tmp_path / 'mono', WORKSPACE_FILES)
+    cache = ContentCache(tmp_path / 'cache')
+    
+    cold = CountingScanner(project, sinks=[], cache=cache)
+    reference = cold.scan()
+    assert sorted(cold.analyzed) == sorted(WORKSPACE_FILES)
+    assert [(w['name'], w['role']) for w in reference.workspaces] == [
+        ('@mono/client', 'frontend'), ('@mono/server', 'backend'), ('@mono/shared', 'library')]
+    
+    warm = CountingScanner(project, sinks=[], cache=cache)
+    assert warm.scan() == reference
+    assert warm.analyzed == []
+    
+    (project / 'client' / 'src' / 'App.tsx').write_text("export const App = () => null; // " "TODO: render\n")
+    edited = CountingScanner(project, sinks=[], cache=cache)
+    info = edited.scan()
+    assert edited.analyzed == ['client/src/App.tsx']
+    by_name = {w['name']: w for w in info.workspaces}
+    assert by_name['@mono/client']['todoCount'] == 1
+    assert [by_name[name] for name in ('@mono/server', '@mono/shared')] == reference.workspaces[1:]
+
+def test_cancelled_generation_stops_between_files_and_next_scan_reuses_them(tmp_path):
+    project = make_project(tmp_path, {f"src/mod{i}.js": f"export const v{i} = {i};\n" for i in range(6)})
+    
+    class CancellingScanner(CountingScanner):
+        # Newer changes arrive while the second file is being analyzed
+        def analyze_file_content(self, filepath, data=None):
+            result = super().analyze_file_content(filepath, data)
+            if len(self.analyzed) == 2 and self.cancel_token.generation == 1:
+                self.cancel_token.cancel()
+            return result
+    
+    scanner = CancellingScanner(project, sinks=[], cache=StatCache())
+    scanner.cancel_token = CancelToken(1)
+    with pytest.raises(ScanCancelled):
+        scanner.scan()
+    finished = list(scanner.analyzed)
+    assert len(finished) == 2
+    
+    scanner.cancel_token = CancelToken(2)
+    scanner.analyzed = []
+    info = scanner.scan()
+    assert sorted(finished + scanner.analyzed) == sorted(f"src/mod{i}.js" for i in range(6))
+    assert ProjectScanner(project, sinks=[]).scan() == info
+
+def test_progress_from_another_thread_is_never_lost_during_iter_scan(tmp_path):
+    project = make_project(tmp_path, {f"src/mod{i}.js": f"export const v{i} = {i};\n" for i in range(40)})
+    received = []
+    scanner = ProjectScanner(project, sinks=[received.append])
+    
+    def poller():
+        for i in range(2000):
+            scanner.progress(f"poll {i}")
+    
+    thread = threading.Thread(target=poller)
+    thread.start()
+    events = list(scanner.iter_scan())
+    thread.join()
+    polled = [e.message for e in events + received if e.kind == 'progress' and e.message.startswith('poll ')]
+    assert sorted(polled) == sorted(f"poll {i}" for i in range(2000))
+
+def test_iter_scan_yields_events_in_scan_order(tmp_path):
+    make_project(tmp_path)
+    events = list(ProjectScanner(tmp_path, sinks=[]).iter_scan())
+    kinds = [e.kind for e in events]
+    
+    assert kinds[0] == 'progress' and kinds[-1] == 'summary_ready' and kinds.count('summary_ready') == 1
+    discovered = [i for i, k in enumerate(kinds) if k == 'file_discovered']
+    analyzed = [i for i, k in enumerate(kinds) if k == 'file_analyzed']
+    assert len(discovered) == len(analyzed) == len(PROJECT_FILES)
+    assert max(discovered) < min(analyzed)
+    analyze_done = next(i for i, e in enumerate(events) if e.kind == 'phase_finished' and e.name == 'analyze')
+    assert max(analyzed) < analyze_done < len(events) - 1
+    assert {events[i].path for i in analyzed} == set(PROJECT_FILES)
+
+def test_iter_scan_without_summary_keeps_no_results(tmp_path):
+    make_project(tmp_path)
+    scanner = ProjectScanner(tmp_path, sinks=[])
+    kinds = [e.kind for e in scanner.iter_scan(summarize=False)]
+    
+    assert kinds.count('file_analyzed') == len(PROJECT_FILES)
+    assert 'summary_ready' not in kinds
+    assert scanner.file_results == []
+
+def test_inventory_from_paths_rejects_paths_outside_the_project(tmp_path):
+    project = make_project(tmp_path / 'project')
+    (tmp_path / 'secret.js').write_text("module.exports = 1;\n")
+    scanner = ProjectScanner(project, sinks=[])
+    
+    inventory = scanner.inventory_from_paths(['server/app.js', str(project / 'server' / '..' / 'package.json')])
+    assert sorted(str(f.relative_to(project)) for f in inventory['files']) == ['package.json', 'server/app.js']
+    for outside in ['../secret.js', str(tmp_path / 'secret.js'), '../project-other/a.js']:
+        with pytest.raises(ValueError):
+            scanner.inventory_from_paths([outside])
+
+def test_output_dir_writes_nothing_into_the_project(tmp_path):
+    project = make_project(tmp_path / 'project')
+    # Left behind by an earlier run without --output-dir
+    (project / 'project_summary.json').write_text(json.dumps({'projectName': 'stale'}))
+    before = sorted(p.relative_to(project) for p in project.rglob('*'))
+    out = tmp_path / 'out'
+    out.mkdir()
+    
+    assert introspect.main([str(project), '--output-dir', str(out)]) in (None, 0)
+    assert sorted(p.relative_to(project) for p in project.rglob('*')) == before
+    assert {p.name for p in out.iterdir()} >= {'project_summary.json', 'PROJECT_GUIDE.md'}
+    summary = json.loads((out / 'project_summary.json').read_text())
+    assert 'project_summary.json' not in json.dumps(summary['keyFiles'])
+    assert summary['metrics']['files'] == len(PROJECT_FILES)
+
+def test_failed_atomic_write_leaves_the_target_intact(tmp_path, monkeypatch):
+    target = tmp_path / 'project_summary.json'
+    target.write_bytes(b'{"old": true}')
+    
+    def fail(src, dst):
+        raise OSError('disk full')
+    monkeypatch.setattr(os, 'replace', fail)
+    with pytest.raises(OSError):
+        introspect.atomic_write(target, b'{"new": true}')
+    assert target.read_bytes() == b'{"old": true}'
+    assert [p.name for p in tmp_path.iterdir()] == ['project_summary.json']
+
+def test_atomic_write_keeps_an_existing_mode_and_follows_the_umask_for_new_files(tmp_path):
+    existing = tmp_path / 'existing.json'
+    existing.write_bytes(b'{}')
+    existing.chmod(0o604)
+    umask = os.umask(0o027)
+    try:
+        introspect.atomic_write(existing, b'[]')
+        introspect.atomic_write(tmp_path / 'new.json', b'[]')
+    finally:
+        os.umask(umask)
+    assert stat.S_IMODE(existing.stat().st_mode) == 0o604
+    assert stat.S_IMODE((tmp_path / 'new.json').stat().st_mode) == 0o640
+    assert existing.read_bytes() == b'[]'
+
+def test_unchanged_summary_is_not_rewritten(tmp_path):
+    make_project(tmp_path)
+    first = ProjectScanner(tmp_path, sinks=[])
+    output_path = first.save_json(first.scan())
+    written = output_path.read_bytes()
+    before = output_path.stat()
+    
+    # A later run only knows the file on disk, and differs only in its timestamp
+    second = ProjectScanner(tmp_path, sinks=[])
+    second.save_json(second.scan())
+    after = output_path.stat()
+    assert output_path.read_bytes() == written
+    assert (after.st_ino, after.st_mtime_ns) == (before.st_ino, before.st_mtime_ns)
+
+def apply_json_patch(document, patch):
+    """Apply the add, remove and replace operations of an RFC 6902 patch"""
+    document = json.loads(json.dumps(document))
+    for op in patch:
+        parts = [p.replace('~1', '/').replace('~0', '~') for p in op['path'].split('/')[1:]]
+        if not parts:
+            document = op['value']
+            continue
+        parent = document
+        for part in parts[:-1]:
+            parent = parent[int(part)] if isinstance(parent, list) else parent[part]
+        last = int(parts[-1]) if isinstance(parent, list) else parts[-1]
+        if op['op'] == 'remove':
+            del parent[last]
+        elif op['op'] == 'add' and isinstance(parent, list):
+            parent.insert(last, op['value'])
+        else:
+            parent[last] = op['value']
+    return document
+
+def test_emitted_patch_turns_the_old_summary_into_the_new_one(tmp_path):
+    make_project(tmp_path)
+    scanner = ProjectScanner(tmp_path, sinks=[])
+    scanner.emit_patches = True
+    output_path = scanner.save_json(scanner.scan())
+    old = json.loads(output_path.read_text())
+    
+    (tmp_path / 'server' / 'routes' / 'users.js').write_text(
+        "const express = require('express');\nconst router = express.Router();\n"
+        "router." "delete('/:id', remove);\n// " "TODO: audit log\n// " "FIXME: soft delete\nmodule.exports = router;\n")
+    (tmp_path / 'server' / 'jobs~nightly.py').write_text("# " "TODO: schedule\n")
+    (tmp_path / 'README.md').unlink()
+    scanner.save_json(scanner.scan())
+    new = json.loads(output_path.read_text())
+    
+    records = [json.loads(line) for line in (tmp_path / 'project_summary.patch.jsonl').read_text().splitlines()]
+    assert len(records) == 1 and records[0]['patch']
+    assert apply_json_patch(old, records[0]['patch']) == new
+    assert introspect.json_patch(new, new) == []
+
+def test_parallel_walker_matches_a_serial_walk_with_ignore_rules(tmp_path):
+    files = dict(PROJECT_FILES)
+    for i in range(30):
+        files[f"pkg{i % 3}/mod{i % 5}/file{i}.ts"] = 'export {}\n'
+    for ignored in ['node_modules/dep/index.js', 'pkg1/node_modules/x.js', '.git/config.json',
+                    'server/__pycache__/app.py', 'venv/lib/site.py', 'pkg2/stale.pyc']:
+        files[ignored] = 'ignored\n'
+    make_project(tmp_path, files)
+    scanner = ProjectScanner(tmp_path, sinks=[])
+    
+    reference = []
+    for dirpath, dirs, names in os.walk(tmp_path):
+        dirs[:] = [d for d in dirs if not scanner.should_ignore(os.path.join(dirpath, d))]
+        for name in names:
+            path = os.path.join(dirpath, name)
+            if not scanner.should_ignore(path) and scanner.is_code_file(name):
+                reference.append((path, os.stat(path).st_size))
+    reference.sort()
+    
+    assert len(reference) == len(PROJECT_FILES) + 30
+    for workers in (1, 8):
+        walker = introspect.ParallelWalker(tmp_path, scanner.should_ignore, workers=workers)
+        assert walker.walk(scanner.is_code_file) == reference
+    
+    serial = ProjectScanner(tmp_path, sinks=[])
+    serial.walk_workers = 1
+    assert serial.scan_directory() == scanner.scan_directory()
+
+def test_batch_results_match_single_project_runs(tmp_path):
+    alpha = make_project(tmp_path / 'alpha')
+    beta = make_project(tmp_path / 'beta', {
+        'requirements.txt': 'flask==3.0.0\n',
+        'app.py': "from flask import Flask\napp = Flask(__name__)\n\n@app." "route('/ping')\ndef ping():\n    return 'pong'  # " "TODO: version\n",
+    })
+    roots = tmp_path / 'roots.txt'
+    roots.write_text('alpha\nbeta  # second project\n')
+    
+    def summaries():
+        documents = {}
+        for root in (alpha, beta):
+            data = json.loads((root / 'project_summary.json').read_text())
+            del data['_metadata']['generated_at']
+            documents[root.name] = data
+        return documents
+    
+    with pytest.raises(SystemExit) as exited:
+        introspect.main(['--batch', str(roots), '--batch-index', str(tmp_path / 'index.json'), '--jobs', '2', '--json-only'])
+    assert exited.value.code == 0
+    batched = summaries()
+    index = json.loads((tmp_path / 'index.json').read_text())
+    assert [r['name'] for r in index['repositories']] == ['alpha', 'beta']
+    
+    for root in (alpha, beta):
+        (root / 'project_summary.json').unlink()
+        introspect.main([str(root), '--json-only'])
+    assert summaries() == batched